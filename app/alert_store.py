@@ -0,0 +1,139 @@
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+MAX_ALERTS = 10000
+MAX_AGE_SECONDS = 48 * 3600
+
+
+def _iso(ts_ns: int) -> str:
+    return datetime.fromtimestamp(ts_ns / 1e9, timezone.utc).isoformat()
+
+
+class AlertStore:
+    """Bounded, time-ordered store of alert groups with a per-container index.
+
+    An alert group is one log template in one container: repeats of the
+    pattern bump its count and last-seen time instead of adding entries.
+    Groups are kept in an OrderedDict by last-seen time (integer ns), so a
+    repeat is a move to the end, and expiry and the size cap only ever pop
+    from the oldest end. Each container also has its own OrderedDict of
+    the same groups, which makes per-container reads independent of how
+    noisy other containers are. Thread-safe.
+    """
+
+    def __init__(self, max_alerts: int = MAX_ALERTS, max_age_seconds: float = MAX_AGE_SECONDS):
+        self.max_alerts = max_alerts
+        self.max_age_seconds = max_age_seconds
+        self._alerts = OrderedDict()     # (container, template_id) -> (last_ts, alert)
+        self._by_container = {}          # container -> OrderedDict of the same
+        self._last_ts = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+    def add(self, container: str, message: str, template_id: int = None, template: str = None) -> tuple:
+        """Record an occurrence now; returns (alert, True if it started a new group).
+
+        Occurrences with the same container and `template_id` are grouped;
+        without a template id every message is its own group.
+        """
+        with self._lock:
+            # Microsecond resolution, so an alert's own `timestamp` can be passed
+            # back as `since` to page past it; kept strictly increasing.
+            ts = max(time.time_ns() // 1000 * 1000, self._last_ts + 1000)
+            self._last_ts = ts
+            if template_id is None:
+                self._next_id -= 1
+                template_id = self._next_id
+            key = (container, template_id)
+
+            per_container = self._by_container.get(container)
+            if per_container is None:
+                per_container = self._by_container[container] = OrderedDict()
+            entry = self._alerts.pop(key, None)
+            if entry is not None:
+                alert = entry[1]
+                alert["count"] += 1
+                alert["message"] = message
+                alert["template"] = template or alert["template"]
+                alert["timestamp"] = alert["last_seen"] = _iso(ts)
+                del per_container[key]
+            else:
+                alert = {
+                    "container": container,
+                    "template_id": template_id if template_id > 0 else None,
+                    "template": template or message,
+                    "message": message,
+                    "count": 1,
+                    "first_seen": _iso(ts),
+                    "last_seen": _iso(ts),
+                    "timestamp": _iso(ts),
+                }
+            self._alerts[key] = per_container[key] = (ts, alert)
+            self._evict()
+            return alert, entry is None
+
+    def _evict(self):
+        cutoff = time.time_ns() - int(self.max_age_seconds * 1_000_000_000)
+        alerts = self._alerts
+        while alerts:
+            key, (ts, alert) = next(iter(alerts.items()))
+            if len(alerts) <= self.max_alerts and ts >= cutoff:
+                break
+            del alerts[key]
+            per_container = self._by_container[key[0]]
+            del per_container[key]
+            if not per_container:
+                del self._by_container[key[0]]
+
+    def query(self, container: str = None, since: int = None, limit: int = 100) -> list:
+        """Return alert groups, least recently seen first.
+
+        Args:
+            container (str): Only this container's alerts; all when None.
+            since (int): Only groups seen after this time (ns), paging
+                forward from it. When None, the `limit` most recently seen
+                groups are returned.
+            limit (int): Maximum number of groups.
+        Returns:
+            list: Dicts with container, template_id, template, message (the
+            latest line), count, first_seen, last_seen and timestamp (the
+            same as last_seen).
+        """
+        with self._lock:
+            self._evict()
+            entries = self._alerts if container is None else self._by_container.get(container, {})
+            # Walk back from the newest end only as far as needed
+            found = []
+            for ts, alert in reversed(entries.values()):
+                if since is None and len(found) >= limit:
+                    break
+                if since is not None and ts <= since:
+                    break
+                found.append((ts, alert))
+            found.reverse()
+            return [dict(alert) for _, alert in found[:limit]]
+
+    def clear_container(self, container: str):
+        """Drop every alert of one container."""
+        with self._lock:
+            for key in self._by_container.pop(container, {}):
+                del self._alerts[key]
+
+    def clear(self):
+        with self._lock:
+            self._alerts.clear()
+            self._by_container.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "alerts": len(self._alerts),
+                "occurrences": sum(alert["count"] for _, alert in self._alerts.values()),
+                "max_alerts": self.max_alerts,
+                "containers": {name: len(entries) for name, entries in self._by_container.items()},
+            }
@@ -1,91 +1,134 @@
 import time
-from datetime import datetime
-from pathlib import Path
-import subprocess
-import yaml
-from .docker_utils import create_docker_dict, CONTAINER_DICT, client
+import logging
+import threading
+from datetime import datetime, timezone
+from . import metrics
+from .docker_utils import CONTAINER_DICT, LOG_CACHE
 from .send_email import send_email_alert
-from datetime import datetime, timedelta, timezone
-import hashlib
-import re
+from .matcher import alert_matcher
+from .structured import alert_rules, is_alert_line
+from .rate_rules import rate_engine
+from .alert_store import AlertStore
+from .dedup import DedupCache
+from .templates import TemplateMiner
 
-# In-memory alert list (can move to file/db later)
-ALERT_STORE = []
+logger = logging.getLogger(__name__)
 
-# Prevent spamming: store last alert time per container
-ALERT_CACHE = {}
+# In-memory alerts, newest kept up to alert.max_alerts (can move to file/db later)
+ALERT_STORE = AlertStore()
 
 ALERT_START_CACHE = {}
 
-EMAIL_MESSAGE_CACHE = {}  # container -> { message: timestamp }
+# Groups matching lines into templates, so one failure emitting many
+# slightly different lines is one alert with a count
+TEMPLATE_MINER = TemplateMiner()
 
+# Templates emailed recently; a repeat within the TTL is not emailed again
+EMAIL_MESSAGE_CACHE = DedupCache()
 
-CONFIG_PATH = Path(__file__).parent / "config.yml"
-COOLDOWN_SECONDS = 300  # default if not in config
+SCAN_CURSORS = {}  # container -> next LOG_CACHE sequence number to scan
 
+# Set by the ingest engine whenever new lines land in LOG_CACHE
+NEW_LINES = threading.Event()
 
-def load_config_keywords_and_cooldown():
-    with open(CONFIG_PATH, "r") as f:
-        config = yaml.safe_load(f)
-    keywords = config.get("alert", {}).get("keywords", [])
-    cooldown = config.get("alert", {}).get("cooldown_seconds", COOLDOWN_SECONDS)
-    interval_hours = config.get("email", {}).get("alert_interval_hours", 1)
-    return keywords, cooldown, interval_hours
+# Keeps scans from overlapping if more than one thread triggers them
+_SCAN_LOCK = threading.Lock()
 
+SCAN_SECONDS = metrics.Histogram("logforge_alert_scan_seconds", "Duration of one alert scan over newly ingested lines.")
+RATE_RULE_FIRINGS = metrics.Counter(
+    "logforge_rate_rule_firings_total", "Times a rate rule went over its threshold.", ("rule",))
+KEYWORD_MATCHES = metrics.Counter(
+    "logforge_keyword_matches_total", "Log lines matching an alert keyword or field rule.", ("container",))
+metrics.Collected("logforge_alert_groups", "Alert groups held in the alert store.", ALERT_STORE.__len__)
+metrics.Collected("logforge_alert_templates", "Log templates known to the template miner.", TEMPLATE_MINER.__len__)
+metrics.Collected("logforge_alert_dedup_entries", "Entries in the alert email dedup cache.", EMAIL_MESSAGE_CACHE.__len__)
+metrics.Collected("logforge_alert_dedup_lookups_total", "Alert email dedup cache lookups by result.",
+                  lambda: {"hit": EMAIL_MESSAGE_CACHE.hits, "miss": EMAIL_MESSAGE_CACHE.misses},
+                  labels=("result",), kind="counter")
+
+
+def configure(config: dict):
+    """Size the alert store, template miner and dedup cache from config. Called at startup."""
+    alert_config = config.get("alert", {})
+    ALERT_STORE.max_alerts = alert_config.get("max_alerts", 10000)
+    TEMPLATE_MINER.max_templates = alert_config.get("max_templates", 10000)
+    EMAIL_MESSAGE_CACHE.max_entries = alert_config.get("dedup_max_entries", 100000)
+    EMAIL_MESSAGE_CACHE.ttl_seconds = alert_config.get("dedup_ttl_hours", 24) * 3600
+
+
+def notify_new_lines(container: str, lines: list):
+    """Ingest listener: wake the alert loop as soon as new lines are cached."""
+    NEW_LINES.set()
 
-def scan_logs_for_alerts():
 
-    cutoff = datetime.now(timezone.utc) - timedelta(hours=48)
-    ALERT_STORE[:] = [
-        alert for alert in ALERT_STORE
-        if datetime.fromisoformat(alert["timestamp"]) > cutoff
-    ]
+def refresh_containers():
+    """Drop alerts for rebuilt containers.
 
-    create_docker_dict()
+    Container details themselves are kept current by the inventory.
+    """
     reset_alerts_on_container_rebuild()
-    keywords, cooldown, interval_hours = load_config_keywords_and_cooldown()
-    now = time.time()
 
-    for name, data in CONTAINER_DICT.items():
-        container_id = data["container_id"]
-        # cooldown check
-        last_alert = ALERT_CACHE.get(name, 0)
-        if now - last_alert < cooldown:
-            continue
-
-        # get last 3 minute logs
-
-        logs = client.containers.get(container_id).logs(
-            since=int(time.time()) - 180,  # last 3 minutes
-            timestamps=False,
-            stream=True,
-            follow=False,
-        )
-        for line in logs:
-            line = line.decode(errors="ignore")
-            if any(k in line for k in keywords):
-                msg = line.strip()
-                nodt_msg = strip_leading_timestamp(msg)
-                hashed_msg = hash_message(nodt_msg)
-                last_sent_time = EMAIL_MESSAGE_CACHE.get(hashed_msg)
-                print(f"[DEBUG] {name} - {hashed_msg} - {last_sent_time}")
-                if not last_sent_time:
-                    ALERT_STORE.append({
-                        "container": name,
-                        "timestamp": datetime.now(timezone.utc).isoformat(),
-                        "message": msg,
-                    })
 
+def scan_logs_for_alerts():
+    """Scan lines ingested since the last scan for alert keywords and field rules.
+
+    Reads from LOG_CACHE through a per-container sequence cursor, so every
+    line is matched exactly once and no Docker API calls are made here.
+    """
+    with _SCAN_LOCK:
+        start = time.perf_counter()
+        _scan_new_lines()
+        SCAN_SECONDS.observe(time.perf_counter() - start)
+
+
+def _scan_new_lines():
+    matcher = alert_matcher()
+    rules = alert_rules()
+    engine = rate_engine()
+    with_fields = bool(rules) or engine.needs_fields
+
+    for name in LOG_CACHE.keys():
+        cursor = SCAN_CURSORS.get(name)
+        if cursor is None:
+            # First sight of this container: look back 3 minutes, like the old window
+            cursor = LOG_CACHE.seq_at(name, time.time_ns() - 180 * 1_000_000_000)
+        # Field rules need the parsed JSON fields, cached in LOG_CACHE
+        lines, SCAN_CURSORS[name] = LOG_CACHE.read_from(name, cursor, with_fields=with_fields)
+
+        for ts, line, *parsed in lines:
+            fields = parsed[0] if parsed else None
+            if engine:
+                for rule, count in engine.observe(name, ts, line, fields):
+                    raise_rate_alert(name, rule, count, line)
+            if is_alert_line(line, fields, matcher, rules):
+                KEYWORD_MATCHES.inc(1, name)
+                line = line.decode(errors="ignore")
+                msg = line.strip()
+                template = TEMPLATE_MINER.add(msg)
+                alert, _ = ALERT_STORE.add(name, msg, template.id, template.template)
+                duplicate = EMAIL_MESSAGE_CACHE.seen((name, template.id))
+                logger.debug("%s - template %s x%s - %s", name, template.id, alert["count"],
+                             "duplicate" if duplicate else "new")
+                if not duplicate:
                     send_email_alert(
                         container=name,
                         subject=f"🚨 LogForge Alert in {name}",
-                        body=f"Keyword matched in logs at {datetime.now(timezone.utc).isoformat()}.\n\nLine:\n{line.strip()}"
+                        body=f"Alert matched in logs at {datetime.now(timezone.utc).isoformat()}.\n\nLine:\n{line.strip()}"
                     )
-                EMAIL_MESSAGE_CACHE[hashed_msg] = datetime.now(timezone.utc)
-
-
 
-                break  # 1 alert per container per cycle
+def raise_rate_alert(name: str, rule, count: int, line: bytes):
+    """Record and email an alert for a rate rule that just went over its threshold."""
+    RATE_RULE_FIRINGS.inc(1, rule.name)
+    where = "across all containers" if rule.scope == "all" else f"in {name}"
+    summary = f"Rate rule {rule.name}: {count} matching lines {where} within {rule.window_seconds}s (threshold {rule.threshold:g})"
+    last = line.decode(errors="ignore").strip()
+    ALERT_STORE.add(name, f"{summary}; last: {last}", template=f"Rate rule {rule.name}")
+    logger.info("%s", summary)
+    send_email_alert(
+        container=name,
+        subject=f"🚨 LogForge rate alert: {rule.name}",
+        body=f"{summary}, at {datetime.now(timezone.utc).isoformat()}.\n\nLast line ({name}):\n{last}"
+    )
 
 def reset_alerts_on_container_rebuild():
     """
@@ -93,38 +136,24 @@ def reset_alerts_on_container_rebuild():
     and clear any existing alerts for those containers.
 
     This compares the current 'StartedAt' time with the last known time
-    in ALERT_START_CACHE, and resets ALERT_STORE entries if they changed.
+    in ALERT_START_CACHE, and drops the container's alerts if it changed.
+    Per-container state of containers that no longer exist is forgotten.
     """
+    for name in [n for n in ALERT_START_CACHE if n not in CONTAINER_DICT]:
+        del ALERT_START_CACHE[name]
+    for name in [n for n in SCAN_CURSORS if n not in LOG_CACHE]:
+        del SCAN_CURSORS[name]
+        KEYWORD_MATCHES.remove(name)
+        with _SCAN_LOCK:
+            rate_engine().forget(name)
+
     for name, data in CONTAINER_DICT.items():
         started_at = data.get("started_at")
         last_start = ALERT_START_CACHE.get(name)
 
         if last_start and last_start != started_at:
             # Container was rebuilt → remove its old alerts
-            ALERT_STORE[:] = [a for a in ALERT_STORE if a["container"] != name]
+            ALERT_STORE.clear_container(name)
 
         # Update known start time
         ALERT_START_CACHE[name] = started_at
-
-def hash_message(msg: str) -> str:
-    return hashlib.sha256(msg.encode("utf-8")).hexdigest()
-
-def strip_leading_timestamp(msg: str) -> str:
-    # Common patterns like:
-    # 2025-05-09T00:16:16.278363799Z
-    # Fri May 9 00:16:16 UTC 2025:
-    # 2025-05-09 00:16:16,123
-    msg = msg.strip()
-
-    # Remove ISO format or syslog-style timestamp at the beginning
-    cleaned = re.sub(
-        r"""^(?:
-            \d{4}-\d{2}-\d{2}[T\s]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z| UTC)?   # ISO 8601 / Docker / UTC
-            |
-            [A-Za-z]{3} \s[A-Za-z]{3} \s+\d{1,2} \d{2}:\d{2}:\d{2}(?:\sUTC)?\s\d{4}  # Fri May 9 00:16:16 UTC 2025
-        )[:\s-]*""",
-        "",
-        msg,
-        flags=re.VERBOSE
-    )
-    return cleaned.strip()
\ No newline at end of file
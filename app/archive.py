@@ -0,0 +1,381 @@
+import os
+import mmap
+import time
+import zlib
+import logging
+import struct
+import threading
+from bisect import bisect_left
+from pathlib import Path
+
+BLOCK_BYTES = 64 * 1024             # raw bytes per compressed block
+SEGMENT_BYTES = 16 * 1024 * 1024    # compressed bytes per segment file
+SEGMENT_SECONDS = 3600              # start a new segment at least hourly
+FLUSH_SECONDS = 5                   # max age of lines held in memory
+RETENTION_CHECK_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+RECORD_HEADER = struct.Struct("<qI")     # ts_ns, message length
+INDEX_ENTRY = struct.Struct("<qqQQ")     # first_ts, last_ts, offset, length
+
+
+class _Index:
+    """Read-only view of a segment's .idx file as a sequence of entries."""
+
+    def __init__(self, buf):
+        self.buf = buf
+
+    def __len__(self) -> int:
+        return len(self.buf) // INDEX_ENTRY.size
+
+    def __getitem__(self, i: int) -> tuple:
+        return INDEX_ENTRY.unpack_from(self.buf, i * INDEX_ENTRY.size)
+
+
+class _LastStamps:
+    """Each block's last_ts as a sequence, so bisect can search the index in place."""
+
+    def __init__(self, index: _Index):
+        self.index = index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, i: int) -> int:
+        return self.index[i][1]
+
+
+def _map(path: Path):
+    """Memory-map a file read-only; returns None for empty or missing files."""
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if not size:
+                return None
+            return mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
+
+
+def _decode_records(raw: bytes) -> list:
+    lines = []
+    pos, end = 0, len(raw)
+    while pos < end:
+        ts, size = RECORD_HEADER.unpack_from(raw, pos)
+        pos += RECORD_HEADER.size
+        lines.append((ts, raw[pos:pos + size]))
+        pos += size
+    return lines
+
+
+def _decode_block(data: bytes) -> list:
+    return _decode_records(zlib.decompress(data))
+
+
+def check_name(name: str):
+    """Raise ValueError unless `name` is safe to use as a directory under the archive root."""
+    if not name or name in (".", "..") or any(c in name for c in "/\\\0"):
+        raise ValueError(f"Invalid container name: {name!r}")
+
+
+def _encode_records(lines) -> bytes:
+    return b"".join(RECORD_HEADER.pack(ts, len(msg)) + msg for ts, msg in lines)
+
+
+class _ContainerWriter:
+    """Buffers one container's lines and appends them to its current segment.
+
+    Creating one touches no files: it is created on the ingest path, so the
+    directory and the last archived timestamp are only looked at by the
+    first `write()`, on the flush thread.
+    """
+
+    def __init__(self, directory: Path):
+        self.dir = directory
+        self.pending = bytearray()
+        self.pending_first = None
+        self.pending_last = None
+        self.pending_since = 0.0
+        self.segment = None          # stem of the segment being written
+        self.segment_bytes = 0
+        self.segment_started = 0.0
+        self.last_ts = 0             # newest line appended by this writer
+        self.archived_ts = None      # newest line on disk; None until the first write
+
+    def _last_archived_ts(self) -> int:
+        segments = sorted(self.dir.glob("*.idx"))
+        for idx_path in reversed(segments):
+            buf = _map(idx_path)
+            if buf is not None:
+                try:
+                    index = _Index(buf)
+                    return index[len(index) - 1][1]
+                finally:
+                    buf.close()
+        return 0
+
+    def append(self, lines: list):
+        for ts, msg in lines:
+            if ts <= self.last_ts:
+                continue  # already archived, e.g. re-ingested after a restart
+            if self.pending_first is None:
+                self.pending_first = ts
+                self.pending_since = time.monotonic()
+            self.pending += RECORD_HEADER.pack(ts, len(msg))
+            self.pending += msg
+            self.pending_last = self.last_ts = ts
+
+    def due(self) -> bool:
+        return bool(self.pending) and (
+            len(self.pending) >= BLOCK_BYTES or time.monotonic() - self.pending_since >= FLUSH_SECONDS
+        )
+
+    def take(self):
+        """Detach the pending lines as (first_ts, last_ts, raw records), or None."""
+        if not self.pending:
+            return None
+        block = (self.pending_first, self.pending_last, bytes(self.pending))
+        self.pending = bytearray()
+        self.pending_first = self.pending_last = None
+        return block
+
+    def write(self, first_ts: int, last_ts: int, raw: bytes) -> int:
+        """Compress a block and append it to the current segment. Returns bytes written."""
+        if self.archived_ts is None:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            self.archived_ts = self._last_archived_ts()
+        if first_ts <= self.archived_ts:
+            # Already archived, e.g. re-ingested after a restart
+            lines = [line for line in _decode_records(raw) if line[0] > self.archived_ts]
+            if not lines:
+                return 0
+            first_ts, raw = lines[0][0], _encode_records(lines)
+
+        if (self.segment is None or self.segment_bytes >= SEGMENT_BYTES
+                or time.monotonic() - self.segment_started >= SEGMENT_SECONDS):
+            self.segment = f"{first_ts:020d}"
+            self.segment_bytes = 0
+            self.segment_started = time.monotonic()
+
+        block = zlib.compress(raw, 6)
+        with open(self.dir / f"{self.segment}.seg", "ab") as f:
+            offset = f.tell()
+            f.write(block)
+        # The index entry is written only after its block, so readers never
+        # see an entry pointing at data that is not on disk yet.
+        with open(self.dir / f"{self.segment}.idx", "ab") as f:
+            f.write(INDEX_ENTRY.pack(first_ts, last_ts, offset, len(block)))
+
+        self.segment_bytes += len(block)
+        self.archived_ts = last_ts
+        return len(block)
+
+    def pending_lines(self) -> list:
+        return _decode_records(bytes(self.pending))
+
+
+class LogArchive:
+    """Append-only on-disk log archive with a sparse time index.
+
+    Each container gets a directory of segment files. A segment (`.seg`) is
+    a run of independently zlib-compressed blocks of (ts, line) records; its
+    `.idx` file holds one fixed-size (first_ts, last_ts, offset, length)
+    entry per block. Range queries memory-map the index, binary-search to
+    the first block that can contain `since`, and decompress blocks only
+    until `until`.
+
+    Lines are buffered per container and flushed as blocks by a background
+    thread; old segments are deleted once the archive exceeds `max_bytes`
+    or a segment's newest line is older than `max_age_seconds`.
+    """
+
+    def __init__(self, root, max_bytes: int, max_age_seconds: float):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.bytes_written = 0
+        self._writers = {}
+        self._released = []   # writers of removed containers, until their last lines are flushed
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # serialises segment writes and deletes
+        self._thread = None
+
+    def _dir(self, name: str) -> Path:
+        check_name(name)
+        return self.root / name
+
+    def _writer(self, name: str) -> _ContainerWriter:
+        writer = self._writers.get(name)
+        if writer is None:
+            writer = self._writers[name] = _ContainerWriter(self._dir(name))
+        return writer
+
+    def start(self):
+        """Start the background flush and retention thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="log-archive", daemon=True)
+            self._thread.start()
+
+    def append(self, name: str, lines: list):
+        """Ingest listener: buffer a batch of (ts_ns, message) lines for archiving."""
+        with self._lock:
+            self._writer(name).append(lines)
+
+    def release(self, name: str):
+        """Inventory listener helper: forget the writer of a container that was removed.
+
+        Its buffered lines are still written by the next flush, and what it
+        archived stays readable until retention deletes it.
+        """
+        with self._lock:
+            writer = self._writers.pop(name, None)
+            if writer is not None:
+                self._released.append(writer)
+
+    def flush(self, force: bool = False):
+        """Write out buffered lines (all of them if `force`, else only due blocks).
+
+        Only detaching the buffers happens under the lock; compression and
+        disk writes do not hold up `append` on the ingest path.
+        """
+        with self._lock:
+            # Released writers go first, so a container re-created under the
+            # same name sees their lines as already archived
+            blocks = [(writer, writer.take()) for writer in self._released]
+            self._released = []
+            blocks += [(writer, writer.take()) for writer in self._writers.values()
+                       if force or writer.due()]
+        with self._flush_lock:
+            for writer, block in blocks:
+                if block:
+                    self.bytes_written += writer.write(*block)
+
+    def _run(self):
+        last_retention = 0.0
+        while True:
+            time.sleep(1)
+            try:
+                self.flush()
+                if time.monotonic() - last_retention >= RETENTION_CHECK_SECONDS:
+                    self.enforce_retention()
+                    last_retention = time.monotonic()
+            except Exception as e:
+                logger.exception("Archive error: %s", e)
+
+    def _segments(self, name: str) -> list:
+        directory = self._dir(name)
+        if not directory.is_dir():
+            return []
+        return sorted(p.stem for p in directory.glob("*.idx"))
+
+    def oldest(self, name: str):
+        """Timestamp (ns) of the oldest archived line for a container, or None.
+
+        Raises:
+            ValueError: If `name` could escape the archive directory.
+        """
+        segments = self._segments(name)
+        if segments:
+            return int(segments[0])
+        with self._lock:
+            writer = self._writers.get(name)
+            return writer.pending_first if writer else None
+
+    def read_range(self, name: str, since: int = None, until: int = None):
+        """Yield batches of (ts_ns, message) lines with since <= ts < until.
+
+        Each batch is one decompressed block, so memory stays bounded.
+        Raises:
+            ValueError: If `name` could escape the archive directory.
+        """
+        since = since or 0
+        directory = self._dir(name)
+        segments = self._segments(name)
+        on_disk = -1   # newest line read from disk, to skip re-ingested pending lines
+        for i, stem in enumerate(segments):
+            # Segments are named after their first timestamp
+            if until is not None and int(stem) >= until:
+                return
+            if i + 1 < len(segments) and int(segments[i + 1]) <= since:
+                continue
+            idx_buf = _map(directory / f"{stem}.idx")
+            if idx_buf is None:
+                continue
+            seg_buf = _map(directory / f"{stem}.seg")
+            if seg_buf is None:
+                idx_buf.close()
+                continue
+            try:
+                index = _Index(idx_buf)
+                for j in range(bisect_left(_LastStamps(index), since), len(index)):
+                    first_ts, last_ts, offset, length = index[j]
+                    if until is not None and first_ts >= until:
+                        return
+                    batch = _decode_block(seg_buf[offset:offset + length])
+                    on_disk = max(on_disk, last_ts)
+                    yield [(ts, msg) for ts, msg in batch
+                           if ts >= since and (until is None or ts < until)]
+            finally:
+                idx_buf.close()
+                seg_buf.close()
+
+        with self._lock:
+            writer = self._writers.get(name)
+            pending = writer.pending_lines() if writer else []
+        batch = [(ts, msg) for ts, msg in pending
+                 if ts >= since and ts > on_disk and (until is None or ts < until)]
+        if batch:
+            yield batch
+
+    def enforce_retention(self):
+        """Delete segments that are too old, then the oldest until under max_bytes."""
+        if not self.root.is_dir():
+            return
+        cutoff = time.time_ns() - int(self.max_age_seconds * 1_000_000_000)
+        segments = []  # (first_ts, last_ts, size, directory, stem)
+        with self._lock:
+            active = {(w.dir, w.segment) for w in self._writers.values()}
+        for directory in self.root.iterdir():
+            if not directory.is_dir():
+                continue
+            for idx_path in directory.glob("*.idx"):
+                stem = idx_path.stem
+                seg_path = directory / f"{stem}.seg"
+                size = idx_path.stat().st_size + (seg_path.stat().st_size if seg_path.exists() else 0)
+                last_ts = 0
+                buf = _map(idx_path)
+                if buf is not None:
+                    index = _Index(buf)
+                    last_ts = index[len(index) - 1][1]
+                    buf.close()
+                segments.append((int(stem), last_ts, size, directory, stem))
+
+        segments.sort()
+        total = sum(s[2] for s in segments)
+        for first_ts, last_ts, size, directory, stem in segments:
+            if total <= self.max_bytes and last_ts >= cutoff:
+                continue
+            if (directory, stem) in active and last_ts >= cutoff:
+                continue  # never delete the segment being written unless expired
+            with self._flush_lock:
+                for suffix in (".idx", ".seg"):
+                    try:
+                        (directory / f"{stem}{suffix}").unlink()
+                    except FileNotFoundError:
+                        pass
+                for writer in self._writers.values():
+                    if writer.dir == directory and writer.segment == stem:
+                        writer.segment = None
+            total -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = sum(len(w.pending) for w in self._writers.values())
+        return {
+            "path": str(self.root),
+            "bytes_written": self.bytes_written,
+            "pending_bytes": pending,
+            "max_bytes": self.max_bytes,
+            "max_age_seconds": self.max_age_seconds,
+        }
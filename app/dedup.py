@@ -0,0 +1,104 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = 100000
+TTL_SECONDS = 24 * 3600
+MASK = "<*>"
+
+# Tokens that vary between otherwise identical log lines. One alternation,
+# compiled once; earlier branches win, so the most specific shapes come first.
+# Everything starts at a word boundary, which lets the engine skip the middle
+# of words quickly and leaves names such as "http2" alone.
+VARIABLE_TOKENS = re.compile(r"""
+    \b(?:
+      \d{4}-\d{2}-\d{2}[T\s]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2}|\sUTC)?  # ISO 8601 / Docker
+    | [A-Za-z]{3}\s[A-Za-z]{3}\s+\d{1,2}\s\d{2}:\d{2}:\d{2}(?:\sUTC)?\s\d{4}          # Fri May 9 00:16:16 UTC 2025
+    | [0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b    # UUID
+    | \d{1,3}(?:\.\d{1,3}){3}(?::\d{1,5})?\b                                           # IPv4[:port]
+    | 0x[0-9a-fA-F]+\b                                                                 # 0x1f3a
+    | (?=[0-9a-fA-F]*\d)[0-9a-fA-F]{8,}\b                                              # hex ids, hashes
+    | \d+(?:\.\d+)?                                                                    # numbers
+    )
+""", re.VERBOSE)
+
+
+def normalize_message(msg: str) -> str:
+    """Mask timestamps, UUIDs, IPs, hex ids and numbers in a log line.
+
+    Lines that differ only in such values normalize to the same string,
+    e.g. 'request 4f2a9c1e failed after 31ms' -> 'request <*> failed after <*>ms'.
+    """
+    return VARIABLE_TOKENS.sub(MASK, msg.strip())
+
+
+class DedupCache:
+    """Bounded set of recently recorded keys whose entries expire after a TTL.
+
+    `seen(key)` answers "was this key recorded within the last
+    `ttl_seconds`?" and records it if not. A hit leaves the recorded time
+    alone, so a key that keeps recurring is let through again once every
+    `ttl_seconds` instead of never. Entries live in an OrderedDict in the
+    order they were recorded, so both the size cap and expiry only look at
+    the oldest end. Thread-safe.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, ttl_seconds: float = TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()   # key -> monotonic time recorded
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def seen(self, key) -> bool:
+        """Return True if `key` was recorded within the TTL; otherwise record it now."""
+        now = time.monotonic()
+        with self._lock:
+            recorded = self._entries.get(key)
+            hit = recorded is not None and now - recorded < self.ttl_seconds
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self._entries[key] = now
+                self._entries.move_to_end(key)
+            self._trim(now)
+        return hit
+
+    def _trim(self, now: float):
+        entries = self._entries
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self.evictions += 1
+        cutoff = now - self.ttl_seconds
+        while entries:
+            key, recorded = next(iter(entries.items()))
+            if recorded >= cutoff:
+                break
+            del entries[key]
+            self.expirations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,559 @@
+import os
+import re
+import json
+import time
+import heapq
+import asyncio
+import calendar
+import itertools
+from urllib.parse import urlencode, urlsplit, quote
+
+from . import metrics
+
+DEFAULT_DOCKER_HOST = "unix:///var/run/docker.sock"
+API_VERSION = "v1.41"
+
+STREAM_HEADER_SIZE = 8
+MULTIPLEXED_CONTENT_TYPE = "application/vnd.docker.multiplexed-stream"
+
+# "YYYY-MM-DDTHH:MM" -> epoch seconds, so a timestamp only pays for the
+# calendar math once per minute of logs.
+_MINUTE_CACHE = {}
+
+# "/containers/<id>/logs" -> "/containers/{id}/logs", one label per endpoint
+_CONTAINER_SEGMENT = re.compile(r"^/containers/(?!json$)[^/]+")
+
+MAX_CONNECTIONS = 32            # pooled keep-alive connections per client
+REQUEST_TIMEOUT_SECONDS = 30
+CONNECT_TIMEOUT_SECONDS = 5
+READ_TIMEOUT_SECONDS = 60       # max silence while reading a finite (non-follow) stream
+
+API_SECONDS = metrics.Histogram(
+    "logforge_docker_api_seconds", "Docker API latency up to the response headers.", ("endpoint",))
+API_ERRORS = metrics.Counter(
+    "logforge_docker_api_errors_total",
+    "Docker API requests that failed to connect or returned an error status.", ("endpoint",))
+OPENED = metrics.Counter("logforge_docker_connections_opened_total", "Connections opened to Docker daemons.")
+
+
+async def wait_for(aw, timeout: float):
+    """Like asyncio.wait_for, but a cancellation of the caller is never lost.
+
+    Before Python 3.12, asyncio.wait_for returns the result if the awaited
+    call completes in the same loop iteration as the caller is cancelled,
+    and the caller carries on as if it never was. A log stream cancelled
+    just as it connected would then keep running and shutdown would hang.
+
+    Raises:
+        asyncio.TimeoutError: If `aw` takes longer than `timeout` seconds.
+    """
+    task = asyncio.ensure_future(aw)
+    expired = False
+
+    def expire():
+        nonlocal expired
+        expired = True
+        task.cancel()
+
+    handle = asyncio.get_running_loop().call_later(timeout, expire)
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if expired and task.cancelled():
+            raise asyncio.TimeoutError from None
+        raise
+    finally:
+        handle.cancel()
+
+
+class PriorityLimiter:
+    """Like asyncio.Semaphore, but waiters get in lowest `priority` first.
+
+    Waiters with equal priority are admitted in arrival order. Priorities
+    only need to be comparable with each other.
+    """
+
+    def __init__(self, value: int):
+        self._free = value
+        self._waiters = []    # heap of (priority, arrival, future)
+        self._arrivals = itertools.count()
+
+    async def acquire(self, priority=0):
+        # Cancelled waiters are only dropped when they reach the top
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._arrivals), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()  # granted just as we were cancelled; pass it on
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._free += 1
+
+
+class DockerAPIError(Exception):
+    """Raised when the Docker daemon answers with a non-2xx status."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Docker API error {status}: {message}")
+        self.status = status
+        self.message = message
+
+
+def parse_timestamp(raw: bytes) -> int:
+    """Parse a Docker RFC3339Nano timestamp into integer nanoseconds.
+
+    Args:
+        raw (bytes): Timestamp such as b'2025-05-09T00:16:16.278363799Z'.
+    Returns:
+        int: Nanoseconds since the epoch (UTC).
+    Raises:
+        ValueError: If the timestamp is malformed.
+    """
+    minute = raw[:16]
+    base = _MINUTE_CACHE.get(minute)
+    if base is None:
+        base = calendar.timegm((
+            int(raw[0:4]), int(raw[5:7]), int(raw[8:10]),
+            int(raw[11:13]), int(raw[14:16]), 0, 0, 0, 0
+        ))
+        if len(_MINUTE_CACHE) > 4096:
+            _MINUTE_CACHE.clear()
+        _MINUTE_CACHE[minute] = base
+
+    ns = (base + int(raw[17:19])) * 1_000_000_000
+    if len(raw) > 20 and raw[19:20] == b".":
+        end = 20
+        while end < len(raw) and 48 <= raw[end] <= 57:
+            end += 1
+        frac = raw[20:end]
+        ns += int(frac.ljust(9, b"0")[:9])
+        rest = raw[end:]
+    else:
+        rest = raw[19:]
+
+    if rest and rest != b"Z":
+        # Numeric offset, e.g. +02:00
+        sign = -1 if rest[:1] == b"+" else 1
+        ns += sign * (int(rest[1:3]) * 3600 + int(rest[4:6]) * 60) * 1_000_000_000
+    return ns
+
+
+def format_since(ts_ns: int) -> str:
+    """Format nanoseconds as the 'seconds.nanoseconds' form Docker accepts for since/until."""
+    return f"{ts_ns // 1_000_000_000}.{ts_ns % 1_000_000_000:09d}"
+
+
+def split_timestamp(line: bytes) -> tuple:
+    """Split a timestamped Docker log line into (ts_ns, message bytes).
+
+    Lines without a parseable timestamp are stamped with the current time.
+    """
+    sp = line.find(b" ")
+    if sp > 0:
+        try:
+            return parse_timestamp(line[:sp]), line[sp + 1:]
+        except ValueError:
+            pass
+    return time.time_ns(), line
+
+
+class AsyncDockerClient:
+    """A small asyncio client for the Docker Engine API.
+
+    Talks HTTP/1.1 directly over the daemon socket (``unix://`` or ``tcp://``,
+    taken from ``DOCKER_HOST`` like the docker CLI), so any number of log
+    streams can be followed from a single event loop without a thread each.
+
+    Plain request/response calls (`get_json`) share a pool of at most
+    `max_connections` keep-alive connections; callers beyond that wait for
+    a free one instead of opening more sockets. Streams (`stream_json`,
+    `log_batches`) get a connection of their own, since they can stay open
+    for as long as a container runs. Every call can be cancelled, which
+    closes its connection.
+
+    At most `max_connections` requests are in flight to the daemon at once:
+    pooled calls hold a slot for the whole exchange, streams only until
+    their response head arrives. Waiting callers are let in lowest
+    `priority` first; plain calls use 0.
+    """
+
+    def __init__(self, base_url: str = None, api_version: str = API_VERSION,
+                 max_connections: int = MAX_CONNECTIONS, timeout: float = REQUEST_TIMEOUT_SECONDS):
+        self.base_url = base_url or os.environ.get("DOCKER_HOST") or DEFAULT_DOCKER_HOST
+        self.api_version = api_version
+        self.max_connections = max_connections
+        self.timeout = timeout
+        parts = urlsplit(self.base_url)
+        self._scheme = parts.scheme
+        if self._scheme in ("unix", "http+unix"):
+            self._unix_path = parts.path
+        elif self._scheme in ("tcp", "http"):
+            self._host = parts.hostname
+            self._port = parts.port or 2375
+        else:
+            raise ValueError(f"Unsupported DOCKER_HOST scheme: {self.base_url}")
+        self._idle = []       # (reader, writer) keep-alive connections, most recent last
+        self._slots = None    # PriorityLimiter bounding requests in flight
+        self._loop = None     # the event loop _idle and _slots belong to
+
+    async def _connect(self):
+        OPENED.inc()
+        if self._scheme in ("unix", "http+unix"):
+            connect = asyncio.open_unix_connection(self._unix_path, limit=2 ** 20)
+        else:
+            connect = asyncio.open_connection(self._host, self._port, limit=2 ** 20)
+        return await wait_for(connect, CONNECT_TIMEOUT_SECONDS)
+
+    def _path(self, path: str, params: dict = None) -> str:
+        url = f"/{self.api_version}{path}"
+        if params:
+            query = {k: v for k, v in params.items() if v is not None}
+            for key, value in query.items():
+                if isinstance(value, bool):
+                    query[key] = "1" if value else "0"
+            url += "?" + urlencode(query)
+        return url
+
+    def _pool(self) -> PriorityLimiter:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Connections cannot be shared between event loops
+            for _, writer in self._idle:
+                writer.close()
+            self._idle = []
+            self._slots = PriorityLimiter(self.max_connections)
+            self._loop = loop
+        return self._slots
+
+    async def close(self):
+        """Close the idle pooled connections."""
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+
+    @staticmethod
+    async def _send(reader, writer, request: bytes):
+        """Write a request and read the response head; returns (status, headers)."""
+        writer.write(request)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("Docker daemon closed the connection")
+        status = int(status_line.split()[1])
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        return status, headers
+
+    def _head(self, method: str, path: str, params: dict, keep_alive: bool) -> bytes:
+        return (
+            f"{method} {self._path(path, params)} HTTP/1.1\r\n"
+            f"Host: docker\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        ).encode()
+
+    async def _request(self, method: str, path: str, params: dict = None, priority=0):
+        """Open a dedicated connection for a stream; returns (status, headers, body iterator, writer).
+
+        Only connecting and the response head are bounded by the timeout;
+        the body may legitimately stay open for as long as the container runs.
+        A request slot is held until the head arrives.
+        """
+        endpoint = _CONTAINER_SEGMENT.sub("/containers/{id}", path)
+        slots = self._pool()
+        await slots.acquire(priority)
+        start = time.perf_counter()
+        try:
+            try:
+                reader, writer = await self._connect()
+            except (OSError, asyncio.TimeoutError):
+                API_ERRORS.inc(1, endpoint)
+                raise
+            try:
+                status, headers = await wait_for(
+                    self._send(reader, writer, self._head(method, path, params, False)), self.timeout)
+            except BaseException as e:
+                writer.close()
+                if not isinstance(e, asyncio.CancelledError):
+                    API_ERRORS.inc(1, endpoint)
+                raise
+        finally:
+            slots.release()
+
+        API_SECONDS.observe(time.perf_counter() - start, endpoint)
+        if status >= 400:
+            API_ERRORS.inc(1, endpoint)
+        return status, headers, _iter_body(reader, headers), writer
+
+    async def _fetch(self, method: str, path: str, params: dict = None) -> tuple:
+        """Make a request over a pooled keep-alive connection; returns (status, body bytes).
+
+        The whole exchange, including waiting for a free connection, is
+        bounded by the client timeout.
+        """
+        endpoint = _CONTAINER_SEGMENT.sub("/containers/{id}", path)
+        start = time.perf_counter()
+        slots = self._pool()
+        try:
+            await wait_for(slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            API_ERRORS.inc(1, endpoint)
+            raise
+        try:
+            remaining = max(0.0, self.timeout - (time.perf_counter() - start))
+            status, headers, data, conn = await wait_for(
+                self._exchange(method, path, params, endpoint, start), remaining)
+        except BaseException as e:
+            if not isinstance(e, asyncio.CancelledError):
+                API_ERRORS.inc(1, endpoint)
+            raise
+        finally:
+            slots.release()
+
+        if conn is not None and len(self._idle) < self.max_connections:
+            self._idle.append(conn)
+        elif conn is not None:
+            conn[1].close()
+        if status >= 400:
+            API_ERRORS.inc(1, endpoint)
+        return status, data
+
+    async def _exchange(self, method: str, path: str, params: dict, endpoint: str, start: float) -> tuple:
+        request = self._head(method, path, params, True)
+        while True:
+            reused = bool(self._idle)
+            reader, writer = self._idle.pop() if reused else await self._connect()
+            try:
+                status, headers = await self._send(reader, writer, request)
+            except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+                writer.close()
+                if reused:
+                    continue  # the daemon closed an idle connection; try the next one
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            API_SECONDS.observe(time.perf_counter() - start, endpoint)
+
+            try:
+                data = b"".join([chunk async for chunk in _iter_body(reader, headers)])
+            except BaseException:
+                writer.close()
+                raise
+            framed = "content-length" in headers or headers.get("transfer-encoding", "").lower() == "chunked"
+            if framed and headers.get("connection", "").lower() != "close" and not reader.at_eof():
+                return status, headers, data, (reader, writer)
+            writer.close()
+            return status, headers, data, None
+
+    async def get_json(self, path: str, params: dict = None):
+        """GET a JSON document from the API.
+
+        Args:
+            path (str): API path without the version prefix, e.g. '/containers/json'.
+            params (dict): Optional query parameters.
+        Returns:
+            The decoded JSON document.
+        Raises:
+            DockerAPIError: If the daemon answers with an error status.
+            asyncio.TimeoutError: If no answer arrives within the client timeout.
+        """
+        status, data = await self._fetch("GET", path, params)
+        if status >= 400:
+            raise DockerAPIError(status, _error_message(data))
+        return json.loads(data) if data else None
+
+    async def stream_json(self, path: str, params: dict = None, priority=0):
+        """GET a streaming endpoint that sends one JSON document per line, such as /events.
+
+        Args:
+            path (str): API path without the version prefix.
+            params (dict): Optional query parameters.
+            priority: Order among requests waiting for a slot; lower goes first.
+        Yields:
+            Each decoded JSON document as it arrives.
+        """
+        status, headers, body, writer = await self._request("GET", path, params, priority)
+        try:
+            if status >= 400:
+                data = b"".join([chunk async for chunk in body])
+                raise DockerAPIError(status, _error_message(data))
+
+            pending = b""
+            async for chunk in body:
+                pending += chunk
+                if b"\n" not in chunk:
+                    continue
+                *lines, pending = pending.split(b"\n")
+                for line in lines:
+                    if line.strip():
+                        yield json.loads(line)
+            if pending.strip():
+                yield json.loads(pending)
+        finally:
+            writer.close()
+
+    async def log_batches(self, container_id: str, since: int = None, until: int = None,
+                          follow: bool = True, tail=None, tty: bool = None, priority=0):
+        """Stream a container's logs as batches of (ts_ns, message) tuples.
+
+        Each batch holds every complete line that arrived in one socket read,
+        which keeps per-line overhead low on busy containers.
+
+        Args:
+            container_id (str): Container id or name.
+            since (int): Only return lines at or after this time (ns).
+            until (int): Only return lines before this time (ns).
+            follow (bool): Keep the stream open for new lines.
+            tail: Number of lines to start from, or None for all.
+            tty (bool): Whether the container uses a TTY (raw stream), from
+                its inspect data (`Config.Tty`). When None it is inferred from
+                the response; see `_detect_tty`.
+            priority: Order among requests waiting for a slot; lower goes first.
+        Yields:
+            list: A list of (ts_ns, message bytes) tuples.
+        """
+        params = {
+            "stdout": True,
+            "stderr": True,
+            "timestamps": True,
+            "follow": follow,
+            "since": format_since(since) if since else None,
+            "until": format_since(until) if until else None,
+            "tail": "all" if tail is None else tail,
+        }
+        status, headers, body, writer = await self._request(
+            "GET", f"/containers/{quote(container_id, safe='')}/logs", params, priority
+        )
+        try:
+            if status >= 400:
+                data = b"".join([chunk async for chunk in body])
+                raise DockerAPIError(status, _error_message(data))
+
+            if not follow:
+                # A finite read should keep moving; a followed stream may idle
+                body = _idle_timeout(body, READ_TIMEOUT_SECONDS)
+            if tty is None:
+                body, tty = await _detect_tty(body, headers.get("content-type", ""))
+            chunks = body if tty else _demultiplex(body)
+            pending = b""
+            async for chunk in chunks:
+                pending += chunk
+                if b"\n" not in chunk:
+                    continue
+                *lines, pending = pending.split(b"\n")
+                yield [split_timestamp(line.rstrip(b"\r")) for line in lines if line]
+            if pending:
+                yield [split_timestamp(pending.rstrip(b"\r"))]
+        finally:
+            writer.close()
+
+
+async def _iter_body(reader: asyncio.StreamReader, headers: dict):
+    """Yield raw body chunks, undoing chunked transfer encoding if present."""
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size_line = await reader.readline()
+            if not size_line:
+                return
+            size = int(size_line.split(b";", 1)[0].strip() or b"0", 16)
+            if size == 0:
+                await reader.readline()
+                return
+            chunk = await reader.readexactly(size)
+            await reader.readexactly(2)
+            yield chunk
+    elif "content-length" in headers:
+        remaining = int(headers["content-length"])
+        while remaining > 0:
+            chunk = await reader.read(min(remaining, 65536))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+    else:
+        while True:
+            chunk = await reader.read(65536)
+            if not chunk:
+                return
+            yield chunk
+
+
+async def _idle_timeout(chunks, seconds: float):
+    """Pass chunks through, raising asyncio.TimeoutError if none arrives for `seconds`."""
+    it = chunks.__aiter__()
+    while True:
+        try:
+            chunk = await wait_for(it.__anext__(), seconds)
+        except StopAsyncIteration:
+            return
+        yield chunk
+
+
+async def _detect_tty(chunks, content_type: str) -> tuple:
+    """Tell a raw (TTY) log stream from a multiplexed one; returns (chunks, tty).
+
+    Only API 1.42+ labels multiplexed streams as such; older daemons call
+    every log stream raw. So a stream not labelled multiplexed is checked
+    for the [stream 0-2, 0, 0, 0] header every multiplexed frame starts with.
+    """
+    if content_type.startswith(MULTIPLEXED_CONTENT_TYPE):
+        return chunks, False
+    it = chunks.__aiter__()
+    try:
+        first = await it.__anext__()
+    except StopAsyncIteration:
+        return it, True
+    tty = not (len(first) >= STREAM_HEADER_SIZE and first[0] <= 2 and first[1:4] == b"\0\0\0")
+    return _prepend(first, it), tty
+
+
+async def _prepend(first: bytes, rest):
+    yield first
+    async for chunk in rest:
+        yield chunk
+
+
+async def _demultiplex(chunks):
+    """Strip Docker's 8-byte stdout/stderr frame headers from a body stream."""
+    buf = bytearray()
+    async for chunk in chunks:
+        buf += chunk
+        out = bytearray()
+        pos = 0
+        while len(buf) - pos >= STREAM_HEADER_SIZE:
+            size = int.from_bytes(buf[pos + 4:pos + 8], "big")
+            end = pos + STREAM_HEADER_SIZE + size
+            if end > len(buf):
+                break
+            out += buf[pos + STREAM_HEADER_SIZE:end]
+            pos = end
+        del buf[:pos]
+        if out:
+            yield bytes(out)
+
+
+def _error_message(data: bytes) -> str:
+    try:
+        return json.loads(data).get("message", "")
+    except (ValueError, AttributeError):
+        return data.decode(errors="ignore")
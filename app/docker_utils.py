@@ -1,41 +1,232 @@
-import docker
-import subprocess
+import zlib
+import math
+import heapq
+import asyncio
 import json
 import time
-import yaml
+import logging
 from pathlib import Path
-from datetime import datetime, timezone
+from datetime import timezone
 from dateutil.parser import isoparse
-from collections import defaultdict
+from . import metrics
+from .ingest import ENGINE
+from .inventory import ContainerInventory, docker_hosts
+from .matcher import alert_matcher
+from .structured import alert_rules, is_alert_line, parse_fields
+from .log_store import format_line
+from .archive import LogArchive
+from .search import SearchIndex
+from .stats import StatsCollector
 
-LOG_CACHE = defaultdict(list)
+logger = logging.getLogger(__name__)
 
-client = docker.from_env()
-CONTAINER_DICT ={}
+EXPORT_MAX_CONTAINERS = 100
+EXPORT_READ_AHEAD = 4             # batches buffered per container ahead of the merge
+EXPORT_CHUNK_BYTES = 64 * 1024    # NDJSON handed to gzip at a time
+EXPORT_GZIP_LEVEL = 1             # logs still compress well; higher levels cost far more CPU
+READY_TIMEOUT_SECONDS = 60        # /ready turns 200 by then even if a host or a backfill is missing
+READY_POLL_SECONDS = 0.05
+MAX_TIME_SECONDS = 253_402_300_800   # 10000-01-01T00:00:00Z
 
-# Load alert keywords from config.yml
-CONFIG_PATH = Path(__file__).parent / "config.yml"
-with open(CONFIG_PATH, "r") as f:
-    CONFIG = yaml.safe_load(f)
+# Nothing below talks to Docker, reads config.yml or starts a thread at
+# import; init_services() builds the config-driven parts at startup and
+# warm_up() fills them in the background.
 
-ALERT_KEYWORDS = CONFIG.get("alert", {}).get("keywords", [])
+# Containers of every configured Docker host, kept current from their events
+INVENTORY = ContainerInventory()
 
-def get_subprocess(container_name):
-    """Get CPU and memory usage of a Docker container using subprocess.
-    Args:
-        container_name (str): The name of the container.
-    Returns:
-        tuple: CPU and memory usage as strings.
+# Live, read-only name -> details mapping over the current inventory snapshot
+CONTAINER_DICT = INVENTORY.view
+
+# Bounded per-container log ring buffers, kept current by the ingest engine.
+LOG_CACHE = ENGINE.store
+metrics.Collected("logforge_log_cache_bytes", "Log bytes held in memory per container.",
+                  LOG_CACHE.sizes, labels=("container",))
+metrics.Collected("logforge_containers", "Containers in the inventory.", lambda: len(INVENTORY.snapshot))
+
+# On-disk log history that outlives Docker's log rotation and container rebuilds
+ARCHIVE = None
+
+# Token index over LOG_CACHE for cross-container search
+SEARCH_INDEX = None
+
+# CPU, memory and I/O time series for running containers
+STATS = None
+
+
+def init_services(config: dict):
+    """Create the Docker clients, cache budgets, archive, search index and stats collector.
+
+    Called once from the app's lifespan. Only objects are built here; the
+    Docker API is first used by warm_up().
     """
-    res = subprocess.run(
-        ['docker', 'stats', container_name, '--no-stream', '--format', '{{.CPUPerc}}|{{.MemUsage}}'],
-        capture_output=True,
-        text=True
-    )
-    if res.returncode == 0:
-        cpu, mem = res.stdout.split('|')
-        return cpu.strip(), mem.strip()
-    return 'N/A', 'N/A'
+    global ARCHIVE, SEARCH_INDEX, STATS
+    INVENTORY.configure(docker_hosts(config))
+    ENGINE.docker = INVENTORY.docker
+    ENGINE.client_for = INVENTORY.client_for
+
+    cache_config = config.get("cache", {})
+    LOG_CACHE.max_bytes = int(cache_config.get("max_mb", 256) * 1024 * 1024)
+    LOG_CACHE.max_container_bytes = int(cache_config.get("container_max_mb", 16) * 1024 * 1024)
+
+    archive_config = config.get("archive", {})
+    ARCHIVE = LogArchive(
+        Path(__file__).parent.parent / archive_config.get("path", "data/archive"),
+        max_bytes=int(archive_config.get("max_mb", 2048) * 1024 * 1024),
+        max_age_seconds=archive_config.get("max_age_hours", 168) * 3600,
+    ) if archive_config.get("enabled") else None
+
+    SEARCH_INDEX = SearchIndex(LOG_CACHE) if config.get("search", {}).get("enabled", True) else None
+
+    stats_config = config.get("stats", {})
+    STATS = StatsCollector(
+        INVENTORY.docker,
+        interval=stats_config.get("interval_seconds", 5),
+        retention=stats_config.get("retention_minutes", 60) * 60,
+    ) if stats_config.get("enabled", True) else None
+    if STATS:
+        STATS.client_for = INVENTORY.client_for
+
+
+class Warmup:
+    """Progress of the background warm-up, as reported by /ready.
+
+    The app serves requests as soon as it starts; this tracks how much of
+    the inventory has been inspected and how many containers are being
+    followed, and when everything was first in place.
+
+    The app is ready once every host has been loaded and every container
+    in the inventory is followed with its backfill delivered, i.e. its log
+    stream has returned its first lines or ended. A host that stays
+    unreachable, or a container that never logs, would hold that off
+    forever, so after READY_TIMEOUT_SECONDS the app is ready regardless and
+    `incomplete` lists what was still missing.
+    """
+
+    def __init__(self):
+        self.started = None      # time.monotonic() when warm_up() began
+        self.loaded_at = None    # ... when every host had been listed and inspected (or given up on)
+        self.ready_at = None     # ... when the criteria above were met, or the timeout ran out
+        self.error = None
+        self.incomplete = None   # what was still missing when the timeout made the app ready
+
+    def begin(self):
+        self.started = time.monotonic()
+        self.loaded_at = self.ready_at = self.error = self.incomplete = None
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None
+
+    @staticmethod
+    def pending() -> dict:
+        """Hosts not loaded yet and inventory containers whose backfill has not arrived."""
+        return {
+            "hosts": INVENTORY.hosts_pending,
+            "containers": sorted(name for name in INVENTORY.snapshot if name not in ENGINE.backfilled),
+        }
+
+    def status(self) -> dict:
+        def elapsed(at):
+            return round((at - self.started) * 1000, 1) if at is not None and self.started is not None else None
+
+        if self.ready:
+            phase = "ready"
+        elif self.loaded_at is not None and not INVENTORY.loaded:
+            phase = "waiting_for_hosts"
+        elif self.loaded_at is not None:
+            phase = "backfilling"
+        elif self.started is not None:
+            phase = "inventory"
+        else:
+            phase = "starting"
+        return {
+            "ready": self.ready,
+            "phase": phase,
+            "error": self.error,
+            "incomplete": self.incomplete,
+            "hosts": {
+                "total": len(INVENTORY.hosts),
+                "listed": len(INVENTORY.listed),
+                "loaded": INVENTORY.hosts_loaded,
+            },
+            "containers": {
+                "listed": sum(INVENTORY.listed.values()),
+                "inspected": sum(INVENTORY.inspected.values()),
+                "following": len(ENGINE.watching),
+                "backfilled": len(ENGINE.backfilled),
+            },
+            "inventory_ms": elapsed(self.loaded_at),
+            "ready_ms": elapsed(self.ready_at),
+        }
+
+
+WARMUP = Warmup()
+
+
+def on_container_change(name: str, info):
+    """Inventory listener: start following containers as they appear, forget removed ones."""
+    ENGINE.on_container_change(name, info)
+    if info is None and SEARCH_INDEX:
+        SEARCH_INDEX.drop(name)
+    if info is None and ARCHIVE:
+        ARCHIVE.release(name)
+
+
+def follow_containers():
+    """Follow the logs and stats of every container currently in the inventory."""
+    ENGINE.sync(CONTAINER_DICT)
+    if STATS:
+        STATS.sync(CONTAINER_DICT)
+
+
+def _host_loaded(host: str):
+    # Also runs for a host that was unreachable at startup, once its events
+    # task has loaded it
+    follow_containers()
+
+
+async def _wait_until_ready():
+    """Mark the app ready once nothing is pending, or when READY_TIMEOUT_SECONDS have passed."""
+    deadline = WARMUP.started + READY_TIMEOUT_SECONDS
+    while True:
+        pending = Warmup.pending()
+        if not any(pending.values()):
+            break
+        if time.monotonic() >= deadline:
+            WARMUP.incomplete = pending
+            logger.warning("Ready after %ds without %d Docker hosts and the backfill of %d containers",
+                           READY_TIMEOUT_SECONDS, len(pending["hosts"]), len(pending["containers"]))
+            break
+        await asyncio.sleep(READY_POLL_SECONDS)
+    WARMUP.ready_at = time.monotonic()
+    logger.info("Following logs for %d containers, ready after %.0f ms",
+                len(ENGINE.watching), (WARMUP.ready_at - WARMUP.started) * 1000)
+
+
+async def warm_up():
+    """Load the inventory and start following containers; returns once the app is ready.
+
+    /containers fills in batches while the inventory loads. Log streams for
+    a host start as soon as that host is loaded rather than during its
+    load, where their backfill would compete with the inspect calls. Hosts
+    that cannot be reached now are retried by their events tasks; see
+    Warmup for when the app counts as ready.
+    """
+    WARMUP.begin()
+    try:
+        await INVENTORY.load(on_host_loaded=_host_loaded)
+        WARMUP.loaded_at = time.monotonic()
+        INVENTORY.start()
+        follow_containers()
+        if not INVENTORY.loaded:
+            logger.warning("Not ready until %d of %d Docker hosts can be loaded",
+                           len(INVENTORY.hosts) - INVENTORY.hosts_loaded, len(INVENTORY.hosts))
+        await _wait_until_ready()
+    except Exception as e:
+        WARMUP.error = repr(e)
+        logger.exception("Warm-up failed: %s", e)
+
 
 # def get_logs(container_name: str, tail: int = 100):
 #     """Get logs for a specific container by name.
@@ -67,142 +258,325 @@ def get_subprocess(container_name):
 #         print(f"Error fetching logs for {container_name}: {e}")
 #         return 'N/A'
 
-def get_ports(attrs:dict) -> list:
-    """Extract and format port mappings from container attributes.
-    Args:
-        attrs (dict): The container's full attribute dictionary.   
-    Returns:
-        list: A list of port mapping strings.
-    """
+def create_docker_dict() -> dict:
+    """Return the Docker containers with their details.
 
-    ports = []
-    raw_ports = attrs['NetworkSettings'].get('Ports') or {}
+    Served from the event-driven inventory and the stats collector, so this
+    makes no Docker API calls.
+    """
+    containers = INVENTORY.containers()
+    for name, info in containers.items():
+        info["cpu"], info["memory"] = STATS.summary(name) if STATS else ('N/A', 'N/A')
+    return containers
 
-    for port, mappings in raw_ports.items():
-        if mappings:
-            for mapping in mappings:
-                ports.append(f'{mapping["HostIp"]}:{mapping["HostPort"]} → {port}')
-        else:
-            ports.append(f'{port} (Not Exposed)')
-    return ports
 
-def get_uptime(started: str, running: bool) -> str:
-    """Calculate human-readable uptime from container's start time.
+def parse_time(value: str) -> int:
+    """Parse a query time parameter into nanoseconds since the epoch.
     Args:
-        started (str): ISO 8601 timestamp when the container started.
-        running (bool): Whether the container is currently running.
+        value (str): Unix seconds (e.g. '1715213776.5') or ISO 8601
+            (e.g. '2025-05-09T00:16:16Z'; naive values are taken as UTC).
     Returns:
-        str: Uptime formatted as 'Xh Ym' or 'N/A' if not running.
+        int: Nanoseconds since the epoch.
+    Raises:
+        ValueError: If the value is neither, is not finite, or lies before
+            1970 or after year 9999.
     """
+    try:
+        seconds = float(value)
+        parsed = None
+    except ValueError:
+        parsed = isoparse(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        seconds = parsed.timestamp()
+    if not math.isfinite(seconds):
+        raise ValueError(f"Time is not finite: {value}")
+    if not 0 <= seconds < MAX_TIME_SECONDS:
+        raise ValueError(f"Time out of range: {value}")
+    if parsed is None:
+        return int(seconds * 1_000_000_000)
+    # Exact to the microsecond, which the float timestamp is not
+    return int(seconds) * 1_000_000_000 + parsed.microsecond * 1000
 
-    if not running:
-        return  'N/A'
-    started_time = isoparse(started)
-    now = datetime.now(timezone.utc)
-    delta = now - started_time
-    secs = int(delta.total_seconds())
-    mins = (secs%3600)//60
-    hours = secs//3600
-    return f'{hours}h {mins}m'
-
-def get_volumes_and_networks(attrs: dict) -> tuple:
-    """Extract volume mounts and connected networks from container attributes.
-    Args:
-        attrs (dict): The container's full attribute dictionary.   
-    Returns:
-        tuple: A list of volume mappings and a list of network names.
-    """
 
-    volumes = [
-        f"{mount['Source']} → {mount['Destination']} ({'rw' if mount.get('RW') else 'ro'})"
-        for mount in attrs.get('Mounts', [])
-    ]
-    networks = list(attrs['NetworkSettings']['Networks'].keys())
-    return volumes, networks
+def find_container(container_name: str):
+    """Look up a container's details in the inventory."""
+    return CONTAINER_DICT.get(container_name)
 
-def create_docker_dict() -> dict:
-    """Create a dictionary of Docker containers with their details.
+
+def log_source(container_name: str, since: int = None, until: int = None):
+    """A container's logs between since and until (ns) as an async stream of batches.
+
+    Served from the archive when it reaches back far enough, or when the
+    container no longer exists in Docker at all; from Docker otherwise.
+    Returns None for a container that is in neither.
+    Raises:
+        ValueError: If the name is not a valid archive directory name.
     """
-    global CONTAINER_DICT
-    containers = client.containers.list(all=True)
-    CONTAINER_DICT.clear()
-    for container in containers:
-        attrs = container.attrs
-        #cpu, mem = get_subprocess(container.name)
-        ports = get_ports(attrs)
-        uptime =  get_uptime(attrs['State']['StartedAt'], attrs['State']['Running'])
-        volumes, networks = get_volumes_and_networks(attrs)
-        cmd = ' '.join(attrs['Config'].get('Cmd') or []) or str(attrs['Config'].get('Entrypoint', ''))
-        CONTAINER_DICT[container.name] ={
-            "status": container.status,
-            #"cpu": cpu,
-            #"memory": mem,
-            "log_path": f'docker logs {container.name}',
-            "container_id": container.short_id,
-            "image": attrs['Config']['Image'],
-            "ports": ports,
-            "volumes": volumes,
-            "networks": networks,
-            "started_at": attrs['State']['StartedAt'],
-            "uptime": uptime,
-            "command": cmd
-        }
-    return CONTAINER_DICT
+    container = find_container(container_name)
+    oldest = ARCHIVE.oldest(container_name) if ARCHIVE else None
+    if oldest is not None and (not container or (since is not None and oldest <= since)):
+        return iter_archived_logs(container_name, since, until)
+    if container:
+        docker = INVENTORY.client_for(container_name)
+        return docker.log_batches(container["container_id"], since=since, until=until, follow=False,
+                                  tty=container.get("tty"))
+    return None
 
 
-def get_filtered_logs(container_name: str) -> str:
-    """Fetch the entire logs from a container and filter all lines by keyword.
-     Args:
-        container_name (str): Docker container name.
-        filter_keyword (str): Keyword to filter for (e.g., 'ERROR').
-    Returns:
-        str: Filtered log lines.
+def parse_label_selector(text: str) -> list:
+    """Parse a selector like 'app=shop,tier!=db,monitored' into (key, op, value) terms.
+
+    `key=value` and `key!=value` compare the label's value; a bare `key`
+    only needs the label to be set. Every term must hold.
+    Raises:
+        ValueError: If a term has an empty key.
     """
+    terms = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "!=" in part:
+            key, value = part.split("!=", 1)
+            op = "!="
+        elif "=" in part:
+            key, value = part.split("=", 1)
+            op = "="
+        else:
+            key, op, value = part, None, None
+        key = key.strip()
+        if not key:
+            raise ValueError(f"Invalid label selector term {part!r}")
+        terms.append((key, op, value.strip() if value is not None else None))
+    return terms
 
-    global CONTAINER_DICT
-    container = CONTAINER_DICT.get(container_name)
 
-    if container is None:
-        create_docker_dict()
-        container = CONTAINER_DICT.get(container_name)
+def select_containers(terms: list) -> list:
+    """Names of the inventory's containers whose labels match every selector term."""
+    selected = []
+    for name, info in CONTAINER_DICT.items():
+        labels = info.get("labels") or {}
+        for key, op, value in terms:
+            if op is None and key not in labels:
+                break
+            if op == "=" and labels.get(key) != value:
+                break
+            if op == "!=" and labels.get(key) == value:
+                break
+        else:
+            selected.append(name)
+    return sorted(selected)
+
+
+def host_of(container_name: str) -> str:
+    """The Docker host a container lives (or lived) on."""
+    info = find_container(container_name)
+    if info is not None:
+        return info["host"]
+    if len(INVENTORY.hosts) > 1 and ":" in container_name:
+        return container_name.split(":", 1)[0]
+    return next(iter(INVENTORY.hosts), None)
 
-    if not container:
-        return 'Container Not Found.'
 
+async def _read_ahead(batches, queue: asyncio.Queue):
+    """Move one source's batches into its bounded queue, then None (or the error that ended it)."""
     try:
-        container_obj = client.containers.get(container['container_id'])
-        logs = container_obj.logs(stdout=True, stderr=True, timestamps=True)
-        logs = logs.decode(errors="ignore").splitlines()
+        async for batch in batches:
+            if batch:
+                await queue.put(batch)
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
-        return f'Failed to fetch logs: {e}'
+        await queue.put(e)
+        return
+    finally:
+        # Cancelled while waiting on a full queue, the source is still open
+        await batches.aclose()
+    await queue.put(None)
+
+
+async def merge_by_time(sources: list, errors: dict):
+    """K-way merge of time-ordered batch streams into one, oldest line first.
+
+    Every source is read ahead concurrently by its own task, at most
+    EXPORT_READ_AHEAD batches deep, and a heap holds the next line of each,
+    so memory depends on the number of sources, not on how much they hold.
+    A source that fails ends early and is recorded in `errors`
+    (source index -> message).
+    Args:
+        sources (list): Async iterables of (ts_ns, message) batches, each
+            in timestamp order.
+    Yields:
+        list: (source index, ts_ns, message) tuples in timestamp order;
+            equal timestamps keep source order.
+    """
+    queues = [asyncio.Queue(EXPORT_READ_AHEAD) for _ in sources]
+    tasks = [asyncio.ensure_future(_read_ahead(batches, queue)) for batches, queue in zip(sources, queues)]
+    batches = [None] * len(sources)
+
+    async def advance(i: int) -> bool:
+        item = await queues[i].get()
+        if isinstance(item, Exception):
+            logger.warning("Export source %d failed: %r", i, item)
+            errors[i] = str(item) or type(item).__name__
+            item = None
+        batches[i] = item
+        return item is not None
 
     try:
-        with open(Path(__file__).parent / "config.yml", "r") as f:
-            config = yaml.safe_load(f)
-        alert_keywords = config.get("alert", {}).get("keywords", [])
-    except Exception as e:
-        return f'Failed to load config: {e}'
+        heap = []
+        for i in range(len(sources)):
+            if await advance(i):
+                heap.append((batches[i][0][0], i, 0))
+        heapq.heapify(heap)
 
-    filtered_logs = [line for line in logs if any(k in line for k in alert_keywords)]
+        out = []
+        while heap:
+            ts, i, pos = heap[0]
+            batch = batches[i]
+            out.append((i, ts, batch[pos][1]))
+            pos += 1
+            if pos < len(batch):
+                heapq.heapreplace(heap, (batch[pos][0], i, pos))
+                continue
+            # This source's batch is used up; hand over what we have before
+            # possibly waiting on its next one
+            yield out
+            out = []
+            if await advance(i):
+                heapq.heapreplace(heap, (batches[i][0][0], i, 0))
+            else:
+                heapq.heappop(heap)
+        if out:
+            yield out
+    finally:
+        for task in tasks:
+            task.cancel()
 
-    return '\n'.join(filtered_logs)
 
+async def export_logs(names: list, since: int = None, until: int = None):
+    """Export several containers' logs over a time range as one gzip-compressed NDJSON stream.
 
-def fetch_logs_background(container_name: str, tail: int = 1000, refresh_interval: int = 60):
-    """Background task to keep container logs fresh."""
-    while True:
-        try:
-            container = client.containers.get(container_name)
-            logs = container.logs(
-                tail=tail,
-                timestamps=True,
-                stdout=True,
-                stderr=True,
-                follow=False
-            ).decode()
-            LOG_CACHE[container_name] = logs
-        except Exception as e:
-            print(f"[LogForge] Error fetching logs for {container_name}: {e}")
-            LOG_CACHE[container_name] = ["[Error fetching logs]"]
-
-        time.sleep(refresh_interval)
\ No newline at end of file
+    Lines from all containers are merged oldest first (see merge_by_time)
+    and compressed in EXPORT_CHUNK_BYTES pieces in a worker thread, so
+    memory stays constant however much is exported.
+    Yields:
+        bytes: gzip data of one {"host", "container", "ts", "line"} object
+            per line, then a final {"containers", "lines", "errors"} summary.
+    """
+    sources = [log_source(name, since, until) for name in names]
+    prefixes = [
+        '{"host":%s,"container":%s,"ts":' % (json.dumps(host_of(name)), json.dumps(name))
+        for name in names
+    ]
+    errors = {}
+    compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip framing
+    out = []
+    size = 0
+    lines = 0
+    async for merged in merge_by_time(sources, errors):
+        for i, ts, msg in merged:
+            record = f'{prefixes[i]}{ts},"line":{json.dumps(msg.decode(errors="replace"))}}}\n'
+            out.append(record)
+            size += len(record)
+        lines += len(merged)
+        if size >= EXPORT_CHUNK_BYTES:
+            data = await asyncio.to_thread(compressor.compress, "".join(out).encode())
+            out, size = [], 0
+            if data:
+                yield data
+
+    out.append(json.dumps({
+        "containers": len(names),
+        "lines": lines,
+        "errors": {names[i]: message for i, message in errors.items()},
+    }) + "\n")
+    yield compressor.compress("".join(out).encode()) + compressor.flush()
+
+
+async def iter_archived_logs(container_name: str, since: int = None, until: int = None):
+    """Read a time range from ARCHIVE as an async stream of line batches."""
+    blocks = ARCHIVE.read_range(container_name, since, until)
+    try:
+        while True:
+            batch = await asyncio.to_thread(next, blocks, None)
+            if batch is None:
+                return
+            yield batch
+    finally:
+        blocks.close()
+
+
+def parse_cursor(value: str) -> tuple:
+    """Parse a `next_cursor` from /logs/filter into (ts_ns, lines to skip at ts_ns).
+
+    A bare timestamp, as older pages returned, skips every line at it.
+    Raises:
+        ValueError: If the value is not a cursor.
+    """
+    ts, sep, skip = value.partition(":")
+    cursor = (int(ts), int(skip) if sep else math.inf)
+    if cursor[0] < 0 or cursor[1] < 0:
+        raise ValueError(f"Invalid cursor: {value}")
+    return cursor
+
+
+async def iter_filtered_logs(batches, limit: int = 1000, cursor: tuple = None, where=None):
+    """Filter a stream of log batches like the alert scan and render matches as NDJSON.
+
+    Lines are filtered as they arrive, so memory stays bounded by one batch
+    however large the container's history is. JSON lines are only parsed
+    when field rules need them.
+    Args:
+        batches: Async iterable of (ts_ns, message) batches, from Docker
+            (`log_batches`) or the archive (`iter_archived_logs`).
+        limit (int): Maximum number of matching lines in this page.
+        cursor (tuple): `next_cursor` from the previous page, parsed by
+            `parse_cursor`; resumes after it.
+        where (FieldRules): Return JSON lines matching these rules instead
+            of the alert keywords and `alert.field_rules`.
+    Yields:
+        bytes: One JSON object per line: {"ts", "line"} for each match, then
+            a final {"next_cursor"} that is null once the range is exhausted.
+            The cursor is 'ts:n', the last line's timestamp and how many
+            matches this and earlier pages returned at it, so lines sharing
+            a timestamp are never lost between pages.
+    """
+    matcher = alert_matcher()
+    rules = alert_rules()
+    after, skip = cursor if cursor is not None else (-1, 0)
+    count = 0
+    last_ts = None
+    at_last_ts = 0   # matches at last_ts, including those skipped from earlier pages
+    try:
+        async for batch in batches:
+            out = []
+            for ts, msg in batch:
+                if ts < after:
+                    continue  # `since` is inclusive
+                if where:
+                    fields = parse_fields(msg)
+                    matched = fields is not None and where.matches(fields)
+                else:
+                    matched = is_alert_line(msg, parse_fields(msg) if rules else None, matcher, rules)
+                if not matched:
+                    continue
+                at_last_ts = at_last_ts + 1 if ts == last_ts else 1
+                last_ts = ts
+                if ts == after and at_last_ts <= skip:
+                    continue  # returned by an earlier page
+                out.append(json.dumps({"ts": ts, "line": format_line(ts, msg)}) + "\n")
+                count += 1
+                if count >= limit:
+                    break
+            if out:
+                yield "".join(out).encode()
+            if count >= limit:
+                yield (json.dumps({"next_cursor": f"{last_ts}:{at_last_ts}"}) + "\n").encode()
+                return
+        yield (json.dumps({"next_cursor": None}) + "\n").encode()
+    finally:
+        # Stopping at `limit` (or a client going away) leaves the upstream
+        # generator suspended; close it now to release its Docker connection
+        await batches.aclose()
@@ -0,0 +1,239 @@
+import time
+import asyncio
+import logging
+
+from . import metrics
+from .docker_async import AsyncDockerClient, DockerAPIError, wait_for
+from .log_store import LogStore
+
+INITIAL_TAIL = 1000  # lines backfilled when a container is first followed
+RETRY_SECONDS = 5
+MAX_RETRY_SECONDS = 60        # longest wait after an error
+MAX_IDLE_SECONDS = 600        # longest wait before re-checking a stopped container
+ACTIVITY_HALF_LIFE_SECONDS = 60
+
+# Docker request priorities for opening log streams; lower goes first
+VIEWED_PRIORITY = 1
+BACKGROUND_PRIORITY = 2       # plus up to 1 for the quietest containers
+
+logger = logging.getLogger(__name__)
+
+LINES_INGESTED = metrics.Counter(
+    "logforge_lines_ingested_total", "Log lines ingested per container.", ("container",))
+BYTES_INGESTED = metrics.Counter(
+    "logforge_bytes_ingested_total", "Log message bytes ingested per container.", ("container",))
+INGEST_LAG = metrics.Gauge(
+    "logforge_ingest_lag_seconds",
+    "Delay between the Docker timestamp of a container's newest line and its ingestion.", ("container",))
+
+
+class IngestEngine:
+    """Follow every container's log stream once and append only new lines.
+
+    All streams are multiplexed on one asyncio event loop: a container costs
+    one socket and one task instead of a polling thread. Each stream resumes
+    from the last timestamp it saw, so reconnects never re-transfer lines.
+
+    As an inventory listener it starts and stops followers as containers
+    come and go. A stream ends when its container stops; it is re-checked
+    after a delay that doubles each time nothing new arrived, and at once
+    when the container starts again. Streams are (re)opened in priority
+    order: containers with viewers first, then the noisiest.
+    """
+
+    def __init__(self, docker: AsyncDockerClient = None, store: LogStore = None, tail: int = INITIAL_TAIL):
+        self.docker = docker   # created on first watch() if not set by then
+        self.store = store if store is not None else LogStore()
+        self.tail = tail
+        # Optional callable(name) -> AsyncDockerClient, for containers spread
+        # over several Docker hosts; `docker` is used when unset.
+        self.client_for = None
+        # Optional callable(name) -> number of live viewers, for priority
+        self.viewers = None
+        self.cursors = {}      # container name -> last ingested ts (ns)
+        self.backfilled = set()  # followed names whose stream has delivered its first lines or ended
+        self.lines_ingested = 0
+        self.bytes_ingested = 0
+        self._tasks = {}       # container name -> asyncio.Task
+        self._ids = {}         # container name -> id being followed
+        self._wake = {}        # container name -> asyncio.Event that cuts a wait short
+        self._states = {}      # container name -> "connecting", "streaming", "waiting" or "gone"
+        self._activity = {}    # container name -> (decayed line count, time.monotonic() of last update)
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Register callback(container_name, lines) for every ingested batch.
+
+        `lines` is a list of (ts_ns, message bytes). Callbacks run on the
+        event loop and must not block.
+        """
+        self._listeners.append(callback)
+
+    def watch(self, name: str, container_id: str, tty: bool = None):
+        """Start following a container unless it is already followed.
+
+        A name that now belongs to another container (one rebuilt under the
+        same name) is followed on the new id. `tty` is the container's
+        `Config.Tty`, which decides how its log stream is framed.
+        """
+        task = self._tasks.get(name)
+        if task and not task.done():
+            if self._ids.get(name) == container_id:
+                return
+            task.cancel()
+        docker = self.client_for(name) if self.client_for else self.docker
+        if docker is None:
+            docker = self.docker = AsyncDockerClient()
+        self._ids[name] = container_id
+        self.backfilled.discard(name)
+        self._wake[name] = asyncio.Event()
+        self._tasks[name] = asyncio.get_running_loop().create_task(
+            self._follow(name, container_id, docker, tty), name=f"ingest:{name}"
+        )
+
+    def wake(self, name: str):
+        """Reconnect a container's stream now if it is waiting to be re-checked."""
+        event = self._wake.get(name)
+        if event is not None:
+            event.set()
+
+    def unwatch(self, name: str):
+        """Stop following a container and drop its cached lines."""
+        task = self._tasks.pop(name, None)
+        if task:
+            task.cancel()
+        for state in (self.cursors, self._ids, self._wake, self._states, self._activity):
+            state.pop(name, None)
+        self.backfilled.discard(name)
+        self.store.drop(name)
+        for metric in (LINES_INGESTED, BYTES_INGESTED, INGEST_LAG):
+            metric.remove(name)
+
+    def sync(self, containers: dict):
+        """Follow exactly the containers in `containers` (name -> info dict)."""
+        for name in list(self._tasks):
+            if name not in containers:
+                self.unwatch(name)
+        for name, info in containers.items():
+            self.watch(name, info["container_id"], info.get("tty"))
+
+    def on_container_change(self, name: str, info):
+        """Inventory listener: follow containers as they appear, drop them when removed.
+
+        A stopped container keeps its cached lines; one that is running
+        (again) is reconnected without waiting out its backoff.
+        """
+        if info is None:
+            self.unwatch(name)
+            return
+        if info["status"] == "running":
+            self.wake(name)
+        self.watch(name, info["container_id"], info.get("tty"))
+
+    @property
+    def watching(self) -> list:
+        return [name for name, task in self._tasks.items() if not task.done()]
+
+    def follower_states(self) -> dict:
+        """Number of followed containers per state."""
+        counts = {"connecting": 0, "streaming": 0, "waiting": 0, "gone": 0}
+        for state in list(self._states.values()):
+            counts[state] += 1
+        return counts
+
+    def priority(self, name: str) -> float:
+        """Docker request priority for (re)opening a container's stream; lower goes first."""
+        if self.viewers is not None and self.viewers(name):
+            return VIEWED_PRIORITY
+        return BACKGROUND_PRIORITY + 1 / (1 + self._recent_lines(name, time.monotonic()))
+
+    def _recent_lines(self, name: str, now: float) -> float:
+        """Lines ingested lately, each counting half as much per ACTIVITY_HALF_LIFE_SECONDS of age."""
+        count, at = self._activity.get(name, (0.0, now))
+        return count * 0.5 ** ((now - at) / ACTIVITY_HALF_LIFE_SECONDS)
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _ingest(self, name: str, batch: list):
+        cursor = self.cursors.get(name, 0)
+        # Docker's `since` is inclusive, so a resumed stream repeats the
+        # line at the cursor; drop anything we have already seen.
+        if batch[0][0] <= cursor:
+            batch = [entry for entry in batch if entry[0] > cursor]
+            if not batch:
+                return
+
+        self.store.append(name, batch)
+        size = sum(len(msg) for _, msg in batch)
+        self.lines_ingested += len(batch)
+        self.bytes_ingested += size
+        self.cursors[name] = batch[-1][0]
+        now = time.monotonic()
+        self._activity[name] = (self._recent_lines(name, now) + len(batch), now)
+        LINES_INGESTED.inc(len(batch), name)
+        BYTES_INGESTED.inc(size, name)
+        INGEST_LAG.set((time.time_ns() - batch[-1][0]) / 1e9, name)
+
+        for callback in self._listeners:
+            try:
+                callback(name, batch)
+            except Exception as e:
+                logger.exception("Ingest listener failed for %s: %s", name, e)
+
+    async def _follow(self, name: str, container_id: str, docker: AsyncDockerClient, tty: bool = None):
+        delay = RETRY_SECONDS
+        wake = self._wake[name]
+        while True:
+            cursor = self.cursors.get(name)
+            # A wake-up that arrives while streaming still counts once the
+            # stream ends, e.g. for a container that restarted in between.
+            wake.clear()
+            self._states[name] = "connecting"
+            try:
+                async for batch in docker.log_batches(
+                    container_id,
+                    since=cursor,
+                    tail=None if cursor else self.tail,
+                    follow=True,
+                    tty=tty,
+                    priority=self.priority(name),
+                ):
+                    self._states[name] = "streaming"
+                    self.backfilled.add(name)
+                    if batch:
+                        self._ingest(name, batch)
+            except asyncio.CancelledError:
+                raise
+            except DockerAPIError as e:
+                if e.status == 404:
+                    logger.info("Container %s no longer exists; stopped following its logs", name)
+                    self._states[name] = "gone"
+                    self.backfilled.add(name)
+                    return
+                logger.warning("Error following logs for %s: %s", name, e)
+                delay = min(delay * 2, MAX_RETRY_SECONDS)
+            except Exception as e:
+                logger.warning("Error following logs for %s: %s", name, e)
+                delay = min(delay * 2, MAX_RETRY_SECONDS)
+            else:
+                self.backfilled.add(name)
+                # The stream ends when the container stops. Check back soon
+                # if it was still logging, less and less often if not.
+                delay = RETRY_SECONDS if self.cursors.get(name) != cursor else min(delay * 2, MAX_IDLE_SECONDS)
+
+            self._states[name] = "waiting"
+            try:
+                await wait_for(wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+ENGINE = IngestEngine()
+
+metrics.Collected("logforge_ingest_followers", "Followed containers by state of their log stream.",
+                  ENGINE.follower_states, labels=("state",))
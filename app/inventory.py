@@ -0,0 +1,402 @@
+import time
+import asyncio
+import logging
+from collections.abc import Mapping
+from urllib.parse import quote
+
+from dateutil.parser import isoparse
+
+from .docker_async import (
+    AsyncDockerClient, DockerAPIError, format_since, MAX_CONNECTIONS, REQUEST_TIMEOUT_SECONDS
+)
+
+INSPECT_CONCURRENCY = 16   # inspect calls in flight per host while loading the inventory
+PUBLISH_EVERY = 32         # inspected containers per partial snapshot while loading
+RETRY_SECONDS = 5
+MAX_RETRY_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+# Container events that can change what /containers reports. Anything else
+# (exec_*, attach, top, ...) is filtered out by the daemon.
+WATCHED_EVENTS = (
+    "create", "start", "restart", "stop", "die", "kill", "pause", "unpause",
+    "rename", "update", "destroy", "health_status",
+)
+
+
+def get_ports(attrs:dict) -> list:
+    """Extract and format port mappings from container attributes.
+    Args:
+        attrs (dict): The container's full attribute dictionary.
+    Returns:
+        list: A list of port mapping strings.
+    """
+
+    ports = []
+    raw_ports = attrs['NetworkSettings'].get('Ports') or {}
+
+    for port, mappings in raw_ports.items():
+        if mappings:
+            for mapping in mappings:
+                ports.append(f'{mapping["HostIp"]}:{mapping["HostPort"]} → {port}')
+        else:
+            ports.append(f'{port} (Not Exposed)')
+    return ports
+
+def format_uptime(started: float) -> str:
+    """Format the time since `started` (epoch seconds) as 'Xh Ym', or 'N/A' if None."""
+    if started is None:
+        return 'N/A'
+    secs = int(time.time() - started)
+    mins = (secs%3600)//60
+    hours = secs//3600
+    return f'{hours}h {mins}m'
+
+def get_uptime(started: str, running: bool) -> str:
+    """Calculate human-readable uptime from container's start time.
+    Args:
+        started (str): ISO 8601 timestamp when the container started.
+        running (bool): Whether the container is currently running.
+    Returns:
+        str: Uptime formatted as 'Xh Ym' or 'N/A' if not running.
+    """
+
+    if not running:
+        return  'N/A'
+    return format_uptime(isoparse(started).timestamp())
+
+def get_volumes_and_networks(attrs: dict) -> tuple:
+    """Extract volume mounts and connected networks from container attributes.
+    Args:
+        attrs (dict): The container's full attribute dictionary.
+    Returns:
+        tuple: A list of volume mappings and a list of network names.
+    """
+
+    volumes = [
+        f"{mount['Source']} → {mount['Destination']} ({'rw' if mount.get('RW') else 'ro'})"
+        for mount in attrs.get('Mounts', [])
+    ]
+    networks = list((attrs['NetworkSettings'].get('Networks') or {}).keys())
+    return volumes, networks
+
+def container_info(attrs: dict) -> dict:
+    """Build a container's /containers entry (without uptime) from its inspect data."""
+    name = attrs['Name'].lstrip('/')
+    volumes, networks = get_volumes_and_networks(attrs)
+    cmd = ' '.join(attrs['Config'].get('Cmd') or []) or str(attrs['Config'].get('Entrypoint', ''))
+    return {
+        "status": attrs['State']['Status'],
+        "log_path": f'docker logs {name}',
+        "container_id": attrs['Id'][:12],
+        "image": attrs['Config']['Image'],
+        "ports": get_ports(attrs),
+        "volumes": volumes,
+        "networks": networks,
+        "started_at": attrs['State']['StartedAt'],
+        "command": cmd,
+        "labels": attrs['Config'].get('Labels') or {},
+        "tty": bool(attrs['Config'].get('Tty'))
+    }
+
+
+class _Entry:
+    __slots__ = ("host", "id", "name", "info", "started")
+
+    def __init__(self, host: str, name: str, attrs: dict):
+        self.host = host
+        self.id = attrs['Id']
+        self.name = name
+        self.info = container_info(attrs)
+        self.info["host"] = host
+        running = attrs['State']['Running']
+        # Parsed once here so reads only do arithmetic for the uptime column
+        self.started = isoparse(attrs['State']['StartedAt']).timestamp() if running else None
+
+
+class SnapshotView(Mapping):
+    """Read-only mapping of container name -> details over the current snapshot.
+
+    Every lookup goes to whichever snapshot is current, so a module-level
+    reference never goes stale. Take `inventory.snapshot` once instead when
+    several reads must agree with each other.
+    """
+
+    def __init__(self, inventory: "ContainerInventory"):
+        self._inventory = inventory
+
+    def __getitem__(self, name: str) -> dict:
+        return self._inventory.snapshot[name]
+
+    def __iter__(self):
+        return iter(self._inventory.snapshot)
+
+    def __len__(self) -> int:
+        return len(self._inventory.snapshot)
+
+    def items(self):
+        return self._inventory.snapshot.items()
+
+
+class ContainerInventory:
+    """Container details for one or more Docker hosts, kept current from their events streams.
+
+    Each host's containers are inspected once by `load()`; after that one
+    task per host follows /events and re-inspects only the container an
+    event is about. Each change builds a new snapshot dict and swaps it in
+    with one assignment, so readers on any thread see either the old or
+    the new inventory, never a half-built one, and reads cost no Docker
+    API calls.
+
+    With more than one host, container names are namespaced as
+    'host:name'. Hosts are loaded and followed independently, so a slow or
+    unreachable host only delays its own containers. While a host loads,
+    its containers are published in batches as they are inspected, so the
+    first ones are usable long before the last inspect returns.
+    """
+
+    def __init__(self, hosts: dict = None):
+        self.hosts = hosts or {}   # host name -> client; see configure()
+        self.snapshot = {}      # name -> info dict; replaced, never mutated
+        self.view = SnapshotView(self)
+        self.events_seen = 0
+        self._entries = {}      # (host, full container id) -> _Entry
+        self._clients = {}      # name -> AsyncDockerClient of its host
+        self._loaded = set()    # hosts whose full list has been inspected
+        self._since = {}        # host -> ns of the last event seen, to resume /events from
+        self._load_started = {}  # host -> ns its first unfinished load attempt started at
+        self._tasks = {}        # host -> asyncio.Task
+        self._listeners = []
+        self._on_host_loaded = None
+        self.listed = {}        # host -> containers in its list, once listed
+        self.inspected = {}     # host -> containers inspected so far by the current load
+
+    def configure(self, hosts: dict):
+        """Set the Docker hosts to load and follow, forgetting any earlier ones. Call before `load()`."""
+        self.hosts = hosts
+        self.snapshot = {}
+        self._entries = {}
+        self._clients = {}
+        self._loaded = set()
+        self._since = {}
+        self._load_started = {}
+        self.listed = {}
+        self.inspected = {}
+
+    @property
+    def docker(self) -> AsyncDockerClient:
+        """The first host's client, for single-host callers."""
+        return next(iter(self.hosts.values()), None)
+
+    @property
+    def loaded(self) -> bool:
+        return len(self._loaded) == len(self.hosts)
+
+    @property
+    def hosts_loaded(self) -> int:
+        return len(self._loaded)
+
+    @property
+    def hosts_pending(self) -> list:
+        """Hosts whose containers have not all been loaded yet."""
+        return [host for host in self.hosts if host not in self._loaded]
+
+    def qualify(self, host: str, name: str) -> str:
+        return f"{host}:{name}" if len(self.hosts) > 1 else name
+
+    def client_for(self, name: str) -> AsyncDockerClient:
+        """The client for the host a container lives on."""
+        return self._clients.get(name) or self.docker
+
+    def add_listener(self, callback):
+        """Register callback(name, info) for every container change.
+
+        `info` is None when the container was removed. Callbacks run on the
+        event loop and must not block.
+        """
+        self._listeners.append(callback)
+
+    def containers(self) -> dict:
+        """Return the current inventory with uptimes filled in."""
+        return {
+            entry.name: {**entry.info, "uptime": format_uptime(entry.started)}
+            for entry in self._entries.values()
+        }
+
+    async def _inspect(self, host: str, container_id: str):
+        """Return a container's inspect data, or None if it no longer exists."""
+        try:
+            return await self.hosts[host].get_json(f"/containers/{quote(container_id, safe='')}/json")
+        except DockerAPIError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def _entry(self, host: str, attrs: dict) -> _Entry:
+        return _Entry(host, self.qualify(host, attrs['Name'].lstrip('/')), attrs)
+
+    async def load(self, on_host_loaded=None):
+        """Inspect every container on every host, concurrently.
+
+        Each Docker request is bounded by its client's timeout rather than
+        the load as a whole, so a large host that keeps answering finishes
+        loading however long it takes. A host that fails is reported and
+        left to its events task to retry, which keeps the containers the
+        failed attempt already inspected. `on_host_loaded(host)`, if given,
+        is called as each host's containers are all published, including a
+        host that only loads later on such a retry, so callers can start on
+        one host without waiting for the slowest.
+        """
+        self._on_host_loaded = on_host_loaded
+
+        async def load_host(host: str):
+            try:
+                await self._load_host(host)
+            except Exception as e:
+                logger.warning("Could not list containers on %s: %r", host, e)
+
+        await asyncio.gather(*(load_host(host) for host in self.hosts))
+
+    async def _load_host(self, host: str):
+        # Events from the first attempt on are replayed by _follow(), so
+        # nothing that changes while the list is being inspected can be
+        # missed, including containers a failed attempt already inspected.
+        self._load_started.setdefault(host, time.time_ns())
+        summaries = await self.hosts[host].get_json("/containers/json", {"all": True})
+        known = {key: entry for key, entry in self._entries.items() if key[0] == host}
+        fresh = {(host, s["Id"]): known[(host, s["Id"])] for s in summaries if (host, s["Id"]) in known}
+        self.listed[host] = len(summaries)
+        self.inspected[host] = len(fresh)
+        limit = asyncio.Semaphore(INSPECT_CONCURRENCY)
+
+        async def inspect(container_id: str):
+            async with limit:
+                return await self._inspect(host, container_id)
+
+        # Partial snapshots add to what is already known and never drop a
+        # container; the final one below is exact.
+        pending = 0
+        tasks = [asyncio.ensure_future(inspect(s["Id"])) for s in summaries if (host, s["Id"]) not in fresh]
+        try:
+            for result in asyncio.as_completed(tasks):
+                attrs = await result
+                self.inspected[host] += 1
+                if attrs is None:
+                    continue
+                fresh[(host, attrs['Id'])] = self._entry(host, attrs)
+                pending += 1
+                if pending >= PUBLISH_EVERY:
+                    self._publish({**self._entries, **fresh})
+                    pending = 0
+        except Exception:
+            # Keep what was inspected for the retry to start from
+            if pending:
+                self._publish({**self._entries, **fresh})
+            raise
+        finally:
+            # On an error, don't leave the other inspects running
+            for task in tasks:
+                task.cancel()
+
+        entries = {key: entry for key, entry in self._entries.items() if key[0] != host}
+        entries.update(fresh)
+        self._publish(entries)
+        self._since[host] = self._load_started.pop(host)
+        self._loaded.add(host)
+        if self._on_host_loaded:
+            try:
+                self._on_host_loaded(host)
+            except Exception as e:
+                logger.exception("Host loaded callback failed for %s: %s", host, e)
+
+    def _publish(self, entries: dict):
+        self._entries = entries
+        self._clients = {entry.name: self.hosts[entry.host] for entry in entries.values()}
+        self.snapshot = {entry.name: entry.info for entry in entries.values()}
+
+    def _notify(self, name: str, info):
+        for callback in self._listeners:
+            try:
+                callback(name, info)
+            except Exception as e:
+                logger.exception("Inventory listener failed for %s: %s", name, e)
+
+    async def refresh(self, host: str, container_id: str):
+        """Re-inspect one container and swap the updated entry into the inventory."""
+        attrs = await self._inspect(host, container_id)
+        entries = dict(self._entries)
+        old = entries.pop((host, container_id), None)
+        if attrs is not None:
+            entry = entries[(host, container_id)] = self._entry(host, attrs)
+        self._publish(entries)
+
+        if old is not None and (attrs is None or old.name != entry.name):
+            self._notify(old.name, None)
+        if attrs is not None:
+            self._notify(entry.name, entry.info)
+
+    def start(self):
+        """Start following every host's /events on the running loop. Call after `load()`."""
+        loop = asyncio.get_running_loop()
+        for host in self.hosts:
+            task = self._tasks.get(host)
+            if task is None or task.done():
+                self._tasks[host] = loop.create_task(self._follow(host), name=f"inventory-events:{host}")
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for client in self.hosts.values():
+            await client.close()
+
+    async def _follow(self, host: str):
+        """Apply a host's container events until cancelled, reconnecting with backoff."""
+        delay = RETRY_SECONDS
+        filters = '{"type":["container"],"event":[%s]}' % ",".join(f'"{e}"' for e in WATCHED_EVENTS)
+        while True:
+            try:
+                if host not in self._loaded:
+                    await self._load_host(host)
+                # `since` replays whatever happened while we were disconnected
+                async for event in self.hosts[host].stream_json("/events", {
+                    "since": format_since(self._since[host]),
+                    "filters": filters,
+                }):
+                    self.events_seen += 1
+                    self._since[host] = max(self._since[host], event.get("timeNano") or 0)
+                    container_id = event.get("Actor", {}).get("ID") or event.get("id")
+                    if container_id:
+                        await self.refresh(host, container_id)
+                    delay = RETRY_SECONDS
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Error following Docker events on %s: %r", host, e)
+                delay = min(delay * 2, MAX_RETRY_SECONDS)
+            await asyncio.sleep(delay)
+
+
+def docker_hosts(config: dict) -> dict:
+    """Build one client per configured Docker host (host name -> AsyncDockerClient).
+
+    Reads `docker.hosts` (name -> URL such as unix:///var/run/docker.sock
+    or tcp://10.0.0.5:2375); with none configured, the single host from
+    DOCKER_HOST is used. `docker.max_connections` and
+    `docker.timeout_seconds` size each client's pool and request timeout.
+    """
+    docker = config.get("docker") or {}
+    options = {
+        "max_connections": docker.get("max_connections", MAX_CONNECTIONS),
+        "timeout": docker.get("timeout_seconds", REQUEST_TIMEOUT_SECONDS),
+    }
+    hosts = docker.get("hosts") or {}
+    if not hosts:
+        return {"local": AsyncDockerClient(**options)}
+    for name in hosts:
+        if ":" in name:
+            raise ValueError(f"Docker host name may not contain ':': {name}")
+    return {name: AsyncDockerClient(url, **options) for name, url in hosts.items()}
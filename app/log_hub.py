@@ -0,0 +1,98 @@
+import asyncio
+from collections import defaultdict
+
+from . import metrics
+from .log_store import format_line
+
+QUEUE_BATCHES = 256        # batches buffered per subscriber before dropping
+MAX_FRAME_BYTES = 64 * 1024
+
+DROPPED_BATCHES = metrics.Counter(
+    "logforge_websocket_dropped_batches_total",
+    "Log batches dropped because a WebSocket viewer fell behind.", ("container",))
+
+
+class Subscriber:
+    """One WebSocket viewer's bounded queue of pre-rendered log batches.
+
+    When the viewer falls behind and the queue is full, the oldest batch is
+    dropped so a slow client can never hold up ingestion or other viewers.
+    The next frame it receives starts with a note saying how much it missed.
+    """
+
+    __slots__ = ("queue", "dropped", "_unreported")
+
+    def __init__(self, maxsize: int = QUEUE_BATCHES):
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+        self._unreported = 0
+
+    def offer(self, chunk: str) -> bool:
+        """Queue a batch; returns False if the oldest batch had to be dropped for it."""
+        dropped = self.queue.full()
+        if dropped:
+            self.queue.get_nowait()
+            self.dropped += 1
+            self._unreported += 1
+        self.queue.put_nowait(chunk)
+        return not dropped
+
+    async def next_frame(self, max_bytes: int = MAX_FRAME_BYTES) -> str:
+        """Wait for new lines, then return everything queued (up to max_bytes) as one frame."""
+        parts = [await self.queue.get()]
+        size = len(parts[0])
+        while size < max_bytes and not self.queue.empty():
+            chunk = self.queue.get_nowait()
+            parts.append(chunk)
+            size += len(chunk)
+        if self._unreported:
+            parts.insert(0, f"[LogForge] {self._unreported} log batches dropped (slow consumer)\n")
+            self._unreported = 0
+        return "".join(parts)
+
+
+class LogHub:
+    """Fan out ingested log lines to every WebSocket viewer of a container.
+
+    The ingest engine already holds the one upstream Docker stream per
+    container; the hub renders each ingested batch once and hands it to
+    every subscriber's queue. Must be used from the event loop thread.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, container: str) -> Subscriber:
+        sub = Subscriber()
+        self._subscribers[container].add(sub)
+        return sub
+
+    def unsubscribe(self, container: str, sub: Subscriber):
+        subs = self._subscribers.get(container)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del self._subscribers[container]
+
+    def viewers(self, container: str) -> int:
+        return len(self._subscribers.get(container, ()))
+
+    def all_viewers(self) -> dict:
+        """Viewer count per container that has any."""
+        return {container: len(subs) for container, subs in list(self._subscribers.items())}
+
+    def publish(self, container: str, lines: list):
+        """Ingest listener: broadcast a batch of (ts_ns, message) lines."""
+        subs = self._subscribers.get(container)
+        if not subs:
+            return
+        chunk = "".join(format_line(ts, msg) + "\n" for ts, msg in lines)
+        for sub in subs:
+            if not sub.offer(chunk):
+                DROPPED_BATCHES.inc(1, container)
+
+
+HUB = LogHub()
+
+metrics.Collected("logforge_websocket_subscribers", "Open WebSocket log viewers per container.",
+                  HUB.all_viewers, labels=("container",))
@@ -0,0 +1,296 @@
+import threading
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timezone
+
+from .structured import parse_fields
+
+LINE_OVERHEAD = 24  # bytes of storage per line: timestamp, end offset, fields slot
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_CONTAINER_MAX_BYTES = 16 * 1024 * 1024
+
+
+def format_line(ts_ns: int, msg: bytes) -> str:
+    """Render a stored line the way `docker logs --timestamps` prints it."""
+    secs, frac = divmod(ts_ns, 1_000_000_000)
+    stamp = datetime.fromtimestamp(secs, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+    return f"{stamp}.{frac:09d}Z {msg.decode(errors='ignore')}"
+
+
+class RingBuffer:
+    """Append-only ring of log lines for one container.
+
+    Line bytes are concatenated into one bytearray; end offsets and integer
+    timestamps live in parallel arrays. Evicting advances `head`, and the
+    evicted prefix is compacted away once it makes up half the buffer, so
+    append and evict are both amortised O(1).
+
+    Every line gets a sequence number that never changes, which lets readers
+    keep a cursor across evictions.
+
+    JSON lines are parsed lazily, the first time a reader asks for fields,
+    and the result is kept in `fields` (None: not parsed yet, False: not
+    JSON). A parsed line is charged its length a second time, as a rough
+    stand-in for the dict's memory.
+    """
+
+    __slots__ = ("data", "ends", "stamps", "fields", "head", "seq0", "nbytes")
+
+    def __init__(self, seq0: int = 0):
+        self.data = bytearray()
+        self.ends = array("Q")
+        self.stamps = array("q")
+        self.fields = []
+        self.head = 0    # index of the oldest live line
+        self.seq0 = seq0 # sequence number of index 0
+        self.nbytes = 0  # live bytes, including per-line overhead
+
+    def __len__(self) -> int:
+        return len(self.ends) - self.head
+
+    @property
+    def first_seq(self) -> int:
+        return self.seq0 + self.head
+
+    @property
+    def next_seq(self) -> int:
+        return self.seq0 + len(self.ends)
+
+    def append(self, ts: int, msg: bytes):
+        self.data += msg
+        self.ends.append(len(self.data))
+        self.stamps.append(ts)
+        self.fields.append(None)
+        self.nbytes += len(msg) + LINE_OVERHEAD
+
+    def evict(self, nbytes: int) -> int:
+        """Drop the oldest lines until at least `nbytes` are freed. Returns bytes freed."""
+        freed = 0
+        ends, fields, head, stop = self.ends, self.fields, self.head, len(self.ends)
+        start = ends[head - 1] if head else 0
+        while freed < nbytes and head < stop:
+            size = ends[head] - start
+            freed += size + LINE_OVERHEAD
+            if fields[head]:
+                freed += size
+                fields[head] = None
+            start = ends[head]
+            head += 1
+        self.head = head
+        self.nbytes -= freed
+        if head > 1024 and head * 2 > stop:
+            self._compact()
+        return freed
+
+    def _compact(self):
+        head = self.head
+        cut = self.ends[head - 1]
+        del self.data[:cut]
+        self.ends = array("Q", (end - cut for end in self.ends[head:]))
+        del self.stamps[:head]
+        del self.fields[:head]
+        self.seq0 += head
+        self.head = 0
+
+    def _fields(self, i: int, msg: bytes):
+        fields = self.fields[i]
+        if fields is None:
+            fields = parse_fields(msg)
+            if fields is None:
+                fields = False
+            else:
+                self.nbytes += len(msg)
+            self.fields[i] = fields
+        return fields or None
+
+    def _slice(self, lo: int, hi: int, with_fields: bool = False) -> list:
+        if lo >= hi:
+            return []
+        data, ends, stamps = self.data, self.ends, self.stamps
+        start = ends[lo - 1] if lo else 0
+        out = []
+        for i in range(lo, hi):
+            end = ends[i]
+            msg = bytes(data[start:end])
+            out.append((stamps[i], msg, self._fields(i, msg)) if with_fields else (stamps[i], msg))
+            start = end
+        return out
+
+    def tail(self, n: int) -> list:
+        stop = len(self.ends)
+        return self._slice(max(self.head, stop - n), stop)
+
+    def since(self, ts: int, limit: int = None) -> list:
+        lo = bisect_left(self.stamps, ts, self.head)
+        hi = len(self.ends) if limit is None else min(len(self.ends), lo + limit)
+        return self._slice(lo, hi)
+
+    def seq_at(self, ts: int) -> int:
+        return self.seq0 + bisect_left(self.stamps, ts, self.head)
+
+    def lines_at(self, seqs, with_fields: bool = False) -> list:
+        out = []
+        data, ends, stamps = self.data, self.ends, self.stamps
+        for seq in seqs:
+            i = seq - self.seq0
+            if self.head <= i < len(ends):
+                start = ends[i - 1] if i else 0
+                msg = bytes(data[start:ends[i]])
+                out.append((seq, stamps[i], msg, self._fields(i, msg)) if with_fields else (seq, stamps[i], msg))
+        return out
+
+    def read_from(self, seq: int, limit: int = None, with_fields: bool = False) -> tuple:
+        lo = max(seq - self.seq0, self.head)
+        hi = len(self.ends) if limit is None else min(len(self.ends), lo + limit)
+        return self._slice(lo, hi, with_fields), self.seq0 + hi
+
+
+class LogStore:
+    """Bounded in-memory log store: one RingBuffer per container.
+
+    Each container is capped at `max_container_bytes`; once all containers
+    together exceed `max_bytes`, the oldest lines of the largest buffers are
+    evicted until the store is back under 90% of the budget.
+
+    Sequence numbers are never reused: a container that is dropped and
+    cached again (one recreated under the same name) continues after the
+    old buffer's last number, so a reader's old cursor just starts at the
+    new buffer's first line.
+
+    All methods are thread-safe. Lines come back as (ts_ns, message bytes).
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_container_bytes: int = DEFAULT_CONTAINER_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.max_container_bytes = max_container_bytes
+        self.total_bytes = 0
+        self._buffers = {}
+        self._next_seq0 = 0  # above every sequence number a dropped buffer used
+        self._lock = threading.Lock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._buffers
+
+    def keys(self) -> list:
+        return list(self._buffers)
+
+    def append(self, name: str, lines: list):
+        """Append a batch of (ts_ns, message bytes) lines to a container."""
+        with self._lock:
+            buf = self._buffers.get(name)
+            if buf is None:
+                buf = self._buffers[name] = RingBuffer(self._next_seq0)
+            before = buf.nbytes
+            for ts, msg in lines:
+                buf.append(ts, msg)
+            if buf.nbytes > self.max_container_bytes:
+                buf.evict(buf.nbytes - self.max_container_bytes)
+            self.total_bytes += buf.nbytes - before
+            if self.total_bytes > self.max_bytes:
+                self._enforce_budget()
+
+    def _enforce_budget(self):
+        target = int(self.max_bytes * 0.9)
+        while self.total_bytes > target:
+            largest = max(self._buffers.values(), key=lambda b: b.nbytes)
+            excess = self.total_bytes - target
+            freed = largest.evict(min(excess, largest.nbytes // 4 + 1))
+            if not freed:
+                break
+            self.total_bytes -= freed
+
+    def drop(self, name: str):
+        """Forget a container entirely, e.g. once it has been removed."""
+        with self._lock:
+            buf = self._buffers.pop(name, None)
+            if buf:
+                self.total_bytes -= buf.nbytes
+                self._next_seq0 = max(self._next_seq0, buf.next_seq)
+
+    def tail(self, name: str, n: int) -> list:
+        """Return the last `n` lines of a container."""
+        with self._lock:
+            buf = self._buffers.get(name)
+            return buf.tail(n) if buf else []
+
+    def since(self, name: str, ts: int, limit: int = None) -> list:
+        """Return lines at or after `ts` (ns), oldest first."""
+        with self._lock:
+            buf = self._buffers.get(name)
+            return buf.since(ts, limit) if buf else []
+
+    def read_from(self, name: str, seq: int, limit: int = None, with_fields: bool = False) -> tuple:
+        """Return (lines, next_seq) for lines with sequence number >= `seq`.
+
+        Lines evicted since the caller's cursor are skipped silently; pass
+        the returned `next_seq` back in to continue where this call stopped.
+        With `with_fields`, lines are (ts_ns, message, fields) where fields
+        is the cached `parse_fields` result (None for non-JSON lines).
+        """
+        with self._lock:
+            buf = self._buffers.get(name)
+            if buf is None:
+                return [], seq
+            if not with_fields:
+                return buf.read_from(seq, limit)
+            before = buf.nbytes
+            result = buf.read_from(seq, limit, True)
+            self.total_bytes += buf.nbytes - before
+            return result
+
+    def lines_at(self, name: str, seqs, with_fields: bool = False) -> list:
+        """Return (seq, ts_ns, message) for each still-cached sequence number in `seqs`.
+
+        With `with_fields`, each tuple also carries the line's cached fields.
+        """
+        with self._lock:
+            buf = self._buffers.get(name)
+            if buf is None:
+                return []
+            before = buf.nbytes
+            result = buf.lines_at(seqs, with_fields)
+            self.total_bytes += buf.nbytes - before
+            return result
+
+    def first_seq(self, name: str) -> int:
+        """Sequence number of the oldest line still cached for `name`."""
+        with self._lock:
+            buf = self._buffers.get(name)
+            return buf.first_seq if buf else 0
+
+    def seq_at(self, name: str, ts: int) -> int:
+        """Sequence number of the first line at or after `ts` (ns)."""
+        with self._lock:
+            buf = self._buffers.get(name)
+            return buf.seq_at(ts) if buf else 0
+
+    def next_seq(self, name: str) -> int:
+        """Sequence number the next appended line for `name` will get."""
+        with self._lock:
+            buf = self._buffers.get(name)
+            return buf.next_seq if buf else 0
+
+    def sizes(self) -> dict:
+        """Bytes cached per container."""
+        with self._lock:
+            return {name: buf.nbytes for name, buf in self._buffers.items()}
+
+    def stats(self) -> dict:
+        """Per-container line counts, byte usage and time range."""
+        with self._lock:
+            containers = {}
+            for name, buf in self._buffers.items():
+                n = len(buf)
+                containers[name] = {
+                    "lines": n,
+                    "bytes": buf.nbytes,
+                    "oldest": buf.stamps[buf.head] if n else None,
+                    "newest": buf.stamps[-1] if n else None,
+                }
+            return {
+                "total_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "max_container_bytes": self.max_container_bytes,
+                "containers": containers,
+            }
@@ -1,13 +1,38 @@
+import re
 import time
 import asyncio
+import logging
 import threading
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.docker_utils import create_docker_dict, get_filtered_logs, fetch_logs_background, CONTAINER_DICT, LOG_CACHE, client
+from app.docker_utils import (
+    create_docker_dict, export_logs, find_container, iter_filtered_logs, log_source,
+    parse_cursor, parse_label_selector, parse_time, select_containers,
+    CONTAINER_DICT, EXPORT_MAX_CONTAINERS, INVENTORY, LOG_CACHE
+)
+from app.ingest import ENGINE
+from app.log_hub import HUB
+from app.log_store import format_line
 from app.routes import config
-from app import alerts
+from app.settings import flush_config, get_config, on_change
+from app.structured import FieldRules
+from app.rate_rules import rate_engine
+from app import alerts, docker_utils, metrics
 from contextlib import asynccontextmanager
 
+logger = logging.getLogger(__name__)
+
+
+def configure_logging(config: dict):
+    """Apply `logging.level` from config.yml to every LogForge logger."""
+    level = str(config.get("logging", {}).get("level", "INFO")).upper()
+    if not isinstance(logging.getLevelName(level), int):
+        logger.warning("Unknown logging.level %r, using INFO", level)
+        level = "INFO"
+    logging.getLogger("app").setLevel(level)
+
+
 app = FastAPI()
 
 app.include_router(config.router)
@@ -19,33 +44,89 @@ app.add_middleware(
     allow_headers=['*']
 )
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    create_docker_dict()
+_services_started = False
+
+def start_services():
+    """ Create the clients, caches and listeners and start the alert scan, once per process.
 
-    global CONTAINER_DICT
+    Nothing here waits on Docker; the inventory and log streams are
+    brought up afterwards by docker_utils.warm_up().
+    """
+    global _services_started
+    if _services_started:
+        return
+    _services_started = True
+
+    config = get_config()
+    logging.basicConfig(format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+    configure_logging(config)
+    on_change(configure_logging)
+
+    docker_utils.init_services(config)
+    alerts.configure(config)
+
+    ENGINE.add_listener(alerts.notify_new_lines)
+    ENGINE.add_listener(HUB.publish)
+    ENGINE.viewers = HUB.viewers
+    INVENTORY.add_listener(docker_utils.on_container_change)
+    if docker_utils.SEARCH_INDEX:
+        ENGINE.add_listener(docker_utils.SEARCH_INDEX.add)
+    if docker_utils.ARCHIVE:
+        ENGINE.add_listener(docker_utils.ARCHIVE.append)
+        docker_utils.ARCHIVE.start()
+    if docker_utils.STATS:
+        INVENTORY.add_listener(docker_utils.STATS.on_container_change)
 
-    # Optionally refresh container list here if needed
-    container_names = list(CONTAINER_DICT.keys())  # or re-detect dynamically
+    threading.Thread(target=alert_loop, name="alert-scan", daemon=True).start()
 
-    for name in container_names:
-        thread = threading.Thread(
-            target=fetch_logs_background,
-            args=(name,),
-            daemon=True
-        )
-        thread.start()
-    print("[LogForge] Background log fetchers started.")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_services()
+    # Serve right away; /ready reports how far the inventory and log
+    # streams have come. Hosts that cannot be reached now are retried in
+    # the background.
+    warmup = asyncio.create_task(docker_utils.warm_up())
 
     yield
 
+    warmup.cancel()
+    await asyncio.gather(warmup, return_exceptions=True)
+    await INVENTORY.stop()
+    if docker_utils.STATS:
+        await docker_utils.STATS.stop()
+    await ENGINE.stop()
+    if docker_utils.ARCHIVE:
+        docker_utils.ARCHIVE.flush(force=True)
+    flush_config()
+
 app.router.lifespan_context = lifespan
 
 @app.get("/containers")
-def list_containers():
-    """ Get a dictionary of Docker containers with their details."""
+async def list_containers():
+    """ Get a dictionary of Docker containers with their details, from memory."""
     return create_docker_dict()
 
+@app.get("/containers/{container_name}/stats")
+async def container_stats(container_name: str, window: int = Query(300, ge=1)):
+    """ Get a container's recent resource usage.
+    Args:
+        container_name (str): The name of the container.
+        window (int): How many seconds of samples to return.
+
+    Returns:
+        dict: One list per field (ts, cpu, mem, mem_limit, net_rx, net_tx,
+        blk_read, blk_write), oldest sample first. cpu is a percentage,
+        the rest are bytes; network and block I/O are cumulative counters.
+    """
+    if docker_utils.STATS is None:
+        raise HTTPException(status_code=404, detail="Stats collection is disabled")
+    if container_name not in CONTAINER_DICT:
+        raise HTTPException(status_code=404, detail="Container Not Found")
+    series = docker_utils.STATS.window(container_name, window)
+    if series is None:
+        raise HTTPException(status_code=404, detail="No stats for this container (not running?)")
+    return series
+
 
 # @app.get("/logs/{container_name}")
 # def logs(container_name: str, tail: int = 100):
@@ -66,78 +147,271 @@ def list_containers():
 
 
 @app.get("/logs/filter/{container_name}")
-def get_filtered_log(container_name: str):
-    """ Get filtered logs for a specific container by name.
+async def get_filtered_log(container_name: str, since: str = None, until: str = None,
+                           limit: int = Query(1000, ge=1, le=100000), cursor: str = None,
+                           where: str = None):
+    """ Stream alert-matching log lines for a container as NDJSON.
     Args:
         container_name (str): The name of the container.
+        since (str): Start of the time range, unix seconds or ISO 8601.
+        until (str): End of the time range, unix seconds or ISO 8601.
+        limit (int): Maximum number of lines in this page.
+        cursor (str): The `next_cursor` value from the previous page.
+        where (str): A field rule such as 'level >= warn and service == api';
+            JSON lines matching it are returned instead of alert matches.
+
+    Returns:
+        StreamingResponse: One {"ts", "line"} object per line, then a
+        final {"next_cursor"} object (null when there are no more pages).
+    """
+    try:
+        since_ns = parse_time(since) if since else None
+        until_ns = parse_time(until) if until else None
+        cursor_at = parse_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid time or cursor: {e}")
+    try:
+        rules = FieldRules.parse([where]) if where else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    start_ns = max(since_ns or 0, cursor_at[0] if cursor_at else 0) or None
+    try:
+        batches = log_source(container_name, start_ns, until_ns)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if batches is None:
+        raise HTTPException(status_code=404, detail="Container Not Found")
+
+    return StreamingResponse(iter_filtered_logs(batches, limit, cursor_at, rules), media_type="application/x-ndjson")
+
+@app.get("/logs/export")
+async def export_container_logs(since: str, until: str = None, containers: str = None, labels: str = None):
+    """ Export the logs of many containers as one gzip-compressed NDJSON stream.
+    Args:
+        since (str): Start of the time range, unix seconds or ISO 8601.
+        until (str): End of the time range, unix seconds or ISO 8601.
+        containers (str): Comma-separated container names.
+        labels (str): Label selector such as 'app=shop,tier!=db,monitored';
+            every term must match. Used when `containers` is not given.
+
+    Returns:
+        StreamingResponse: Gzip data of one {"host", "container", "ts", "line"}
+        object per line, oldest first across all containers, then a final
+        {"containers", "lines", "errors"} summary object.
+    """
+    try:
+        since_ns = parse_time(since)
+        until_ns = parse_time(until) if until else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid time: {e}")
+
+    if containers:
+        names = list(dict.fromkeys(c.strip() for c in containers.split(",") if c.strip()))
+        try:
+            missing = [name for name in names if find_container(name) is None
+                       and (docker_utils.ARCHIVE is None or docker_utils.ARCHIVE.oldest(name) is None)]
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Containers not found: {', '.join(missing)}")
+    elif labels:
+        try:
+            names = select_containers(parse_label_selector(labels))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        raise HTTPException(status_code=400, detail="Give containers or labels")
+
+    if not names:
+        raise HTTPException(status_code=404, detail="No containers match")
+    if len(names) > EXPORT_MAX_CONTAINERS:
+        raise HTTPException(status_code=400,
+                            detail=f"{len(names)} containers match; export at most {EXPORT_MAX_CONTAINERS} at a time")
+
+    return StreamingResponse(
+        export_logs(names, since_ns, until_ns),
+        media_type="application/x-ndjson",
+        headers={"Content-Encoding": "gzip"},
+    )
+
+# Kept as a plain `def`: a regex scan over the cache is CPU-bound, so it
+# runs in the threadpool instead of stalling the event loop.
+@app.get("/search")
+def search_logs(q: str = "", regex: bool = False, containers: str = None, since: str = None,
+                until: str = None, limit: int = Query(100, ge=1, le=10000), where: str = None):
+    """ Search cached logs across containers.
+    Args:
+        q (str): Case-insensitive text to find, or a regex when `regex` is true.
+            May be empty when `where` is given.
+        regex (bool): Treat `q` as a regular expression.
+        containers (str): Comma-separated container names; all when omitted.
+        since (str): Start of the time range, unix seconds or ISO 8601.
+        until (str): End of the time range, unix seconds or ISO 8601.
+        limit (int): Maximum number of results.
+        where (str): Only JSON lines matching this field rule, e.g.
+            'level >= error and service == payments'.
 
     Returns:
-        dict: A dictionary containing the filtered logs.    
+        dict: Matching lines, newest first, and the query time.
     """
-    return {'filtered_logs': get_filtered_logs(container_name)}
+    index = docker_utils.SEARCH_INDEX
+    if index is None:
+        raise HTTPException(status_code=404, detail="Search is disabled")
+    try:
+        since_ns = parse_time(since) if since else None
+        until_ns = parse_time(until) if until else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid time: {e}")
+    try:
+        rules = FieldRules.parse([where]) if where else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    names = [c.strip() for c in containers.split(",") if c.strip()] if containers else None
+
+    start = time.perf_counter()
+    try:
+        results = index.search(q, names, since_ns, until_ns, limit, regex, rules)
+    except re.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid regex: {e}")
+    return {"results": results, "took_ms": round((time.perf_counter() - start) * 1000, 2)}
 
 @app.get("/alerts")
-def get_alerts():
-    """ Get current alerts from the alert store."""
-    alerts.scan_logs_for_alerts()
-    return alerts.ALERT_STORE
+async def get_alerts(container: str = None, since: str = None, limit: int = Query(100, ge=1, le=10000)):
+    """ Get alert groups from the alert store, least recently seen first.
+
+    Matching lines are grouped by log template per container, with a count
+    and first/last-seen times. Alerts are raised by the background scan as
+    lines are ingested; this only reads the store.
+    Args:
+        container (str): Only alerts for this container.
+        since (str): Only groups seen after this time, unix seconds or ISO
+            8601. Pass the last group's `timestamp` to get the next page.
+        limit (int): Maximum number of groups. Without `since`, the most
+            recently seen `limit` groups are returned.
+
+    Returns:
+        list: Groups with container, template_id, template, message (the
+        latest line), count, first_seen, last_seen and timestamp.
+    """
+    try:
+        since_ns = parse_time(since) if since else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid time: {e}")
+    return alerts.ALERT_STORE.query(container, since_ns, limit)
 @app.get("/clear_alerts")
-def clear_alerts():
+async def clear_alerts():
     """ Clear all alerts from the alert store."""
     alerts.ALERT_STORE.clear()
     return {"status": "Alerts cleared"}
 
 @app.get("/health")
-def health_check():
+async def health_check():
     return {"status": "ok"}
 
+@app.get("/ready")
+async def readiness():
+    """ Report warm-up progress: hosts listed and loaded, containers inspected and followed.
+
+    Answers 503 until every host has been loaded and every container in
+    the inventory has had its backfill delivered, then 200. After
+    docker_utils.READY_TIMEOUT_SECONDS it answers 200 regardless, listing
+    whatever was still missing under `incomplete`.
+    """
+    status = docker_utils.WARMUP.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """ Ingest, alert, Docker API, email, WebSocket and cache metrics in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+CONTAINER_REFRESH_SECONDS = 30
+ALERT_RETRY_SECONDS = 1
+
 def alert_loop():
+    """ Scan new log lines as soon as the ingest engine caches them."""
+    last_refresh = 0
     while True:
-        alerts.scan_logs_for_alerts()
-        time.sleep(30)
+        alerts.NEW_LINES.wait(timeout=CONTAINER_REFRESH_SECONDS)
+        alerts.NEW_LINES.clear()
+        try:
+            if time.monotonic() - last_refresh >= CONTAINER_REFRESH_SECONDS:
+                last_refresh = time.monotonic()
+                alerts.refresh_containers()
+            alerts.scan_logs_for_alerts()
+        except Exception as e:
+            # One bad line, rule or config value must not end alerting for good
+            logger.exception("Alert scan failed: %s", e)
+            time.sleep(ALERT_RETRY_SECONDS)
+
 
-threading.Thread(target=alert_loop, daemon=True).start()
+BACKFILL_HOURS = 48
+BACKFILL_FRAME_LINES = 500
 
+async def wait_for_disconnect(websocket: WebSocket):
+    """ Return once the client closes the socket, ignoring anything it sends."""
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
 
 @app.websocket("/ws/logs/{container_name}")
 async def websocket_log_stream(websocket: WebSocket, container_name: str):
+    """ Stream a container's cached logs, then new lines as they are ingested.
+
+    All viewers of a container share the ingest engine's single upstream
+    stream through HUB; lines arrive batched, several per frame.
+    """
     await websocket.accept()
-    try:
-        container_info = CONTAINER_DICT.get(container_name)
-        if not container_info:
-            await websocket.close(code=1003, reason="Container not found")
-            return
+    container_info = CONTAINER_DICT.get(container_name)
+    if not container_info:
+        await websocket.close(code=1003, reason="Container not found")
+        return
+
+    ENGINE.watch(container_name, container_info["container_id"], container_info.get("tty"))
+    # A stopped container may be waiting out a long backoff; check it now
+    ENGINE.wake(container_name)
 
-        container = client.containers.get(container_info["container_id"])
+    # Read the backfill and subscribe without awaiting in between, so no
+    # line can be ingested into the gap or delivered twice.
+    since_ns = time.time_ns() - BACKFILL_HOURS * 3600 * 1_000_000_000
+    backfill = LOG_CACHE.since(container_name, since_ns)
+    sub = HUB.subscribe(container_name)
 
-        # Start streaming new logs
-        since_ts = int(time.time()) - 48 * 60 * 60  # 48 hours ago in seconds
-        log_stream = container.logs(since= since_ts ,stream=True, stdout=True, stderr=True, follow=True, timestamps=True)
+    # Watch for the client going away even while no lines are flowing
+    disconnected = asyncio.ensure_future(wait_for_disconnect(websocket))
+    try:
+        for start in range(0, len(backfill), BACKFILL_FRAME_LINES):
+            chunk = backfill[start:start + BACKFILL_FRAME_LINES]
+            await websocket.send_text("".join(format_line(ts, msg) + "\n" for ts, msg in chunk))
+        del backfill
 
         while True:
-            try:
-                # Non-blocking read with asyncio
-                line = await asyncio.to_thread(next, log_stream, None)
-                if line:
-                    await websocket.send_text(line.decode())
-                else:
-                    # If no new line, sleep a bit
-                    await asyncio.sleep(0.5)
-            except WebSocketDisconnect:
-                print(f"[DEBUG] WebSocket disconnected for {container_name}")
-                break
-            except StopIteration:
-                # Docker closed the stream
-                break
-            except Exception as e:
-                print(f"[ERROR] Streaming error: {e}")
+            frame = asyncio.ensure_future(sub.next_frame())
+            done, _ = await asyncio.wait({frame, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                frame.cancel()
                 break
+            await websocket.send_text(frame.result())
     except WebSocketDisconnect:
-        print(f"Client disconnected: {container_name}")
-        # Just exit, no need to close manually
+        logger.debug("WebSocket disconnected for %s", container_name)
     except Exception as e:
-        print(f"Unexpected error: {e}")
+        logger.error("Streaming error for %s: %s", container_name, e)
+    finally:
+        disconnected.cancel()
+        HUB.unsubscribe(container_name, sub)
 #-----------------
 @app.get("/debug/logcache")
-def debug_log_cache():
-    return {"containers": list(LOG_CACHE.keys())}
+async def debug_log_cache():
+    """ Get memory usage and time range of the cached logs per container."""
+    return LOG_CACHE.stats()
+
+@app.get("/debug/alertcache")
+async def debug_alert_cache():
+    """ Get the size and hit rate of the alert dedup cache, the alert store, the template
+    miner, and the current window counts of the rate rules."""
+    return {
+        "dedup": alerts.EMAIL_MESSAGE_CACHE.stats(),
+        "store": alerts.ALERT_STORE.stats(),
+        "templates": alerts.TEMPLATE_MINER.stats(),
+        "rate_rules": rate_engine().stats(time.time_ns()),
+    }
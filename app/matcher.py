@@ -0,0 +1,85 @@
+import re
+from .settings import derived
+
+
+def trie_pattern(keywords) -> str:
+    """Build a regex that matches any keyword, structured as a prefix trie.
+
+    A flat `a|b|c` alternation makes the regex engine try every keyword at
+    every position. Sharing prefixes means each position costs one branch
+    per distinct next character instead, which is what keeps a single pass
+    cheap with hundreds of keywords.
+
+    Args:
+        keywords (iterable): Literal keywords.
+    Returns:
+        str: Regex source. Longer keywords win over their prefixes.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for ch in keyword:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        terminal = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not terminal:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if terminal else group
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """Match a set of literal keywords against log lines in one pass.
+
+    Works on both str and bytes lines, so raw log bytes can be scanned
+    without decoding them first.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = tuple(dict.fromkeys(k for k in keywords if k))
+        if self.keywords:
+            source = trie_pattern(self.keywords)
+            self._text = re.compile(source)
+            self._bytes = re.compile(source.encode())
+        else:
+            self._text = self._bytes = None
+
+    def __bool__(self) -> bool:
+        return bool(self.keywords)
+
+    def _pattern(self, line):
+        return self._bytes if isinstance(line, (bytes, bytearray, memoryview)) else self._text
+
+    def search(self, line):
+        """Return the first keyword found in `line` (as str), or None."""
+        if not self.keywords:
+            return None
+        m = self._pattern(line).search(line)
+        if m is None:
+            return None
+        hit = m.group()
+        return hit.decode(errors="ignore") if isinstance(hit, (bytes, bytearray)) else hit
+
+    def findall(self, line) -> list:
+        """Return every distinct keyword found in `line`, in order of appearance."""
+        if not self.keywords:
+            return []
+        hits = self._pattern(line).findall(line)
+        if hits and not isinstance(hits[0], str):
+            hits = [h.decode(errors="ignore") for h in hits]
+        return list(dict.fromkeys(hits))
+
+
+def alert_matcher() -> KeywordMatcher:
+    """Matcher for the configured alert keywords, rebuilt only when config changes."""
+    return derived(
+        "alert_matcher",
+        lambda config: KeywordMatcher(config.get("alert", {}).get("keywords", []))
+    )
@@ -0,0 +1,154 @@
+import math
+import threading
+from bisect import bisect_left
+
+# Latency buckets in seconds, from sub-millisecond to a minute
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _register(metric):
+    with _registry_lock:
+        _registry.append(metric)
+    return metric
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing value, optionally split by labels.
+
+    Updates are one dict write under an uncontended lock, cheap enough for
+    per-batch use on the ingest path.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _register(self)
+
+    def inc(self, amount: float = 1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def remove(self, *labels):
+        """Forget one label set, e.g. for a container that no longer exists."""
+        with self._lock:
+            self._values.pop(labels, None)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield self.name, _labels(self.labelnames, labels), value
+
+
+class Gauge(Counter):
+    """A value that can go up and down."""
+
+    kind = "gauge"
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram:
+    """Observations counted into fixed buckets, with their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}    # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _register(self)
+
+    def observe(self, value: float, *labels):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                yield self.name + "_bucket", _labels(self.labelnames, labels, le), cumulative
+            yield self.name + "_sum", _labels(self.labelnames, labels), series[-2]
+            yield self.name + "_count", _labels(self.labelnames, labels), series[-1]
+
+
+class Collected:
+    """A metric read at scrape time from `collect()`, for values the app already tracks.
+
+    `collect` returns a number, or a dict of label value (or tuple of label
+    values) -> number.
+    """
+
+    def __init__(self, name: str, documentation: str, collect, labels: tuple = (), kind: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labels)
+        self.kind = kind
+        self.collect = collect
+        _register(self)
+
+    def samples(self):
+        values = self.collect()
+        if not isinstance(values, dict):
+            yield self.name, "", values
+            return
+        for labels, value in values.items():
+            if not isinstance(labels, tuple):
+                labels = (labels,)
+            yield self.name, _labels(self.labelnames, labels), value
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = list(_registry)
+    out = []
+    for metric in metrics:
+        out.append(f"# HELP {metric.name} {metric.documentation}")
+        out.append(f"# TYPE {metric.name} {metric.kind}")
+        try:
+            for name, labels, value in metric.samples():
+                out.append(f"{name}{labels} {_number(value)}")
+        except Exception as e:
+            out.append(f"# {metric.name} unavailable: {_escape(e)}")
+    return "\n".join(out) + "\n"
@@ -0,0 +1,266 @@
+import re
+import math
+import logging
+from array import array
+
+from .matcher import trie_pattern
+from .settings import derived
+from .structured import FieldRules
+
+WINDOW_SECONDS = 60
+WINDOW_BUCKETS = 60   # ring slots per window; the window slides in steps of window / WINDOW_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+
+class WindowCounter:
+    """Number of events in a sliding time window, kept in a ring of buckets.
+
+    Each bucket counts the events of one window / buckets slice of time and
+    a running total is kept, so adding an event and reading the count are
+    O(1) amortized and memory does not depend on how many events there are.
+    Events older than the window are ignored.
+    """
+
+    __slots__ = ("width", "counts", "current", "total")
+
+    def __init__(self, window_ns: int, buckets: int = WINDOW_BUCKETS):
+        self.width = max(1, window_ns // buckets)
+        self.counts = array("q", [0]) * buckets
+        self.current = None   # bucket number (ts // width) of the newest slot
+        self.total = 0
+
+    def _advance(self, bucket: int):
+        if self.current is None:
+            self.current = bucket
+            return
+        steps = bucket - self.current
+        if steps <= 0:
+            return
+        counts = self.counts
+        if steps >= len(counts):
+            for i in range(len(counts)):
+                counts[i] = 0
+            self.total = 0
+        else:
+            for b in range(self.current + 1, bucket + 1):
+                i = b % len(counts)
+                self.total -= counts[i]
+                counts[i] = 0
+        self.current = bucket
+
+    def add(self, ts: int, amount: int = 1) -> int:
+        """Count `amount` events at `ts` (ns); returns the count in the window."""
+        bucket = ts // self.width
+        self._advance(bucket)
+        if bucket > self.current - len(self.counts):
+            self.counts[bucket % len(self.counts)] += amount
+            self.total += amount
+        return self.total
+
+    def count(self, now: int) -> int:
+        """Events in the window ending at `now` (ns). Does not modify the counter."""
+        if self.current is None:
+            return 0
+        steps = now // self.width - self.current
+        if steps <= 0:
+            return self.total
+        if steps >= len(self.counts):
+            return 0
+        n = len(self.counts)
+        return self.total - sum(self.counts[b % n] for b in range(self.current + 1, self.current + steps + 1))
+
+
+def _positive(rule: str, key: str, value) -> float:
+    """`value` as a float, e.g. from a quoted YAML number. Raises ValueError unless finite and > 0."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Rate rule {rule!r}: {key} must be a number, got {value!r}")
+    if isinstance(value, bool) or not math.isfinite(number) or number <= 0:
+        raise ValueError(f"Rate rule {rule!r}: {key} must be a positive number, got {value!r}")
+    return number
+
+
+class RateRule:
+    """Alert when more than `threshold` matching lines arrive within `window_seconds`.
+
+    A line matches when it contains one of `keywords`, or matches `regex`,
+    and (if given) the JSON field rule `where`. Counting is per container,
+    or across every container with `scope: all`. `containers` limits the
+    rule to those containers.
+    """
+
+    def __init__(self, name: str, keywords=(), regex: str = None, where: str = None,
+                 threshold: float = None, rate_per_second: float = None,
+                 window_seconds: float = WINDOW_SECONDS, scope: str = "container", containers=None):
+        self.name = name
+        self.window_seconds = _positive(name, "window_seconds", window_seconds)
+        if threshold is None and rate_per_second is None:
+            raise ValueError(f"Rate rule {name!r}: needs threshold or rate_per_second")
+        if threshold is not None:
+            self.threshold = _positive(name, "threshold", threshold)
+        else:
+            self.threshold = _positive(name, "rate_per_second", rate_per_second) * self.window_seconds
+        if scope not in ("container", "all"):
+            raise ValueError(f"Rate rule {name!r}: scope must be 'container' or 'all'")
+        self.scope = scope
+        self.containers = frozenset(containers) if containers else None
+
+        self.keywords = tuple(k for k in keywords if k)
+        self.regex = regex
+        sources = []
+        if self.keywords:
+            sources.append(trie_pattern(self.keywords))
+        if regex:
+            sources.append(regex)
+        self.source = "|".join(f"(?:{s})" for s in sources) if sources else None
+        try:
+            self.pattern = re.compile(self.source.encode()) if self.source else None
+        except re.error as e:
+            raise ValueError(f"Rate rule {name!r}: invalid regex: {e}")
+        self.where = FieldRules.parse([where]) if where else None
+        if self.pattern is None and self.where is None:
+            raise ValueError(f"Rate rule {name!r}: needs keywords, regex or where")
+
+    @classmethod
+    def from_config(cls, index: int, entry: dict) -> "RateRule":
+        if not isinstance(entry, dict):
+            raise ValueError(f"Rate rule #{index + 1} must be a mapping")
+        options = dict(entry)
+        name = str(options.pop("name", f"rule-{index + 1}"))
+        keywords = options.pop("keywords", None) or ()
+        if "keyword" in options:
+            keywords = [options.pop("keyword")] + list(keywords)
+        if isinstance(keywords, str):
+            keywords = [keywords]
+        try:
+            return cls(name, keywords=keywords, **options)
+        except TypeError as e:
+            raise ValueError(f"Rate rule {name!r}: {e}")
+
+    def applies_to(self, container: str) -> bool:
+        return self.containers is None or container in self.containers
+
+
+class _Program:
+    """The rules that apply to one container, compiled for a single pass per line.
+
+    The keywords of every rule are merged into one prefix trie and joined
+    with the rules' regexes into a single prefilter, so the common line
+    that matches no rule costs one search however many rules there are.
+    Only lines that hit the prefilter are checked against each rule.
+    """
+
+    __slots__ = ("prefilter", "pattern_rules", "field_rules")
+
+    def __init__(self, rules: list):
+        self.pattern_rules = [(i, rule) for i, rule in rules if rule.pattern is not None]
+        self.field_rules = [(i, rule) for i, rule in rules if rule.pattern is None]
+        keywords = {k for _, rule in self.pattern_rules for k in rule.keywords}
+        sources = [trie_pattern(keywords)] if keywords else []
+        sources += [f"(?:{rule.regex})" for _, rule in self.pattern_rules if rule.regex]
+        try:
+            self.prefilter = re.compile("|".join(sources).encode()) if len(self.pattern_rules) > 1 else None
+        except re.error:
+            # e.g. two rules using the same group name; check each rule instead
+            self.prefilter = None
+
+
+class RateEngine:
+    """Evaluates every rate rule against each scanned line in one pass.
+
+    Keeps one WindowCounter per rule and container (or per rule, for
+    `scope: all`); no matched lines are stored. A rule fires once when its
+    count goes over the threshold and re-arms once it is back under.
+    Not thread-safe; the alert scan calls it under its own lock.
+    """
+
+    def __init__(self, rules=()):
+        self.rules = list(rules)
+        self.needs_fields = any(rule.where is not None for rule in self.rules)
+        self._programs = {}   # container -> _Program
+        self._counters = {}   # (rule index, container or None) -> WindowCounter
+        self._firing = set()  # keys of _counters currently over the threshold
+
+    def __bool__(self) -> bool:
+        return bool(self.rules)
+
+    @classmethod
+    def from_config(cls, entries) -> "RateEngine":
+        """Build from `alert.rate_rules`; invalid rules are logged and skipped."""
+        rules = []
+        for index, entry in enumerate(entries or ()):
+            try:
+                rules.append(RateRule.from_config(index, entry))
+            except ValueError as e:
+                logger.warning("Ignoring %s", e)
+        return cls(rules)
+
+    def _program(self, container: str) -> _Program:
+        program = self._programs.get(container)
+        if program is None:
+            program = self._programs[container] = _Program(
+                [(i, rule) for i, rule in enumerate(self.rules) if rule.applies_to(container)])
+        return program
+
+    def observe(self, container: str, ts: int, msg: bytes, fields=None) -> list:
+        """Count one line; returns (rule, count) for each rule it just pushed over its threshold."""
+        program = self._program(container)
+        matched = []
+        if program.pattern_rules and (program.prefilter is None or program.prefilter.search(msg)):
+            for i, rule in program.pattern_rules:
+                if rule.pattern.search(msg) and (rule.where is None or (fields is not None and rule.where.matches(fields))):
+                    matched.append((i, rule))
+        if fields is not None:
+            for i, rule in program.field_rules:
+                if rule.where.matches(fields):
+                    matched.append((i, rule))
+
+        fired = []
+        for i, rule in matched:
+            key = (i, container if rule.scope == "container" else None)
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = self._counters[key] = WindowCounter(int(rule.window_seconds * 1_000_000_000))
+            count = counter.add(ts)
+            if count > rule.threshold:
+                if key not in self._firing:
+                    self._firing.add(key)
+                    fired.append((rule, count))
+            else:
+                self._firing.discard(key)
+        return fired
+
+    def forget(self, container: str):
+        """Drop a container's compiled program and counters."""
+        self._programs.pop(container, None)
+        for key in [key for key in self._counters if key[1] == container]:
+            del self._counters[key]
+            self._firing.discard(key)
+
+    def stats(self, now: int) -> dict:
+        out = {}
+        for (i, container), counter in list(self._counters.items()):
+            rule = self.rules[i]
+            entry = out.setdefault(rule.name, {
+                "threshold": rule.threshold,
+                "window_seconds": rule.window_seconds,
+                "scope": rule.scope,
+                "counts": {},
+            })
+            entry["counts"][container or "*"] = counter.count(now)
+        return out
+
+
+def _rate_rules(config: dict) -> list:
+    return config.get("alert", {}).get("rate_rules", [])
+
+
+def rate_engine() -> RateEngine:
+    """The engine for the configured `alert.rate_rules`.
+
+    Rebuilt, with fresh counters, only when the rate rules themselves
+    change; other config edits keep the sliding windows.
+    """
+    return derived("alert_rate_rules", lambda config: RateEngine.from_config(_rate_rules(config)), key=_rate_rules)
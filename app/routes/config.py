@@ -1,14 +1,15 @@
+import math
+from typing import Any, List, Literal, Optional, Union
+
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, EmailStr
-import yaml
-from pathlib import Path
+from app.rate_rules import RateRule
+from app.settings import get_config, update_config, config_version
+from app.structured import FieldRules
 
 router = APIRouter()
 
-CONFIG_PATH = Path(__file__).parent.parent / "config.yml"
-
 
-    
 class KeywordUpdate(BaseModel):
     keywords: str
 
@@ -22,48 +23,253 @@ class Passwordpdate(BaseModel):
 class SenderUpdate(BaseModel):
     email: EmailStr
 
-@router.post("/config/filters/add-keyword")
-def add_filter_keywords(body: KeywordUpdate):
+class ConfigChange(BaseModel):
+    op: Literal["add_keywords", "remove_keywords", "replace_keywords", "add_recipient", "remove_recipient", "set"]
+    keywords: Optional[Union[List[str], str]] = None  # list, or comma-separated string
+    email: Optional[EmailStr] = None
+    container: Optional[str] = None
+    path: Optional[str] = None     # dotted key for "set", e.g. "email.alert_interval_hours"
+    value: Any = None
+
+class ConfigPatch(BaseModel):
+    changes: List[ConfigChange]
+
+
+def _number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value) and value > 0
+
+def _strings(value) -> bool:
+    return isinstance(value, list) and all(isinstance(v, str) for v in value)
+
+def _field_rules(value) -> bool:
+    FieldRules.parse(value)   # raises ValueError naming the bad rule
+    return True
+
+def _rate_rules(value) -> bool:
+    for i, rule in enumerate(value):
+        RateRule.from_config(i, rule)   # raises ValueError naming the bad rule
+    return True
+
+# What PATCH /config may set: sections are dicts, settings are (description,
+# check). A "*" key stands for any key, e.g. one container's recipients.
+BOOL = ("true or false", lambda v: isinstance(v, bool))
+STRING = ("a string", lambda v: isinstance(v, str))
+STRINGS = ("a list of strings", _strings)
+NUMBER = ("a positive number", _number)
+COUNT = ("a positive integer", lambda v: _number(v) and isinstance(v, int))
+PORT = ("a port number", lambda v: isinstance(v, int) and not isinstance(v, bool) and 0 < v < 65536)
+
+CONFIG_SCHEMA = {
+    "docker": {"hosts": {"*": STRING}, "max_connections": COUNT, "timeout_seconds": NUMBER},
+    "logging": {"level": STRING},
+    "email": {
+        "enabled": BOOL, "recipients": {"*": STRINGS}, "sender": STRING, "app_password": STRING,
+        "alert_interval_hours": NUMBER, "digest": BOOL, "smtp_host": STRING, "smtp_port": PORT,
+        "smtp_ssl": BOOL, "smtp_starttls": BOOL, "smtp_skip_login": BOOL,
+    },
+    "alert": {
+        "keywords": STRINGS,
+        "field_rules": ("a list of field rules", lambda v: _strings(v) and _field_rules(v)),
+        "rate_rules": ("a list of rate rules", lambda v: isinstance(v, list) and _rate_rules(v)),
+        "max_alerts": COUNT, "dedup_ttl_hours": NUMBER, "dedup_max_entries": COUNT, "max_templates": COUNT,
+    },
+    "cache": {"max_mb": NUMBER, "container_max_mb": NUMBER},
+    "archive": {"enabled": BOOL, "path": STRING, "max_mb": NUMBER, "max_age_hours": NUMBER},
+    "search": {"enabled": BOOL},
+    "stats": {"enabled": BOOL, "interval_seconds": NUMBER, "retention_minutes": NUMBER},
+}
+
+def _check_value(path: str, value, schema):
+    if isinstance(schema, dict):
+        if not isinstance(value, dict):
+            raise ValueError(f"'{path}' is a section and must be a mapping")
+        for key, item in value.items():
+            _check_value(f"{path}.{key}", item, _schema_for(path, str(key), schema))
+        return
+    description, check = schema
+    if not check(value):
+        raise ValueError(f"'{path}' must be {description}")
+
+def _schema_for(parent: str, key: str, section: dict):
+    schema = section.get(key, section.get("*"))
+    if schema is None:
+        raise ValueError(f"Unknown config key '{f'{parent}.' if parent else ''}{key}'")
+    return schema
+
+def check_setting(path: str, value):
+    """Raise ValueError unless `value` may be set at the dotted `path` of config.yml."""
+    schema = CONFIG_SCHEMA
+    parts = path.split(".")
+    for i, part in enumerate(parts):
+        if not isinstance(schema, dict):
+            raise ValueError(f"'{'.'.join(parts[:i])}' is a setting, not a section")
+        schema = _schema_for(".".join(parts[:i]), part, schema)
+    _check_value(path, value, schema)
+
+
+def split_keywords(keywords) -> list:
+    if isinstance(keywords, str):
+        keywords = keywords.split(",")
+    return [k.strip() for k in keywords or [] if k.strip()]
+
+# Each change below edits the config dict in place and returns the route's
+# response; update_config runs them as one locked transaction.
+
+def _add_keywords(config: dict, new_keywords: list) -> dict:
+    keywords = config.setdefault("alert", {}).setdefault("keywords", [])
+    existing = set(keywords)
+    added = []
+    for keyword in new_keywords:
+        if keyword not in existing:
+            keywords.append(keyword)
+            existing.add(keyword)
+            added.append(keyword)
+    return {
+        "status": "success",
+        "added": added,
+        "skipped": list(set(new_keywords) - set(added))
+    }
+
+def _remove_keywords(config: dict, to_remove: list) -> dict:
+    original_keywords = config.setdefault("alert", {}).setdefault("keywords", [])
+    removed = [k for k in to_remove if k in original_keywords]
+    config["alert"]["keywords"] = [k for k in original_keywords if k not in to_remove]
+    return {
+        "status": "success",
+        "removed": removed,
+        "not_found": list(set(to_remove) - set(removed))
+    }
+
+def _replace_keywords(config: dict, new_keywords: list) -> dict:
+    config.setdefault("alert", {})["keywords"] = new_keywords
+    return {
+        "status": "success",
+        "replaced_with": new_keywords
+    }
+
+def _add_recipient(config: dict, email: str, container: str) -> dict:
+    recipients_map = config.setdefault("email", {}).setdefault("recipients", {})
+    current = list(recipients_map.get(container, []))
+    if email in current:
+        return {
+            "status": "skipped",
+            "reason": "email already present",
+            "container": container
+        }
+    recipients_map[container] = current + [email]
+    return {
+        "status": "success",
+        "added": email,
+        "container": container
+    }
+
+def _remove_recipient(config: dict, email: str, container: str) -> dict:
+    recipients_map = config.setdefault("email", {}).setdefault("recipients", {})
+    current = list(recipients_map.get(container, []))
+    if email not in current:
+        return {
+            "status": "skipped",
+            "reason": "email not found",
+            "container": container
+        }
+    current.remove(email)
+    if current:
+        recipients_map[container] = current
+    else:
+        recipients_map.pop(container, None)
+    return {
+        "status": "success",
+        "removed": email,
+        "container": container
+    }
+
+def _set_value(config: dict, path: str, value) -> dict:
+    *parents, key = path.split(".")
+    node = config
+    for part in parents:
+        child = node.setdefault(part, {})
+        if not isinstance(child, dict):
+            raise ValueError(f"'{part}' in '{path}' is not a section")
+        node = child
+    node[key] = value
+    return {"status": "success", "path": path, "value": value}
+
+def _apply(config: dict, change: ConfigChange) -> dict:
+    op = change.op
+    if op in ("add_keywords", "remove_keywords", "replace_keywords"):
+        keywords = split_keywords(change.keywords)
+        if op != "replace_keywords" and not keywords:
+            raise ValueError(f"{op} needs keywords")
+        handler = {"add_keywords": _add_keywords, "remove_keywords": _remove_keywords,
+                   "replace_keywords": _replace_keywords}[op]
+        return handler(config, keywords)
+    if op in ("add_recipient", "remove_recipient"):
+        if not change.email or not change.container:
+            raise ValueError(f"{op} needs email and container")
+        handler = _add_recipient if op == "add_recipient" else _remove_recipient
+        return handler(config, change.email, change.container)
+    return _set_value(config, change.path, change.value)
+
+def _check_change(change: ConfigChange):
+    """Reject a change before anything is applied, so bad input never reaches the config."""
+    if change.op == "set":
+        if not change.path:
+            raise ValueError("set needs a path")
+        check_setting(change.path, change.value)
+
+
+@router.patch("/config")
+async def patch_config(body: ConfigPatch):
     """
-    Add multiple comma-separated alert keywords to config.yml.
+    Apply several config changes at once, all or nothing.
+
+    Changes are applied in order to one copy of the config; if any of them
+    is invalid, none are applied. The result is live immediately and
+    written to config.yml once.
 
     Args:
-        body (KeywordUpdate): Comma-separated keywords string.
+        body (ConfigPatch): {"changes": [...]}, each with an `op` of
+            add_keywords, remove_keywords, replace_keywords (`keywords`),
+            add_recipient, remove_recipient (`email`, `container`) or
+            set (`path`, `value`). `set` only takes the keys of
+            config.yml with values of the right type (see CONFIG_SCHEMA);
+            anything else is rejected with 400.
 
     Returns:
-        dict: Success and skipped (already exists) lists.
+        dict: The result of each change, in order, and the new config version.
     """
     try:
-        new_keywords = [k.strip() for k in body.keywords.split(",") if k.strip()]
-        with open(CONFIG_PATH, "r") as f:
-            config = yaml.safe_load(f)
+        for change in body.changes:
+            _check_change(change)
+        results = update_config(lambda config: [_apply(config, change) for change in body.changes])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"status": "success", "results": results, "version": config_version()}
 
-        config.setdefault("alert", {}).setdefault("keywords", [])
-        existing = set(config["alert"]["keywords"])
 
-        added = []
-        for keyword in new_keywords:
-            if keyword not in existing:
-                config["alert"]["keywords"].append(keyword)
-                added.append(keyword)
+@router.post("/config/filters/add-keyword")
+async def add_filter_keywords(body: KeywordUpdate):
+    """
+    Add multiple comma-separated alert keywords to config.yml.
 
-        with open(CONFIG_PATH, "w") as f:
-            yaml.safe_dump(config, f)
+    Args:
+        body (KeywordUpdate): Comma-separated keywords string.
 
-        return {
-            "status": "success",
-            "added": added,
-            "skipped": list(set(new_keywords) - set(added))
-        }
+    Returns:
+        dict: Success and skipped (already exists) lists.
+    """
+    try:
+        new_keywords = split_keywords(body.keywords)
+        return update_config(lambda config: _add_keywords(config, new_keywords))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-    
 
-    
 @router.delete("/config/filters/remove-keyword")
-def remove_alert_keyword(body: KeywordUpdate):
+async def remove_alert_keyword(body: KeywordUpdate):
     """
     Remove a keyword from the alert keywords list in config.yml.
 
@@ -74,36 +280,19 @@ def remove_alert_keyword(body: KeywordUpdate):
         dict: Success or not found message.
     """
     try:
-        to_remove = [k.strip() for k in body.keywords.split(",") if k.strip()]
-        with open(CONFIG_PATH, "r") as f:
-            config = yaml.safe_load(f)
-
-        config.setdefault("alert", {}).setdefault("keywords", [])
-        original_keywords = config["alert"]["keywords"]
-
-        removed = [k for k in to_remove if k in original_keywords]
-        config["alert"]["keywords"] = [k for k in original_keywords if k not in to_remove]
-
-        with open(CONFIG_PATH, "w") as f:
-            yaml.safe_dump(config, f)
-
-        return {
-            "status": "success",
-            "removed": removed,
-            "not_found": list(set(to_remove) - set(removed))
-        }
+        to_remove = split_keywords(body.keywords)
+        return update_config(lambda config: _remove_keywords(config, to_remove))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/config/filters")
-def get_filter_keywords():
+async def get_filter_keywords():
     """
     Get current list of alert keywords from config.yml.
     """
     try:
-        with open(CONFIG_PATH, "r") as f:
-            config = yaml.safe_load(f)
+        config = get_config()
 
         return {
             "keywords": config.get("alert", {}).get("keywords", [])
@@ -111,12 +300,12 @@ def get_filter_keywords():
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
+
 
 @router.post("/config/filters/replace")
-def replace_filter_keywords(body: KeywordUpdate):
+async def replace_filter_keywords(body: KeywordUpdate):
     """
-    Replace the entire list of alert keywords in config.yml 
+    Replace the entire list of alert keywords in config.yml
     with a new comma-separated set.
 
     Args:
@@ -126,97 +315,33 @@ def replace_filter_keywords(body: KeywordUpdate):
         dict: List of new keywords that replaced the old list.
     """
     try:
-        new_keywords = [k.strip() for k in body.keywords.split(",") if k.strip()]
-
-        with open(CONFIG_PATH, "r") as f:
-            config = yaml.safe_load(f)
-
-        config.setdefault("alert", {})
-        config["alert"]["keywords"] = new_keywords
-
-        with open(CONFIG_PATH, "w") as f:
-            yaml.safe_dump(config, f)
-
-        return {
-            "status": "success",
-            "replaced_with": new_keywords
-        }
+        new_keywords = split_keywords(body.keywords)
+        return update_config(lambda config: _replace_keywords(config, new_keywords))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
+
 #------EMAIL------------
 @router.post("/config/email/recipients/add")
-def add_single_email(body: RecipientUpdate):
+async def add_single_email(body: RecipientUpdate):
     try:
-        with open(CONFIG_PATH, "r") as f:
-            config = yaml.safe_load(f)
-
-        config.setdefault("email", {}).setdefault("recipients", {})
-        current = set(config["email"]["recipients"].get(body.container, []))
-
-        if body.email not in current:
-            current.add(body.email)
-            config["email"]["recipients"][body.container] = list(current)
-
-            with open(CONFIG_PATH, "w") as f:
-                yaml.safe_dump(config, f)
-
-            return {
-                "status": "success",
-                "added": body.email,
-                "container": body.container
-            }
-
-        return {
-            "status": "skipped",
-            "reason": "email already present",
-            "container": body.container
-        }
+        return update_config(lambda config: _add_recipient(config, body.email, body.container))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
+
 @router.post("/config/email/recipients/remove")
-def remove_single_email(body: RecipientUpdate):
+async def remove_single_email(body: RecipientUpdate):
     try:
-        with open(CONFIG_PATH, "r") as f:
-            config = yaml.safe_load(f)
-
-        recipients_map = config.setdefault("email", {}).setdefault("recipients", {})
-        current = set(recipients_map.get(body.container, []))
-
-        if body.email in current:
-            current.remove(body.email)
-
-            if current:
-                recipients_map[body.container] = list(current)
-            else:
-                recipients_map.pop(body.container, None)
-
-            with open(CONFIG_PATH, "w") as f:
-                yaml.safe_dump(config, f)
-
-            return {
-                "status": "success",
-                "removed": body.email,
-                "container": body.container
-            }
-
-        return {
-            "status": "skipped",
-            "reason": "email not found",
-            "container": body.container
-        }
+        return update_config(lambda config: _remove_recipient(config, body.email, body.container))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/config/email/recipients")
-def get_email_recipients():
+async def get_email_recipients():
     try:
-        with open(CONFIG_PATH, "r") as f:
-            config = yaml.safe_load(f)
+        config = get_config()
 
         recipients_raw = config.get("email", {}).get("recipients", {})
 
@@ -229,7 +354,7 @@ def get_email_recipients():
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/config/email/app_password")
-def update_app_password(body: Passwordpdate):
+async def update_app_password(body: Passwordpdate):
     """
     Update the app password for sending emails.
 
@@ -240,13 +365,7 @@ def update_app_password(body: Passwordpdate):
         dict: Success message.
     """
     try:
-        with open(CONFIG_PATH, "r") as f:
-            config = yaml.safe_load(f)
-
-        config["email"]["app_password"] = body.password
-
-        with open(CONFIG_PATH, "w") as f:
-            yaml.safe_dump(config, f)
+        update_config(lambda config: _set_value(config, "email.app_password", body.password))
 
         return {
             "status": "success",
@@ -255,15 +374,14 @@ def update_app_password(body: Passwordpdate):
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
+
 @router.get("/config/email/app_password")
-def get_app_password():
+async def get_app_password():
     """
     Get the current app password for sending emails.
     """
     try:
-        with open(CONFIG_PATH, "r") as f:
-            config = yaml.safe_load(f)
+        config = get_config()
 
         return {
             "app_password": config.get("email", {}).get("app_password", None)
@@ -271,9 +389,9 @@ def get_app_password():
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
+
 @router.post("/config/email/sender")
-def update_sender_email(body: SenderUpdate):
+async def update_sender_email(body: SenderUpdate):
     """
     Update the sender email address for sending emails.
 
@@ -284,13 +402,7 @@ def update_sender_email(body: SenderUpdate):
         dict: Success message.
     """
     try:
-        with open(CONFIG_PATH, "r") as f:
-            config = yaml.safe_load(f)
-
-        config["email"]["sender"] = body.email
-
-        with open(CONFIG_PATH, "w") as f:
-            yaml.safe_dump(config, f)
+        update_config(lambda config: _set_value(config, "email.sender", body.email))
 
         return {
             "status": "success",
@@ -299,19 +411,18 @@ def update_sender_email(body: SenderUpdate):
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
+
 @router.get("/config/email/sender")
-def get_sender_email():
+async def get_sender_email():
     """
     Get the current sender email address for sending emails.
     """
     try:
-        with open(CONFIG_PATH, "r") as f:
-            config = yaml.safe_load(f)
+        config = get_config()
 
         return {
             "sender": config.get("email", {}).get("sender", None)
         }
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
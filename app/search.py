@@ -0,0 +1,213 @@
+import re
+import threading
+from array import array
+from bisect import bisect_left
+
+from .log_store import LogStore, format_line
+
+TOKEN = re.compile(rb"[a-z0-9_]{2,64}")
+WORD_CHAR = re.compile(rb"[a-z0-9_]")
+# Tokens that are (almost) unique per line, such as request ids, hashes and
+# counters, would each cost a posting list while rarely being searched for
+# on their own. They are left out of the index and matched by verification.
+UNINDEXED = re.compile(rb"[0-9]+|(?=[0-9a-f]*[0-9])[0-9a-f]{6,}")
+PRUNE_FACTOR = 0.5  # prune once this share of indexed lines has been evicted
+
+
+def tokenize(text: bytes) -> set:
+    """Lowercase word tokens worth indexing in `text`."""
+    return {t for t in TOKEN.findall(text.lower()) if not UNINDEXED.fullmatch(t)}
+
+
+def word_pattern(query: bytes):
+    """Case-insensitive pattern for `query` that starts and ends on word boundaries.
+
+    Only the edges of the query that are word characters need a boundary,
+    so 'timeout' does not find 'timeouts' but 'error:' finds 'ERROR: x'.
+    """
+    first, last = query[:1].lower(), query[-1:].lower()
+    return re.compile(
+        (rb"(?<![a-z0-9_])" if WORD_CHAR.fullmatch(first) else b"") + re.escape(query)
+        + (rb"(?![a-z0-9_])" if WORD_CHAR.fullmatch(last) else b""),
+        re.IGNORECASE,
+    )
+
+
+def _where(rules, parsed: list) -> bool:
+    return parsed[0] is not None and rules.matches(parsed[0])
+
+
+class _ContainerIndex:
+    __slots__ = ("postings", "next_seq", "pruned_at")
+
+    def __init__(self, next_seq: int):
+        self.postings = {}        # token -> array of LOG_CACHE sequence numbers
+        self.next_seq = next_seq  # sequence number the next indexed line gets
+        self.pruned_at = next_seq
+
+
+class SearchIndex:
+    """Inverted index over LOG_CACHE for cross-container text search.
+
+    Posting lists map each token to the ascending sequence numbers of the
+    cached lines containing it, so a term query is a few list intersections
+    plus one store lookup per candidate. Lines evicted from the store are
+    pruned from the postings lazily, which keeps the index bounded by the
+    same budget as the cache.
+
+    Text queries match whole words, the unit the index is built from: a
+    query's tokens are then whole tokens of every matching line, so the
+    postings find exactly the lines a full scan would. 'conn' does not find
+    'connection'; use a regex for that.
+    """
+
+    def __init__(self, store: LogStore):
+        self.store = store
+        self._containers = {}
+        self._lock = threading.Lock()
+
+    def add(self, container: str, lines: list):
+        """Ingest listener: index a batch that was just appended to the store."""
+        next_seq = self.store.next_seq(container)
+        first = next_seq - len(lines)
+        with self._lock:
+            index = self._containers.get(container)
+            if index is None or index.next_seq > first:
+                # New container, or the store was reset underneath us
+                index = self._containers[container] = _ContainerIndex(first)
+            postings = index.postings
+            for seq, (_, msg) in enumerate(lines, first):
+                for token in tokenize(msg):
+                    plist = postings.get(token)
+                    if plist is None:
+                        plist = postings[token] = array("q")
+                    plist.append(seq)
+            index.next_seq = next_seq
+
+            live_from = self.store.first_seq(container)
+            if live_from - index.pruned_at > max(1000, (next_seq - live_from) * PRUNE_FACTOR):
+                self._prune(index, live_from)
+
+    def _prune(self, index: _ContainerIndex, live_from: int):
+        postings = index.postings
+        for token in list(postings):
+            plist = postings[token]
+            cut = bisect_left(plist, live_from)
+            if cut == len(plist):
+                del postings[token]
+            elif cut:
+                del plist[:cut]
+        index.pruned_at = live_from
+
+    def drop(self, container: str):
+        with self._lock:
+            self._containers.pop(container, None)
+
+    def _candidates(self, container: str, tokens: set, lo: int, hi: int) -> list:
+        """Sequence numbers in [lo, hi) whose line contains every token, newest first."""
+        with self._lock:
+            index = self._containers.get(container)
+            if index is None:
+                return []
+            plists = []
+            for token in tokens:
+                plist = index.postings.get(token)
+                if plist is None:
+                    return []
+                plists.append(plist[bisect_left(plist, lo):bisect_left(plist, hi)])
+        plists.sort(key=len)
+        result = set(plists[0])
+        for plist in plists[1:]:
+            result.intersection_update(plist)
+            if not result:
+                break
+        return sorted(result, reverse=True)
+
+    def search(self, query: str, containers: list = None, since: int = None, until: int = None,
+               limit: int = 100, regex: bool = False, where=None) -> list:
+        """Find cached lines matching a query, newest first.
+
+        Args:
+            query (str): Case-insensitive text matched on word boundaries
+                ('timeout' finds 'Timeout:' but not 'timeouts'), or a regex
+                if `regex` is set.
+            containers (list): Container names to search; all when None.
+            since (int): Only lines at or after this time (ns).
+            until (int): Only lines before this time (ns).
+            limit (int): Maximum number of results.
+            regex (bool): Treat `query` as a regular expression.
+            where (FieldRules): Only JSON lines matching these rules; uses
+                the fields cached in the store.
+        Returns:
+            list: Dicts with container, ts and line.
+        Raises:
+            re.error: If `regex` is set and the pattern is invalid.
+        """
+        needle = query.encode()
+        pattern = re.compile(needle, re.IGNORECASE) if regex else word_pattern(needle)
+        tokens = set() if regex else tokenize(needle)
+        names = containers if containers is not None else self.store.keys()
+
+        hits = []
+        for name in names:
+            lo = self.store.seq_at(name, since) if since else self.store.first_seq(name)
+            hi = self.store.seq_at(name, until) if until else self.store.next_seq(name)
+            if lo >= hi:
+                continue
+
+            if tokens:
+                lines = self._verified(name, self._candidates(name, tokens, lo, hi), pattern, limit, where)
+            else:
+                # Regexes and queries without indexable tokens scan the range
+                lines = self._scan(name, lo, hi, pattern, limit, where)
+
+            hits.extend((ts, name, msg) for ts, msg in lines)
+
+        hits.sort(key=lambda hit: hit[0], reverse=True)
+        return [
+            {"container": name, "ts": ts, "line": format_line(ts, msg)}
+            for ts, name, msg in hits[:limit]
+        ]
+
+    def _verified(self, name: str, seqs: list, pattern, limit: int, where=None) -> list:
+        found = []
+        for start in range(0, len(seqs), 256):
+            for _, ts, msg, *parsed in self.store.lines_at(name, seqs[start:start + 256], bool(where)):
+                if pattern.search(msg) and (not where or _where(where, parsed)):
+                    found.append((ts, msg))
+                    if len(found) >= limit:
+                        return found
+        return found
+
+    def _scan(self, name: str, lo: int, hi: int, pattern, limit: int, where=None) -> list:
+        found = []
+        # Walk backwards in pages so the newest matches are found first
+        while hi > lo and len(found) < limit:
+            start = max(lo, hi - 4096)
+            lines, end = self.store.read_from(name, start, hi - start, bool(where))
+            # If `start` has been evicted meanwhile, the read begins at the
+            # oldest cached line and can run past `hi`; drop what it overshot
+            first = end - len(lines)
+            if end > hi:
+                lines = lines[:max(0, hi - first)]
+            for ts, msg, *parsed in reversed(lines):
+                if where and not _where(where, parsed):
+                    continue
+                if pattern.search(msg):
+                    found.append((ts, msg))
+                    if len(found) >= limit:
+                        break
+            if first > start:
+                break  # everything older is gone too
+            hi = start
+        return found
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "tokens": len(index.postings),
+                    "postings": sum(len(p) for p in index.postings.values()),
+                }
+                for name, index in self._containers.items()
+            }
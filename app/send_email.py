@@ -1,16 +1,35 @@
-import yaml
 import yagmail
 import time
+import queue
+import logging
+import smtplib
+import threading
 from datetime import datetime, timedelta, timezone
-from pathlib import Path
+from . import metrics
+from .settings import get_config, derived
 
 EMAIL_INTERVAL_CACHE = {}  # email -> container
 
-def get_config():
-    """Load and return the configuration file."""
-    CONFIG_PATH = Path(__file__).parent / "config.yml"
-    with open(CONFIG_PATH, "r") as f:
-        return yaml.safe_load(f)
+QUEUE_SIZE = 1000
+MAX_ATTEMPTS = 4
+RETRY_BASE_SECONDS = 2
+IDLE_DISCONNECT_SECONDS = 300  # drop the SMTP session after this long unused
+
+logger = logging.getLogger(__name__)
+
+SEND_SECONDS = metrics.Histogram("logforge_email_send_seconds", "Time to hand one email to the SMTP server.")
+
+def get_recipients(container: str) -> list:
+    """Get the recipients for a container, falling back to the 'default' list.
+
+    The lookup table is rebuilt only when the config changes.
+    """
+    def build(config):
+        recipients_map = config.get("email", {}).get("recipients", {}) or {}
+        return dict(recipients_map), recipients_map.get("default", [])
+
+    recipients_map, default = derived("email_recipients", build)
+    return recipients_map.get(container, default)
 
 def should_send_email(container: str) -> bool:
     """Check if an email should be sent based on the interval.
@@ -45,33 +64,175 @@ def should_send_email(container: str) -> bool:
 
 
 
+class EmailDispatcher:
+    """Send alert emails from a background thread over one reused SMTP session.
+
+    Alerts are queued and the caller returns immediately. The worker keeps a
+    single logged-in connection, reconnecting when it drops or the SMTP
+    settings change, and retries failed sends with exponential backoff.
+
+    With `email.digest: true`, the first alert for a recipient list is sent
+    at once and any further alerts within `alert_interval_hours` are
+    collected into a single digest email sent when the interval is up.
+    """
+
+    def __init__(self, maxsize: int = QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize)
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self._digests = {}     # recipients tuple -> [(container, subject, body)]
+        self._last_sent = {}   # recipients tuple -> time of the last email
+        self._smtp = None
+        self._smtp_key = None
+        self._last_used = 0.0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, container: str, subject: str, body: str) -> bool:
+        """Queue an alert email. Never blocks; returns False if the queue is full."""
+        self.start()
+        try:
+            self.queue.put_nowait((container, subject, body))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("Email queue full, dropping alert for %s", container)
+            return False
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="email-dispatcher", daemon=True)
+                self._thread.start()
+
+    def join(self):
+        """Block until every queued alert has been handled."""
+        self.queue.join()
+
+    def _run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=1)
+            except queue.Empty:
+                item = None
+            try:
+                if item:
+                    self._handle(*item)
+                self._flush_digests()
+                if self._smtp and time.monotonic() - self._last_used > IDLE_DISCONNECT_SECONDS:
+                    self._disconnect()
+            except Exception as e:
+                logger.exception("Email dispatcher error: %s", e)
+            finally:
+                if item:
+                    self.queue.task_done()
+
+    def _handle(self, container: str, subject: str, body: str):
+        email_cfg = get_config().get("email", {})
+        if not email_cfg.get("enabled"):
+            return
+
+        # Get specific or fallback recipients
+        to_emails = get_recipients(container)
+        if not to_emails:
+            return  # No recipients to send to
+
+        if email_cfg.get("digest"):
+            key = tuple(sorted(to_emails))
+            interval_secs = email_cfg.get("alert_interval_hours", 1) * 3600
+            last = self._last_sent.get(key)
+            if last is not None and time.time() - last < interval_secs:
+                self._digests.setdefault(key, []).append((container, subject, body))
+                return
+            self._last_sent[key] = time.time()
+
+        self._send(email_cfg, list(to_emails), subject, body)
+
+    def _flush_digests(self):
+        if not self._digests:
+            return
+        email_cfg = get_config().get("email", {})
+        interval_secs = email_cfg.get("alert_interval_hours", 1) * 3600
+        now = time.time()
+        for key in list(self._digests):
+            if now - self._last_sent.get(key, 0) < interval_secs:
+                continue
+            alerts = self._digests.pop(key)
+            self._last_sent[key] = now
+            containers = sorted({container for container, _, _ in alerts})
+            subject = f"🚨 LogForge digest: {len(alerts)} alerts in {', '.join(containers)}"
+            body = "\n\n---\n\n".join(f"{subj}\n\n{text}" for _, subj, text in alerts)
+            self._send(email_cfg, list(key), subject, body)
+
+    def _send(self, email_cfg: dict, to_emails: list, subject: str, body: str):
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                start = time.perf_counter()
+                yag = self._connection(email_cfg)
+                recipients, message = yag.prepare_send(to=to_emails, subject=subject, contents=body)
+                yag.smtp.sendmail(yag.user, recipients, message)
+                SEND_SECONDS.observe(time.perf_counter() - start)
+                self._last_used = time.monotonic()
+                self.sent += 1
+                return
+            except (smtplib.SMTPException, OSError) as e:
+                logger.warning("Email send failed (attempt %d/%d): %s", attempt + 1, MAX_ATTEMPTS, e)
+                self._disconnect()
+                if attempt + 1 < MAX_ATTEMPTS:
+                    time.sleep(RETRY_BASE_SECONDS * 2 ** attempt)
+        self.failed += 1
+
+    def _connection(self, email_cfg: dict) -> yagmail.SMTP:
+        key = tuple(email_cfg.get(k) for k in (
+            "sender", "app_password", "smtp_host", "smtp_port", "smtp_ssl", "smtp_starttls", "smtp_skip_login"
+        ))
+        if self._smtp is not None and key != self._smtp_key:
+            self._disconnect()
+        if self._smtp is None:
+            yag = yagmail.SMTP(
+                email_cfg.get("sender"),
+                email_cfg.get("app_password"),
+                host=email_cfg.get("smtp_host", "smtp.gmail.com"),
+                port=email_cfg.get("smtp_port"),
+                smtp_ssl=email_cfg.get("smtp_ssl", True),
+                smtp_starttls=email_cfg.get("smtp_starttls"),
+                smtp_skip_login=email_cfg.get("smtp_skip_login", False),
+            )
+            yag.login()
+            self._smtp, self._smtp_key = yag, key
+        return self._smtp
+
+    def _disconnect(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.close()
+            except Exception:
+                pass
+            self._smtp = None
+
+
+DISPATCHER = EmailDispatcher()
+
+metrics.Collected("logforge_email_queue_depth", "Alert emails waiting to be sent.",
+                  DISPATCHER.queue.qsize)
+metrics.Collected("logforge_emails_total", "Alert emails by outcome.",
+                  lambda: {"sent": DISPATCHER.sent, "failed": DISPATCHER.failed, "dropped": DISPATCHER.dropped},
+                  labels=("outcome",), kind="counter")
+
+
 def send_email_alert(container: str, subject: str, body: str):
-    """Send an email alert to recipients based on the container.
+    """Queue an email alert to recipients based on the container.
+
+    Returns immediately; the email is sent by the background dispatcher.
 
     Args:
         container (str): The container name triggering the alert.
         subject (str): The subject of the email.
         body (str): The body content of the alert.
     """
-    if not should_send_email(container):
+    # Digest mode batches within the interval instead of dropping
+    if not get_config().get("email", {}).get("digest") and not should_send_email(container):
         return
 
-    CONFIG_PATH = Path(__file__).parent / "config.yml"
-    with open(CONFIG_PATH, "r") as f:
-        config = yaml.safe_load(f)
-
-    email_cfg = config.get("email", {})
-    if not email_cfg.get("enabled"):
-        return
-
-    sender = email_cfg.get("sender")
-    password = email_cfg.get("app_password")
-    recipients_map = email_cfg.get("recipients", {})
-
-    # Get specific or fallback recipients
-    to_emails = recipients_map.get(container, recipients_map.get("default", []))
-    if not to_emails:
-        return  # No recipients to send to
-
-    yag = yagmail.SMTP(sender, password)
-    yag.send(to=to_emails, subject=subject, contents=body)
\ No newline at end of file
+    DISPATCHER.submit(container, subject, body)
@@ -0,0 +1,205 @@
+import copy
+import os
+import logging
+import tempfile
+import time
+import threading
+import yaml
+from pathlib import Path
+
+CONFIG_PATH = Path(__file__).parent / "config.yml"
+CHECK_INTERVAL_SECONDS = 1.0  # how often get_config() may stat the file
+SAVE_DELAY_SECONDS = 0.5      # updates within this long are written to disk together
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_current = None       # (version, parsed config.yml), swapped as one object
+_file_state = None    # (mtime_ns, size) of the loaded file, or of our last write
+_last_check = 0.0
+_derived = {}         # name -> (version, key value, value)
+_listeners = []
+_dirty = False        # in-memory config has changes not yet written
+_save_timer = None
+_save_lock = threading.Lock()   # serializes file writes
+
+
+def _stat():
+    st = os.stat(CONFIG_PATH)
+    return st.st_mtime_ns, st.st_size
+
+
+def reload_config() -> dict:
+    """Re-read config.yml now and swap in the new snapshot."""
+    global _current, _file_state, _last_check
+    with _lock:
+        state = _stat()
+        with open(CONFIG_PATH, "r") as f:
+            config = yaml.safe_load(f) or {}
+        _current = ((_current[0] + 1) if _current else 1, config)
+        _file_state = state
+        _last_check = time.monotonic()
+        listeners = list(_listeners)
+
+    _notify(listeners, config)
+    return config
+
+
+def _notify(listeners: list, config: dict):
+    for callback in listeners:
+        try:
+            callback(config)
+        except Exception as e:
+            logger.exception("Config listener failed: %s", e)
+
+
+def _current_snapshot() -> tuple:
+    global _last_check
+    if _current is None:
+        reload_config()
+        return _current
+    now = time.monotonic()
+    if now - _last_check >= CHECK_INTERVAL_SECONDS:
+        _last_check = now
+        try:
+            # Pending in-memory updates win over the file until written
+            if not _dirty and _stat() != _file_state:
+                reload_config()
+        except (OSError, yaml.YAMLError) as e:
+            # Keep serving the last good snapshot, e.g. during a partial write
+            logger.warning("Could not reload config.yml: %s", e)
+    return _current
+
+
+def get_config() -> dict:
+    """Return the current config snapshot.
+
+    The file is parsed once and re-parsed only when its mtime or size
+    changes, checked at most once per CHECK_INTERVAL_SECONDS. The returned
+    dict is shared; copy it (see `copy_config`) before modifying.
+    """
+    return _current_snapshot()[1]
+
+
+def copy_config() -> dict:
+    """Return a private deep copy of the current config for editing."""
+    return copy.deepcopy(get_config())
+
+
+def update_config(mutate):
+    """Apply `mutate(config)` to a copy of the config as one transaction.
+
+    Updates are serialized by a lock, so concurrent callers never lose each
+    other's changes. If `mutate` raises, nothing changes. Otherwise the copy
+    becomes the current snapshot at once (derived values rebuild and
+    `on_change` listeners run, with no file reread) and is written to
+    config.yml shortly after; a burst of updates costs one write.
+    Returns whatever `mutate` returns.
+    """
+    global _current, _dirty
+    with _lock:
+        version, config = _current_snapshot()
+        config = copy.deepcopy(config)
+        result = mutate(config)
+        _current = (version + 1, config)
+        _dirty = True
+        listeners = list(_listeners)
+        _schedule_save()
+
+    _notify(listeners, config)
+    return result
+
+
+def save_config(config: dict):
+    """Replace the whole config with `config` (see `update_config`)."""
+    def replace(current):
+        current.clear()
+        current.update(copy.deepcopy(config))
+
+    update_config(replace)
+
+
+def _schedule_save():
+    global _save_timer
+    if _save_timer is None:
+        _save_timer = threading.Timer(SAVE_DELAY_SECONDS, _save_pending)
+        _save_timer.daemon = True
+        _save_timer.start()
+
+
+def _save_pending():
+    try:
+        flush_config()
+    except OSError as e:
+        logger.error("Could not write config.yml, retrying: %s", e)
+        with _lock:
+            _schedule_save()
+
+
+def flush_config():
+    """Write pending updates to config.yml now.
+
+    The file is replaced atomically: the config is written to a temporary
+    file in the same directory, fsynced, then renamed over config.yml, so
+    readers never see a partial file.
+    """
+    global _dirty, _save_timer, _file_state
+    with _save_lock:
+        with _lock:
+            _save_timer = None
+            if not _dirty:
+                return
+            config = _current[1]
+            _dirty = False
+        # Dump outside _lock: `config` is never mutated once it is current
+        fd, tmp = tempfile.mkstemp(dir=CONFIG_PATH.parent, prefix=".config-", suffix=".yml")
+        try:
+            try:
+                os.chmod(tmp, os.stat(CONFIG_PATH).st_mode & 0o777)
+            except FileNotFoundError:
+                pass
+            with os.fdopen(fd, "w") as f:
+                yaml.safe_dump(config, f, sort_keys=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, CONFIG_PATH)
+        except BaseException:
+            with _lock:
+                _dirty = True
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        with _lock:
+            _file_state = _stat()
+
+
+def config_version() -> int:
+    return _current_snapshot()[0]
+
+
+def derived(name: str, builder, key=None):
+    """Return `builder(config)`, rebuilt only when the config has changed.
+
+    Use for artifacts that are expensive to build from config, such as
+    compiled keyword matchers or recipient lookup tables. With `key`, only
+    a change in `key(config)` rebuilds it, for values that hold state
+    which other config edits should not reset.
+    """
+    version, config = _current_snapshot()
+    cached = _derived.get(name)
+    if cached and cached[0] == version:
+        return cached[2]
+    part = key(config) if key else None
+    if cached and key and cached[1] == part:
+        _derived[name] = (version, part, cached[2])
+        return cached[2]
+    value = builder(config)
+    _derived[name] = (version, part, value)
+    return value
+
+
+def on_change(callback):
+    """Register callback(config) to run after every reload."""
+    _listeners.append(callback)
@@ -0,0 +1,216 @@
+import time
+import asyncio
+import logging
+from array import array
+from urllib.parse import quote
+
+from .docker_async import AsyncDockerClient, parse_timestamp
+
+INTERVAL_SECONDS = 5       # keep one sample per container this often
+RETENTION_SECONDS = 3600
+RETRY_SECONDS = 5
+MAX_RETRY_SECONDS = 60
+PRIORITY = 4               # Docker request priority: behind every log stream (see IngestEngine.priority)
+
+logger = logging.getLogger(__name__)
+
+# Columns of a StatsSeries, in the order `append` takes them
+FIELDS = ("cpu", "mem", "mem_limit", "net_rx", "net_tx", "blk_read", "blk_write")
+
+
+class StatsSeries:
+    """Fixed-size ring of resource samples for one container.
+
+    Each column is a preallocated array, so a container costs the same
+    ~8 bytes per field per sample however long it runs.
+    """
+
+    __slots__ = ("capacity", "ts", "columns", "head", "count")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.ts = array("q", bytes(8 * capacity))
+        self.columns = [array("d", bytes(8 * capacity)) for _ in FIELDS]
+        self.head = 0    # slot the next sample goes into
+        self.count = 0
+
+    def append(self, ts: int, values: tuple):
+        pos = self.head
+        self.ts[pos] = ts
+        for column, value in zip(self.columns, values):
+            column[pos] = value
+        # Advance only after the row is complete, so a reader on another
+        # thread never sees a half-written latest sample.
+        self.head = (pos + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def last_ts(self) -> int:
+        return self.ts[self.head - 1] if self.count else 0
+
+    def latest(self):
+        """Return the newest sample as a dict, or None."""
+        if not self.count:
+            return None
+        pos = self.head - 1
+        sample = {field: column[pos] for field, column in zip(FIELDS, self.columns)}
+        sample["ts"] = self.ts[pos]
+        return sample
+
+    def window(self, since: int) -> dict:
+        """Samples with ts >= since (ns), oldest first, as one list per column."""
+        start = (self.head - self.count) % self.capacity
+        slots = [(start + i) % self.capacity for i in range(self.count)]
+        slots = [pos for pos in slots if self.ts[pos] >= since]
+        series = {"ts": [self.ts[pos] for pos in slots]}
+        for field, column in zip(FIELDS, self.columns):
+            series[field] = [column[pos] for pos in slots]
+        return series
+
+
+def parse_sample(doc: dict) -> tuple:
+    """Reduce one Docker stats document to (ts_ns, values in FIELDS order).
+
+    CPU% is computed like `docker stats`: the container's share of the
+    host's CPU time since the previous reading, scaled by online CPUs.
+    """
+    cpu, pre = doc.get("cpu_stats") or {}, doc.get("precpu_stats") or {}
+    cpu_delta = cpu.get("cpu_usage", {}).get("total_usage", 0) - pre.get("cpu_usage", {}).get("total_usage", 0)
+    system_delta = cpu.get("system_cpu_usage", 0) - pre.get("system_cpu_usage", 0)
+    online = cpu.get("online_cpus") or len(cpu.get("cpu_usage", {}).get("percpu_usage") or ()) or 1
+    cpu_pct = cpu_delta / system_delta * online * 100 if cpu_delta > 0 and system_delta > 0 else 0.0
+
+    mem = doc.get("memory_stats") or {}
+    details = mem.get("stats") or {}
+    # Page cache is reclaimable, so leave it out like the docker CLI does
+    cache = details.get("inactive_file", details.get("total_inactive_file", details.get("cache", 0)))
+    mem_used = max(mem.get("usage", 0) - cache, 0)
+
+    rx = tx = 0
+    for net in (doc.get("networks") or {}).values():
+        rx += net.get("rx_bytes", 0)
+        tx += net.get("tx_bytes", 0)
+
+    blk_read = blk_write = 0
+    for entry in (doc.get("blkio_stats") or {}).get("io_service_bytes_recursive") or ():
+        op = entry.get("op", "").lower()
+        if op == "read":
+            blk_read += entry.get("value", 0)
+        elif op == "write":
+            blk_write += entry.get("value", 0)
+
+    read = doc.get("read") or ""
+    try:
+        ts = parse_timestamp(read.encode())
+    except ValueError:
+        ts = 0
+    return ts, (cpu_pct, mem_used, mem.get("limit", 0), rx, tx, blk_read, blk_write)
+
+
+def format_bytes(n: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024:
+            return f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.1f}TiB"
+
+
+class StatsCollector:
+    """Follow the Docker stats stream of every running container.
+
+    Docker pushes one stats document per second per stream; all streams
+    share one event loop, so no `docker stats` processes are forked. One
+    sample per `interval` seconds is kept in each container's StatsSeries.
+    """
+
+    def __init__(self, docker: AsyncDockerClient = None, interval: float = INTERVAL_SECONDS,
+                 retention: float = RETENTION_SECONDS):
+        self.docker = docker or AsyncDockerClient()
+        self.client_for = None   # optional callable(name) -> AsyncDockerClient, as in IngestEngine
+        self.interval_ns = int(interval * 1_000_000_000)
+        self.capacity = max(1, int(retention / interval))
+        self.series = {}   # container name -> StatsSeries
+        self._tasks = {}   # container name -> asyncio.Task
+
+    def watch(self, name: str, container_id: str):
+        """Start collecting for a container unless already collecting."""
+        task = self._tasks.get(name)
+        if task and not task.done():
+            return
+        docker = self.client_for(name) if self.client_for else self.docker
+        self._tasks[name] = asyncio.get_running_loop().create_task(
+            self._follow(name, container_id, docker), name=f"stats:{name}"
+        )
+
+    def unwatch(self, name: str):
+        """Stop collecting for a container and drop its samples."""
+        task = self._tasks.pop(name, None)
+        if task:
+            task.cancel()
+        self.series.pop(name, None)
+
+    def sync(self, containers: dict):
+        """Collect for exactly the running containers in `containers` (name -> info dict)."""
+        running = {name: info for name, info in containers.items() if info["status"] == "running"}
+        for name in list(self._tasks):
+            if name not in running:
+                self.unwatch(name)
+        for name, info in running.items():
+            self.watch(name, info["container_id"])
+
+    def on_container_change(self, name: str, info):
+        """Inventory listener: follow containers as they start and stop."""
+        if info is not None and info["status"] == "running":
+            self.watch(name, info["container_id"])
+        else:
+            self.unwatch(name)
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def summary(self, name: str) -> tuple:
+        """Latest (cpu, memory) as display strings like `docker stats`, or 'N/A'."""
+        series = self.series.get(name)
+        sample = series.latest() if series else None
+        if sample is None:
+            return 'N/A', 'N/A'
+        return (f"{sample['cpu']:.2f}%",
+                f"{format_bytes(sample['mem'])} / {format_bytes(sample['mem_limit'])}")
+
+    def window(self, name: str, seconds: float):
+        """A container's samples from the last `seconds`, or None if it has none."""
+        series = self.series.get(name)
+        if series is None:
+            return None
+        return series.window(time.time_ns() - int(seconds * 1_000_000_000))
+
+    def _record(self, name: str, doc: dict):
+        # The first document of a stream has no previous reading to
+        # compute CPU% from, so it is skipped.
+        if not (doc.get("precpu_stats") or {}).get("system_cpu_usage"):
+            return
+        ts, values = parse_sample(doc)
+        series = self.series.get(name)
+        if series is None:
+            series = self.series[name] = StatsSeries(self.capacity)
+        if ts - series.last_ts() >= self.interval_ns:
+            series.append(ts, values)
+
+    async def _follow(self, name: str, container_id: str, docker: AsyncDockerClient):
+        delay = RETRY_SECONDS
+        while True:
+            try:
+                async for doc in docker.stream_json(
+                    f"/containers/{quote(container_id, safe='')}/stats", {"stream": True}, PRIORITY
+                ):
+                    self._record(name, doc)
+                    delay = RETRY_SECONDS
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Error collecting stats for %s: %s", name, e)
+                delay = min(delay * 2, MAX_RETRY_SECONDS)
+            await asyncio.sleep(delay)
@@ -0,0 +1,239 @@
+import re
+import json
+import logging
+
+from .settings import derived
+
+logger = logging.getLogger(__name__)
+
+# Severity ranks; the numbers match pino/bunyan's numeric levels, so those
+# can be compared as they are.
+LEVELS = {
+    "trace": 10,
+    "debug": 20,
+    "info": 30, "information": 30, "notice": 35,
+    "warn": 40, "warning": 40,
+    "error": 50, "err": 50,
+    "fatal": 60, "critical": 60, "crit": 60, "panic": 60, "alert": 60, "emerg": 60,
+}
+
+# Common spellings of the well-known fields, first match wins
+LEVEL_KEYS = ("level", "lvl", "severity", "levelname", "log.level")
+MESSAGE_KEYS = ("message", "msg", "text", "log")
+TIME_KEYS = ("time", "ts", "timestamp", "@timestamp")
+
+RULE = re.compile(r"^\s*([\w.@-]+)\s*(==|!=|>=|<=|>|<|~)\s*(.*?)\s*$")
+# Quoted strings are matched whole so an ' and ' inside one is not a separator
+AND = re.compile(r"""'[^']*'|"[^"]*"|(\s+and\s+)""")
+ORDERED_OPS = (">=", "<=", ">", "<")
+
+
+def _flatten(obj: dict, prefix: str, out: dict):
+    for key, value in obj.items():
+        if isinstance(value, dict):
+            _flatten(value, f"{prefix}{key}.", out)
+        elif not isinstance(value, list):
+            out[prefix + key] = value
+
+
+def parse_fields(msg: bytes):
+    """Parse a JSON log line into a flat dict of its fields.
+
+    Nested objects are flattened with dotted keys ("http.status"); lists are
+    left out. The level, message and time are also stored under "level"
+    (lowercased), "message" and "time", whichever spelling the line used.
+    Returns None for lines that are not a JSON object, after only a
+    one-byte check for most of them.
+    """
+    if msg[:1] != b"{":
+        if not msg[:1].isspace():
+            return None
+        msg = msg.lstrip()
+        if msg[:1] != b"{":
+            return None
+    try:
+        obj = json.loads(msg)
+    except ValueError:
+        return None
+    if not isinstance(obj, dict):
+        return None
+
+    fields = {}
+    _flatten(obj, "", fields)
+    for canonical, keys in (("level", LEVEL_KEYS), ("message", MESSAGE_KEYS), ("time", TIME_KEYS)):
+        for key in keys:
+            value = fields.get(key)
+            if value is not None:
+                fields[canonical] = value
+                break
+    level = fields.get("level")
+    if isinstance(level, str):
+        fields["level"] = level.lower()
+    return fields
+
+
+def level_rank(value):
+    """Rank of a level name or number, or None if it is not a known level."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    value = str(value).strip().lower()
+    rank = LEVELS.get(value)
+    if rank is None and value.isdigit():
+        rank = int(value)
+    return rank
+
+
+class FieldCondition:
+    """One `field op value` comparison, e.g. `level >= error` or `service == payments`.
+
+    `level` compares by severity; other fields compare as numbers when both
+    sides are numeric and as strings otherwise. `~` is a regex search.
+    """
+
+    __slots__ = ("field", "op", "value", "_number", "_pattern")
+
+    def __init__(self, field: str, op: str, value: str):
+        self.field = field
+        self.op = op
+        if len(value) > 1 and value[0] in "'\"" and value[-1] == value[0]:
+            value = value[1:-1]
+        self.value = value
+        self._pattern = re.compile(self.value) if op == "~" else None
+        if field == "level":
+            self._number = level_rank(self.value)
+            if self._number is None:
+                raise ValueError(f"Unknown level {self.value!r}")
+        else:
+            try:
+                self._number = float(self.value)
+            except ValueError:
+                self._number = None
+                if op in ORDERED_OPS:
+                    raise ValueError(f"{op} needs a number or level, got {self.value!r}")
+
+    def matches(self, fields: dict) -> bool:
+        actual = fields.get(self.field)
+        if actual is None:
+            return self.op == "!="
+        op = self.op
+        if op == "~":
+            return self._pattern.search(str(actual)) is not None
+
+        if self.field == "level":
+            left, right = level_rank(actual), self._number
+        elif self._number is not None and not isinstance(actual, bool):
+            try:
+                left, right = float(actual), self._number
+            except (TypeError, ValueError):
+                left, right = str(actual), self.value
+        else:
+            left, right = (str(actual).lower() if isinstance(actual, bool) else str(actual)), self.value
+
+        if left is None:
+            return op == "!="
+        if op == "==":
+            return left == right
+        if op == "!=":
+            return left != right
+        if isinstance(left, str):
+            return False
+        if op == ">=":
+            return left >= right
+        if op == "<=":
+            return left <= right
+        if op == ">":
+            return left > right
+        return left < right
+
+    def __repr__(self) -> str:
+        return f"{self.field} {self.op} {self.value}"
+
+
+def _split_and(text: str) -> list:
+    parts, start = [], 0
+    for m in AND.finditer(text):
+        if m.group(1):
+            parts.append(text[start:m.start()])
+            start = m.end()
+    parts.append(text[start:])
+    return parts
+
+
+def parse_rule(text: str) -> tuple:
+    """Parse a rule such as 'level >= warn and service == payments' into its conditions.
+
+    A value that contains ' and ' must be quoted: `msg == "cats and dogs"`.
+    Raises:
+        ValueError: If the rule is malformed.
+    """
+    conditions = []
+    for part in _split_and(text.strip()):
+        m = RULE.match(part)
+        if not m or not m.group(3):
+            raise ValueError(f"Invalid field rule {text!r}: expected 'field op value'")
+        try:
+            conditions.append(FieldCondition(*m.groups()))
+        except re.error as e:
+            raise ValueError(f"Invalid regex in field rule {text!r}: {e}")
+    return tuple(conditions)
+
+
+class FieldRules:
+    """A set of field rules; a line matches if every condition of any one rule holds."""
+
+    def __init__(self, rules=()):
+        self.rules = tuple(rules)
+
+    def __bool__(self) -> bool:
+        return bool(self.rules)
+
+    @classmethod
+    def parse(cls, texts, strict: bool = True) -> "FieldRules":
+        """Build from rule strings. Invalid ones raise, or are logged and skipped if not `strict`."""
+        rules = []
+        for text in texts or ():
+            try:
+                rules.append(parse_rule(str(text)))
+            except ValueError as e:
+                if strict:
+                    raise
+                logger.warning("Ignoring %s", e)
+        return cls(rules)
+
+    def matches(self, fields: dict) -> bool:
+        return any(all(c.matches(fields) for c in rule) for rule in self.rules)
+
+
+def alert_rules() -> FieldRules:
+    """The configured `alert.field_rules`, rebuilt only when config changes."""
+    return derived(
+        "alert_field_rules",
+        lambda config: FieldRules.parse(config.get("alert", {}).get("field_rules", []), strict=False)
+    )
+
+
+def is_alert_line(msg: bytes, fields, matcher, rules: FieldRules) -> bool:
+    """Decide whether a log line raises an alert.
+
+    JSON lines are judged by the field rules, so an info-level line that
+    merely mentions "Error" does not alert and an error-level one without
+    any keyword does. JSON lines without a level fall back to keywords in
+    their message, or in the whole line when there is no string message.
+    Plain lines, or every line when no field rules are configured, are
+    matched on keywords as before.
+    Args:
+        msg (bytes): The raw log message.
+        fields (dict): `parse_fields(msg)`, or None for plain lines.
+        matcher (KeywordMatcher): The alert keywords.
+        rules (FieldRules): The alert field rules.
+    """
+    if fields is None or not rules:
+        return bool(matcher.search(msg))
+    if rules.matches(fields):
+        return True
+    if "level" not in fields:
+        message = fields.get("message")
+        return bool(matcher.search(message if isinstance(message, str) else msg))
+    return False
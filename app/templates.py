@@ -0,0 +1,118 @@
+import threading
+from collections import OrderedDict
+
+from .dedup import MASK, normalize_message
+
+DEPTH = 4                 # tree depth: length level + DEPTH - 2 leading-token levels
+SIMILARITY = 0.4          # share of matching tokens needed to join a template
+MAX_CHILDREN = 100        # per tree node; further tokens share one wildcard child
+MAX_TEMPLATES = 10000     # least recently seen templates are dropped beyond this
+
+
+class LogTemplate:
+    """One mined pattern: its token list, with variable positions as MASK."""
+
+    __slots__ = ("id", "tokens", "size", "leaf")
+
+    def __init__(self, template_id: int, tokens: list, leaf: list):
+        self.id = template_id
+        self.tokens = tokens
+        self.size = 1
+        self.leaf = leaf      # the tree leaf list holding this template
+
+    @property
+    def template(self) -> str:
+        return " ".join(self.tokens)
+
+
+def _has_digit(token: str) -> bool:
+    return any(ch.isdigit() for ch in token)
+
+
+class TemplateMiner:
+    """Online log template miner using Drain's fixed-depth parse tree.
+
+    Lines are normalized (see `normalize_message`) and split into tokens.
+    The tree routes a line by its token count, then by its first DEPTH - 2
+    tokens, to a small leaf list of templates; the line joins the most
+    similar template there, whose differing positions become MASK, or
+    starts a new one. Each line costs a few dict lookups plus a comparison
+    against a handful of templates, however many templates exist.
+
+    He et al., "Drain: An Online Log Parsing Approach with Fixed Depth
+    Tree", ICWS 2017. Thread-safe.
+    """
+
+    def __init__(self, depth: int = DEPTH, similarity: float = SIMILARITY,
+                 max_children: int = MAX_CHILDREN, max_templates: int = MAX_TEMPLATES):
+        self.depth = max(depth, 3)
+        self.similarity = similarity
+        self.max_children = max_children
+        self.max_templates = max_templates
+        self.lines = 0
+        self._root = {}                   # token count -> nested dict tree
+        self._templates = OrderedDict()   # id -> LogTemplate, least recently seen first
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def _leaf(self, tokens: list) -> list:
+        node = self._root.setdefault(len(tokens), {})
+        for token in tokens[:self.depth - 2]:
+            if _has_digit(token):
+                token = MASK
+            child = node.get(token)
+            if child is None:
+                if len(node) >= self.max_children and token != MASK:
+                    token = MASK
+                    child = node.get(MASK)
+                if child is None:
+                    child = node[token] = {}
+            node = child
+        return node.setdefault(None, [])
+
+    def _best(self, leaf: list, tokens: list):
+        best, best_sim, best_params = None, -1.0, -1
+        for template in leaf:
+            same = params = 0
+            for t1, t2 in zip(template.tokens, tokens):
+                if t1 == MASK:
+                    params += 1
+                elif t1 == t2:
+                    same += 1
+            sim = same / len(tokens) if tokens else 1.0
+            if sim > best_sim or (sim == best_sim and params > best_params):
+                best, best_sim, best_params = template, sim, params
+        return best, best_sim
+
+    def add(self, message: str) -> LogTemplate:
+        """Assign a line to a template, creating or generalizing one as needed."""
+        tokens = normalize_message(message).split()
+        with self._lock:
+            self.lines += 1
+            leaf = self._leaf(tokens)
+            template, sim = self._best(leaf, tokens)
+            if template is not None and sim >= self.similarity:
+                template.tokens = [t1 if t1 == t2 else MASK for t1, t2 in zip(template.tokens, tokens)]
+                template.size += 1
+                self._templates.move_to_end(template.id)
+                return template
+
+            template = LogTemplate(self._next_id, tokens, leaf)
+            self._next_id += 1
+            leaf.append(template)
+            self._templates[template.id] = template
+            while len(self._templates) > self.max_templates:
+                _, old = self._templates.popitem(last=False)
+                old.leaf.remove(old)
+            return template
+
+    def get(self, template_id: int):
+        return self._templates.get(template_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"templates": len(self._templates), "max_templates": self.max_templates,
+                    "lines": self.lines}
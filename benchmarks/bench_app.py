@@ -0,0 +1,260 @@
+"""End-to-end benchmark of the LogForge app against a fake Docker daemon.
+
+Starts `benchmarks.fake_docker` in a subprocess (so its CPU is not counted)
+with N containers emitting M lines/sec, points the app at it, and drives the
+real code paths: log ingest, the alert scan, /logs/filter, /logs/export,
+/containers and the WebSocket stream. Cold start is timed from importing the app to its
+first /health answer and to /ready turning 200. Prints one JSON document;
+use --output to also write it to a file and compare runs between releases.
+
+    python -m benchmarks.bench_app --containers 50 --rate 20 --duration 20
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import resource
+import argparse
+import tempfile
+import platform
+import threading
+import contextlib
+from pathlib import Path
+
+from benchmarks.fake_docker import spawn
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Peak, not current, but the best available off Linux
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def percentiles(samples: list) -> dict:
+    """p50/p90/p99/max of samples given in seconds, reported in ms."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {"count": len(ordered), "p50_ms": pick(0.50), "p90_ms": pick(0.90),
+            "p99_ms": pick(0.99), "max_ms": round(ordered[-1] * 1000, 3)}
+
+
+def timed_requests(client, path: str, n: int) -> dict:
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        response = client.get(path)
+        response.read()
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, (path, response.status_code)
+    return percentiles(samples)
+
+
+def wait_ready(client, timeout: float = 60.0) -> dict:
+    """Poll /ready until it answers 200; returns its final report."""
+    deadline = time.perf_counter() + timeout
+    while True:
+        response = client.get("/ready")
+        if response.status_code == 200 or time.perf_counter() > deadline:
+            return response.json()
+        time.sleep(0.005)
+
+
+def track_alert_latency(alerts, since_ns: int) -> list:
+    """Record ingest-to-alert latency for every alert line timestamped after since_ns.
+
+    Wraps the alert module's view of LOG_CACHE to learn each scanned line's
+    timestamp, and ALERT_STORE.add to see when the alert lands.
+    """
+    latencies = []
+    line_ts = {}
+    store, cache = alerts.ALERT_STORE, alerts.LOG_CACHE
+    read_from, add = cache.read_from, store.add
+
+    class CacheProxy:
+        def __getattr__(self, name):
+            return getattr(cache, name)
+
+        def __contains__(self, name):
+            return name in cache
+
+        def read_from(self, name, seq, limit=None, **kwargs):
+            lines, next_seq = read_from(name, seq, limit, **kwargs)
+            for ts, msg, *_ in lines:
+                if ts >= since_ns:
+                    line_ts[msg.decode(errors="ignore").strip()] = ts
+            return lines, next_seq
+
+    def timed_add(container, message, *args, **kwargs):
+        ts = line_ts.pop(message, None)
+        if ts is not None:
+            latencies.append((time.time_ns() - ts) / 1e9)
+        return add(container, message, *args, **kwargs)
+
+    alerts.LOG_CACHE = CacheProxy()
+    store.add = timed_add
+    return latencies
+
+
+def stream_websocket(client, name: str, duration: float) -> dict:
+    """Read a WebSocket stream for `duration` seconds; report throughput and delivery latency."""
+    from app.docker_async import parse_timestamp
+
+    delays, lines, frames = [], 0, 0
+    connected = time.perf_counter()
+    with client.websocket_connect(f"/ws/logs/{name}") as ws:
+        first = ws.receive_text()
+        first_frame_secs = time.perf_counter() - connected
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            frame = ws.receive_text()
+            now = time.time_ns()
+            frames += 1
+            for line in frame.splitlines():
+                if line.startswith("[LogForge]"):
+                    continue
+                lines += 1
+                delays.append((now - parse_timestamp(line.split(" ", 1)[0].encode())) / 1e9)
+    return {
+        "backfill_bytes": len(first),
+        "first_frame_ms": round(first_frame_secs * 1000, 3),
+        "frames": frames,
+        "lines": lines,
+        "lines_per_frame": round(lines / frames, 1) if frames else None,
+        "delivery_latency": percentiles(delays),
+    }
+
+
+def run(args) -> dict:
+    proc, url = spawn(args.containers, args.rate, args.keyword_density, args.backlog)
+    os.environ["DOCKER_HOST"] = url
+    try:
+        from app import settings
+        # Work on a copy of config.yml, so the run neither edits the real
+        # one nor the shared snapshot
+        config_path = Path(tempfile.mkdtemp()) / "config.yml"
+        shutil.copyfile(settings.CONFIG_PATH, config_path)
+        settings.CONFIG_PATH = config_path
+
+        def bench_config(config):
+            config["docker"] = {"hosts": {}}
+            config.setdefault("email", {})["enabled"] = False
+            config.setdefault("archive", {})["enabled"] = args.archive
+
+        settings.update_config(bench_config)
+
+        rss0, cpu0 = rss_bytes(), time.process_time()
+        start = time.perf_counter()
+        from fastapi.testclient import TestClient
+        from app import alerts
+        from app.main import app
+        from app.ingest import ENGINE
+        import_secs = time.perf_counter() - start
+
+        measure_from = time.time_ns()
+        alert_latencies = track_alert_latency(alerts, measure_from)
+        with TestClient(app) as client:
+            startup_secs = time.perf_counter() - start
+            assert client.get("/health").status_code == 200
+            health_secs = time.perf_counter() - start
+            warmup = wait_ready(client)
+            ready_secs = time.perf_counter() - start
+            time.sleep(args.warmup)
+            # Quiet window: only ingest and the alert scan are running, so
+            # CPU per line is not diluted by request handling.
+            lines0, cpu1, rss1 = ENGINE.lines_ingested, time.process_time(), rss_bytes()
+            wall0 = time.perf_counter()
+            time.sleep(args.duration)
+            wall = time.perf_counter() - wall0
+            lines = ENGINE.lines_ingested - lines0
+            cpu = time.process_time() - cpu1
+            rss2 = rss_bytes()
+
+            # Request paths, with a WebSocket viewer streaming alongside
+            ws_result = {}
+            ws_thread = threading.Thread(
+                target=lambda: ws_result.update(stream_websocket(client, "app-0000", args.ws_duration)))
+            ws_thread.start()
+            containers = timed_requests(client, "/containers", args.requests)
+            filtered = timed_requests(client, "/logs/filter/app-0001?limit=1000", max(1, args.requests // 10))
+            alerts_read = timed_requests(client, "/alerts?limit=100", args.requests)
+            # A quarter of the containers (shard label), last 10 seconds
+            exported = timed_requests(client, f"/logs/export?labels=shard%3D0&since={time.time() - 10:.3f}",
+                                      max(1, args.requests // 20))
+            ws_thread.join()
+            cached = client.get("/debug/logcache").json()["total_bytes"]
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    return {
+        "params": vars(args),
+        "python": platform.python_version(),
+        "cold_start": {
+            "import_ms": round(import_secs * 1000, 1),
+            "startup_ms": round(startup_secs * 1000, 1),
+            "health_ms": round(health_secs * 1000, 1),
+            "ready_ms": round(ready_secs * 1000, 1),
+            "warmup": warmup,
+        },
+        "ingest": {
+            "lines": lines,
+            "lines_per_sec": round(lines / wall, 1),
+            "expected_lines_per_sec": args.containers * args.rate,
+            "cpu_seconds": round(cpu, 3),
+            "cpu_ms_per_1k_lines": round(cpu * 1e6 / lines, 3) if lines else None,
+        },
+        "alert_latency": percentiles(alert_latencies),
+        "requests": {
+            "containers": containers,
+            "logs_filter": filtered,
+            "alerts": alerts_read,
+            "logs_export": exported,
+        },
+        "websocket": ws_result,
+        "memory": {
+            "rss_start_bytes": rss0,
+            "rss_after_warmup_bytes": rss1,
+            "rss_after_ingest_bytes": rss2,
+            "rss_growth_bytes": rss2 - rss1,
+            "log_cache_bytes": cached,
+        },
+        "cpu_total_seconds": round(time.process_time() - cpu0, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--containers", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=20.0, help="lines/sec per container")
+    parser.add_argument("--keyword-density", type=float, default=0.01, help="share of lines that raise an alert")
+    parser.add_argument("--backlog", type=float, default=10.0, help="seconds of log history at startup")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of ingest-only measurement")
+    parser.add_argument("--ws-duration", type=float, default=5.0, help="seconds to read the WebSocket stream")
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--archive", action="store_true", help="also write the on-disk archive")
+    parser.add_argument("--output", help="also write the JSON result to this file")
+    args = parser.parse_args()
+
+    # Keep the app's own console output out of the JSON on stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        result = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(result + "\n")
+    print(result)
+
+
+if __name__ == "__main__":
+    main()
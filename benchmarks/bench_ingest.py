@@ -0,0 +1,108 @@
+"""Ingest throughput: follow-stream engine vs. the old poll-and-refetch loop.
+
+The legacy path re-creates the pre-engine `fetch_logs_background`: one thread
+per container that re-downloads `tail=1000` lines every `refresh_interval`
+seconds with docker-py. The engine path follows every container once with
+`app.ingest.IngestEngine`. Both run against `benchmarks.fake_docker` in a
+subprocess, so the numbers below are client-side CPU only.
+
+    python -m benchmarks.bench_ingest --containers 100 --rate 20 --duration 20
+"""
+import json
+import time
+import asyncio
+import argparse
+import threading
+
+import docker
+
+from app.docker_async import AsyncDockerClient
+from app.ingest import IngestEngine
+from benchmarks.fake_docker import spawn
+
+
+def run_legacy(url: str, names: list, duration: float, refresh_interval: float) -> dict:
+    client = docker.DockerClient(base_url=url)
+    stop = threading.Event()
+    stats = {"lines_transferred": 0, "bytes_transferred": 0}
+    seen = {}
+    lock = threading.Lock()
+
+    def fetch(name):
+        while not stop.is_set():
+            container = client.containers.get(name)
+            logs = container.logs(tail=1000, timestamps=True, stdout=True, stderr=True, follow=False).decode()
+            lines = logs.splitlines()
+            with lock:
+                stats["lines_transferred"] += len(lines)
+                stats["bytes_transferred"] += len(logs)
+                if lines:
+                    seen.setdefault(name, set()).update(line[:30] for line in lines)
+            stop.wait(refresh_interval)
+
+    threads = [threading.Thread(target=fetch, args=(name,), daemon=True) for name in names]
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    cpu, wall = time.process_time() - cpu0, time.perf_counter() - wall0
+
+    unique = sum(len(s) for s in seen.values())
+    return _report(stats["lines_transferred"], stats["bytes_transferred"], unique, cpu, wall, len(threads))
+
+
+def run_engine(url: str, names: list, duration: float) -> dict:
+    async def go():
+        engine = IngestEngine(AsyncDockerClient(url))
+        cpu0, wall0 = time.process_time(), time.perf_counter()
+        for name in names:
+            engine.watch(name, name)
+        await asyncio.sleep(duration)
+        await engine.stop()
+        cpu, wall = time.process_time() - cpu0, time.perf_counter() - wall0
+        return _report(engine.lines_ingested, engine.bytes_ingested, engine.lines_ingested,
+                       cpu, wall, threading.active_count() - 1)
+
+    return asyncio.run(go())
+
+
+def _report(transferred, nbytes, unique, cpu, wall, threads) -> dict:
+    return {
+        "lines_transferred": transferred,
+        "bytes_transferred": nbytes,
+        "unique_lines": unique,
+        "unique_lines_per_sec": round(unique / wall, 1),
+        "cpu_seconds": round(cpu, 3),
+        "cpu_ms_per_1k_unique_lines": round(cpu * 1e6 / unique, 3) if unique else None,
+        "threads": threads,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--containers", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=20.0, help="lines/sec per container")
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--refresh-interval", type=float, default=5.0,
+                        help="legacy poll interval (60s in production, shortened to fit the run)")
+    args = parser.parse_args()
+
+    proc, url = spawn(args.containers, args.rate, backlog_seconds=120)
+    try:
+        names = [f"app-{n:04d}" for n in range(args.containers)]
+        results = {
+            "params": vars(args),
+            "legacy_poll": run_legacy(url, names, args.duration, args.refresh_interval),
+            "follow_engine": run_engine(url, names, args.duration),
+        }
+    finally:
+        proc.terminate()
+        proc.wait()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Keyword matching: compiled KeywordMatcher vs. `any(k in line for k in keywords)`.
+
+    python -m benchmarks.bench_matcher --lines 50000
+"""
+import json
+import time
+import random
+import string
+import argparse
+
+from app.matcher import KeywordMatcher
+
+BASE_KEYWORDS = ["ERROR", "Error", "Exception", "FATAL", "Traceback", "WARNING", "Warning"]
+
+
+def make_lines(n: int, density: float, rng: random.Random) -> list:
+    lines = []
+    for i in range(n):
+        if rng.random() < density:
+            lines.append(f"2025-05-09T00:16:16.278363799Z {rng.choice(BASE_KEYWORDS)} upstream timed out after {rng.randint(1, 9000)}ms")
+        else:
+            lines.append(f"2025-05-09T00:16:16.278363799Z INFO GET /api/items/{rng.randint(1, 10 ** 5)} 200 "
+                         f"{rng.randint(1, 500)}ms request_id={rng.getrandbits(64):016x}")
+    return lines
+
+
+def make_keywords(n: int, rng: random.Random) -> list:
+    extra = ["".join(rng.choices(string.ascii_letters, k=rng.randint(5, 12))) for _ in range(max(0, n - len(BASE_KEYWORDS)))]
+    return (BASE_KEYWORDS + extra)[:n]
+
+
+def timed(fn) -> tuple:
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=50000)
+    parser.add_argument("--density", type=float, default=0.01, help="share of lines containing a keyword")
+    parser.add_argument("--sizes", default="10,100,1000")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    lines = make_lines(args.lines, args.density, rng)
+    raw = [line.encode() for line in lines]
+    results = {"params": vars(args), "results": []}
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        keywords = make_keywords(size, rng)
+        (_, compile_secs) = timed(lambda: KeywordMatcher(keywords))
+        matcher = KeywordMatcher(keywords)
+
+        hits_any, t_any = timed(lambda: sum(1 for l in lines if any(k in l for k in keywords)))
+        hits_str, t_str = timed(lambda: sum(1 for l in lines if matcher.search(l)))
+        hits_bytes, t_bytes = timed(lambda: sum(1 for l in raw if matcher.search(l)))
+        assert hits_any == hits_str == hits_bytes
+
+        results["results"].append({
+            "keywords": size,
+            "hits": hits_any,
+            "compile_ms": round(compile_secs * 1e3, 2),
+            "any_generator_ns_per_line": round(t_any * 1e9 / len(lines)),
+            "matcher_str_ns_per_line": round(t_str * 1e9 / len(lines)),
+            "matcher_bytes_ns_per_line": round(t_bytes * 1e9 / len(lines)),
+            "speedup": round(t_any / t_bytes, 1),
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
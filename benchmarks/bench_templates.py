@@ -0,0 +1,110 @@
+"""Template mining: TemplateMiner throughput and grouping on synthetic alert lines.
+
+    python -m benchmarks.bench_templates --lines 200000 --patterns 50
+"""
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+from app.alert_store import AlertStore
+from app.templates import TemplateMiner
+
+WORDS = ["upstream", "connection", "refused", "timeout", "worker", "shard", "queue", "user",
+         "payment", "session", "cache", "replica", "lock", "token", "disk", "socket"]
+LEVELS = ["ERROR", "Exception", "FATAL", "WARNING"]
+
+
+def make_patterns(n: int, rng: random.Random) -> list:
+    """Line generators: fixed words with variable slots, like real log statements."""
+    patterns = []
+    for _ in range(n):
+        words = rng.sample(WORDS, rng.randint(3, 7))
+        slots = sorted(rng.sample(range(len(words) + 1), rng.randint(1, 3)))
+        patterns.append((rng.choice(LEVELS), words, slots))
+    return patterns
+
+
+def render(pattern: tuple, rng: random.Random) -> str:
+    level, words, slots = pattern
+    parts = [f"2025-05-09T00:16:{rng.randint(10, 59)}.{rng.getrandbits(20):06d}Z", level]
+    for i in range(len(words) + 1):
+        if i in slots:
+            kind = rng.randrange(4)
+            if kind == 0:
+                parts.append(f"id={rng.getrandbits(64):016x}")
+            elif kind == 1:
+                parts.append(f"10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}:{rng.randint(1024, 65535)}")
+            elif kind == 2:
+                parts.append(f"{rng.randint(1, 99999)}ms")
+            else:
+                parts.append(f"{rng.getrandbits(128):032x}")
+        if i < len(words):
+            parts.append(words[i])
+    return " ".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=200000)
+    parser.add_argument("--patterns", type=int, default=50, help="distinct log statements generating the lines")
+    parser.add_argument("--containers", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    patterns = make_patterns(args.patterns, rng)
+    lines = [(f"app-{rng.randrange(args.containers):04d}", render(rng.choice(patterns), rng))
+             for _ in range(args.lines)]
+
+    miner = TemplateMiner()
+    start = time.perf_counter()
+    for _, line in lines:
+        miner.add(line)
+    mine_secs = time.perf_counter() - start
+
+    # The full alert path: mine, then group in the store
+    def alert_path():
+        miner, store = TemplateMiner(), AlertStore(max_alerts=args.lines)
+        for name, line in lines:
+            template = miner.add(line)
+            store.add(name, line, template.id, template.template)
+        return miner, store
+
+    start = time.perf_counter()
+    miner, store = alert_path()
+    grouped_secs = time.perf_counter() - start
+    tracemalloc.start()
+    kept = alert_path()
+    grouped_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+
+    # Ungrouped baseline: one stored alert per line, as before template mining
+    raw = AlertStore(max_alerts=args.lines)
+    tracemalloc.start()
+    for name, line in lines:
+        raw.add(name, line)
+    raw_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    payload_grouped = len(json.dumps(store.query(limit=args.lines)))
+    payload_raw = len(json.dumps(raw.query(limit=args.lines)))
+    print(json.dumps({
+        "params": vars(args),
+        "templates": len(miner),
+        "mine_lines_per_sec": round(args.lines / mine_secs),
+        "mine_us_per_line": round(mine_secs * 1e6 / args.lines, 2),
+        "alert_path_lines_per_sec": round(args.lines / grouped_secs),
+        "alert_groups": len(store),
+        "raw_alerts": len(raw),
+        "store_bytes_grouped": grouped_bytes,
+        "store_bytes_raw": raw_bytes,
+        "payload_bytes_grouped": payload_grouped,
+        "payload_bytes_raw": payload_raw,
+        "reduction": round(payload_raw / payload_grouped, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
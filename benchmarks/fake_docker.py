@@ -0,0 +1,447 @@
+"""In-process fake of the Docker Engine API, served over a unix socket.
+
+Simulates N containers that each emit a deterministic stream of log lines at
+a fixed rate, with a configurable share of lines containing alert keywords.
+Both docker-py (`docker.DockerClient(base_url=...)`) and
+`app.docker_async.AsyncDockerClient` can talk to it.
+
+Run standalone so the daemon's CPU is not counted against the client:
+
+    python -m benchmarks.fake_docker --socket /tmp/fake-docker.sock --containers 50
+"""
+import re
+import json
+import time
+import random
+import asyncio
+import argparse
+import hashlib
+import tempfile
+import threading
+import subprocess
+import sys
+import os
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, parse_qs
+
+KEYWORDS = ["ERROR", "Exception", "Traceback", "FATAL", "WARNING"]
+_VERSION_PREFIX = re.compile(r"^/v[\d.]+")
+API_VERSION = (1, 41)   # newest API version the fake daemon claims to speak
+
+
+def format_ts(ts_ns: int) -> bytes:
+    secs, frac = divmod(ts_ns, 1_000_000_000)
+    stamp = datetime.fromtimestamp(secs, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+    return f"{stamp}.{frac:09d}Z".encode()
+
+
+class FakeContainer:
+    """A container whose i-th log line is emitted at start + i / rate."""
+
+    def __init__(self, name: str, rate: float, keyword_density: float, start_ns: int):
+        self.name = name
+        self.id = hashlib.sha256(name.encode()).hexdigest()
+        self.seed = int(self.id[:12], 16)
+        self.rate = rate
+        self.period = int(1_000_000_000 / rate)
+        self.keyword_density = keyword_density
+        self.start_ns = start_ns
+        self.started_at = datetime.fromtimestamp(start_ns / 1e9, tz=timezone.utc).isoformat()
+        self.stopped_ns = None   # set while stopped; no lines are emitted after it
+        self.labels = {"bench": "true", "shard": str(self.seed % 4)}
+
+    @property
+    def running(self) -> bool:
+        return self.stopped_ns is None
+
+    def last_index(self, now: int) -> int:
+        """Index one past the newest line emitted by `now`."""
+        return self.index_at(now if self.running else min(now, self.stopped_ns))
+
+    def index_at(self, ts_ns: int) -> int:
+        """Index of the first line emitted at or after ts_ns."""
+        if ts_ns <= self.start_ns:
+            return 0
+        return -(-(ts_ns - self.start_ns) // self.period)
+
+    def ts(self, i: int) -> int:
+        return self.start_ns + i * self.period
+
+    def line(self, i: int) -> bytes:
+        rng = random.Random(self.seed + i)
+        if rng.random() < self.keyword_density:
+            keyword = KEYWORDS[i % len(KEYWORDS)]
+            return (f"{keyword} request {rng.getrandbits(32):08x} failed: "
+                    f"upstream 10.0.{i % 255}.{rng.randint(1, 254)} timed out after {rng.randint(1, 9000)}ms").encode()
+        return (f"INFO GET /api/items/{rng.randint(1, 100000)} 200 "
+                f"{rng.randint(1, 500)}ms request_id={rng.getrandbits(64):016x}").encode()
+
+    def attrs(self) -> dict:
+        return {
+            "Id": self.id,
+            "Name": f"/{self.name}",
+            "Created": self.started_at,
+            "State": {"Status": "running" if self.running else "exited", "Running": self.running,
+                      "StartedAt": self.started_at},
+            "Config": {"Image": "fake/app:latest", "Cmd": ["serve"], "Entrypoint": None,
+                       "Tty": False, "Labels": self.labels},
+            "NetworkSettings": {"Ports": {}, "Networks": {"bridge": {}}},
+            "Mounts": [],
+            "HostConfig": {},
+        }
+
+    def summary(self) -> dict:
+        return {"Id": self.id, "Names": [f"/{self.name}"], "Image": "fake/app:latest",
+                "State": "running" if self.running else "exited",
+                "Status": "Up" if self.running else "Exited (0)", "Labels": self.labels}
+
+
+class FakeDockerDaemon:
+    """Serve a fake Docker Engine API on a unix socket from a background thread."""
+
+    def __init__(self, containers: int = 10, lines_per_sec: float = 10.0,
+                 keyword_density: float = 0.01, backlog_seconds: float = 60.0,
+                 socket_path: str = None):
+        start = time.time_ns() - int(backlog_seconds * 1e9)
+        self._rate = lines_per_sec
+        self._density = keyword_density
+        self.containers = {}
+        for n in range(containers):
+            c = FakeContainer(f"app-{n:04d}", lines_per_sec, keyword_density, start)
+            self.containers[c.id] = c
+        self.socket_path = socket_path or os.path.join(tempfile.mkdtemp(), "docker.sock")
+        self.requests = 0
+        self.stats_interval = 1.0   # seconds between streamed stats documents, like dockerd
+        self.response_delay = 0.0   # seconds before answering a JSON request, to simulate a slow daemon
+        self.events = []            # Docker /events documents, oldest first
+        self._event_streams = set() # asyncio.Event per open /events request
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"unix://{self.socket_path}"
+
+    def find(self, ref: str):
+        for c in self.containers.values():
+            if c.id.startswith(ref) or c.name == ref:
+                return c
+        return None
+
+    # -- container changes -----------------------------------------------
+
+    def add_container(self, name: str) -> FakeContainer:
+        """Create and start a container, emitting create/start events. Thread-safe."""
+        c = FakeContainer(name, self._rate, self._density, time.time_ns())
+        self._call(self._add, c)
+        return c
+
+    def remove_container(self, ref: str):
+        """Kill and remove a container, emitting die/destroy events. Thread-safe."""
+        self._call(self._remove, ref)
+
+    def stop_container(self, ref: str):
+        """Stop a container, emitting a die event; its log streams end. Thread-safe."""
+        self._call(self._set_running, ref, False)
+
+    def start_container(self, ref: str):
+        """Start a stopped container again, emitting a start event. Thread-safe.
+
+        Lines continue on the same schedule, so the ones timestamped while
+        it was stopped show up as well.
+        """
+        self._call(self._set_running, ref, True)
+
+    def _call(self, fn, *args):
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(fn, *args)
+        else:
+            fn(*args)
+
+    def _add(self, c: FakeContainer):
+        self.containers[c.id] = c
+        self._emit("create", c)
+        self._emit("start", c)
+
+    def _remove(self, ref: str):
+        c = self.find(ref)
+        if c is not None:
+            del self.containers[c.id]
+            self._emit("die", c)
+            self._emit("destroy", c)
+
+    def _set_running(self, ref: str, running: bool):
+        c = self.find(ref)
+        if c is not None and c.running != running:
+            c.stopped_ns = None if running else time.time_ns()
+            self._emit("start" if running else "die", c)
+
+    def _emit(self, action: str, c: FakeContainer):
+        now = time.time_ns()
+        self.events.append({
+            "Type": "container", "Action": action, "id": c.id, "status": action,
+            "Actor": {"ID": c.id, "Attributes": {"name": c.name}},
+            "time": now // 1_000_000_000, "timeNano": now,
+        })
+        for waiter in self._event_streams:
+            waiter.set()
+
+    # -- lifecycle -------------------------------------------------------
+
+    def start(self) -> str:
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(
+                asyncio.start_unix_server(self._handle, path=self.socket_path)
+            )
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.url
+
+    def stop(self):
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=5)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    async def _shutdown(self):
+        # End open connections too, so none is left suspended on a stopped loop
+        self._server.close()
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def serve_forever(self):
+        self._server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        async with self._server:
+            await self._server.serve_forever()
+
+    # -- HTTP ------------------------------------------------------------
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode().partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                if int(headers.get("content-length", 0)):
+                    await reader.readexactly(int(headers["content-length"]))
+
+                self.requests += 1
+                keep_alive = headers.get("connection", "").lower() != "close"
+                parts = urlsplit(target)
+                prefix = _VERSION_PREFIX.match(parts.path)
+                version = tuple(int(n) for n in prefix.group()[2:].split(".")) if prefix else API_VERSION
+                path = parts.path[prefix.end():] if prefix else parts.path
+                query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+                keep_alive = await self._route(method, path, query, writer, version) and keep_alive
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, query, writer, version: tuple = API_VERSION) -> bool:
+        if path in ("/_ping",):
+            return await self._send(writer, 200, b"OK", "text/plain")
+        if path == "/version":
+            return await self._json(writer, {"ApiVersion": "1.41", "Version": "fake", "MinAPIVersion": "1.12"})
+        if path == "/containers/json":
+            return await self._json(writer, [c.summary() for c in self.containers.values()])
+        if path == "/events":
+            return await self._events(writer, query)
+
+        m = re.match(r"^/containers/([^/]+)/(json|logs|stats)$", path)
+        if m:
+            container = self.find(m.group(1))
+            if container is None:
+                return await self._json(writer, {"message": f"No such container: {m.group(1)}"}, 404)
+            if m.group(2) == "json":
+                return await self._json(writer, container.attrs())
+            if m.group(2) == "stats":
+                return await self._stats(writer, container, query)
+            return await self._logs(writer, container, query, version)
+
+        return await self._json(writer, {"message": "page not found"}, 404)
+
+    async def _send(self, writer, status, body: bytes, content_type: str) -> bool:
+        writer.write(
+            f"HTTP/1.1 {status} X\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+        return True
+
+    async def _json(self, writer, doc, status=200) -> bool:
+        if self.response_delay:
+            await asyncio.sleep(self.response_delay)
+        return await self._send(writer, status, json.dumps(doc).encode(), "application/json")
+
+    async def _logs(self, writer, c: FakeContainer, query: dict, version: tuple = API_VERSION) -> bool:
+        timestamps = query.get("timestamps") in ("1", "true", "True")
+        follow = query.get("follow") in ("1", "true", "True")
+        since = int(float(query["since"]) * 1e9) if query.get("since") else 0
+        until = int(float(query["until"]) * 1e9) if query.get("until") else 0
+
+        now = time.time_ns()
+        first = c.index_at(since)
+        end = c.last_index(min(until, now) if until else now)
+        tail = query.get("tail", "all")
+        if tail not in ("all", "") and int(tail) >= 0:
+            first = max(first, end - int(tail))
+
+        # Like dockerd, only API 1.42+ labels a multiplexed stream as one;
+        # older versions call every log stream raw.
+        content_type = "multiplexed-stream" if version >= (1, 42) else "raw-stream"
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: application/vnd.docker." + content_type.encode() + b"\r\n"
+            b"Transfer-Encoding: chunked\r\n\r\n"
+        )
+
+        def frames(lo, hi):
+            out = bytearray()
+            for i in range(lo, hi):
+                line = c.line(i)
+                if timestamps:
+                    line = format_ts(c.ts(i)) + b" " + line
+                line += b"\n"
+                out += b"\x01\x00\x00\x00" + len(line).to_bytes(4, "big") + line
+            return bytes(out)
+
+        async def send(lo, hi):
+            for start in range(lo, hi, 500):
+                data = frames(start, min(hi, start + 500))
+                if data:
+                    writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    await writer.drain()
+
+        await send(first, end)
+        # Like Docker, a followed stream ends when the container stops or goes away
+        while follow and c.running and c.id in self.containers:
+            await asyncio.sleep(0.05)
+            now = time.time_ns()
+            if until and now >= until:
+                await send(end, c.last_index(until))
+                break
+            new_end = c.last_index(now)
+            await send(end, new_end)
+            end = new_end
+
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        return True
+
+    async def _stats(self, writer, c: FakeContainer, query: dict) -> bool:
+        stream = query.get("stream", "1") in ("1", "true", "True")
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: application/json\r\n"
+            b"Transfer-Encoding: chunked\r\n\r\n"
+        )
+        # CPU use proportional to the container's log rate, on a 4 CPU host
+        pre, tick = None, 0
+        while True:
+            now = time.time_ns()
+            usage = {"cpu_usage": {"total_usage": int(c.rate * 1e6) * tick}, "system_cpu_usage": int(4e9) * tick,
+                     "online_cpus": 4}
+            doc = {
+                "read": format_ts(now).decode(),
+                "cpu_stats": usage,
+                "precpu_stats": pre or {"cpu_usage": {"total_usage": 0}},
+                "memory_stats": {"usage": 64 * 2 ** 20 + tick * 4096, "limit": 2 * 2 ** 30,
+                                 "stats": {"inactive_file": 2 ** 20}},
+                "networks": {"eth0": {"rx_bytes": tick * 1500, "tx_bytes": tick * 900}},
+                "blkio_stats": {"io_service_bytes_recursive": [
+                    {"op": "read", "value": tick * 512}, {"op": "write", "value": tick * 4096}]},
+            }
+            data = json.dumps(doc).encode() + b"\n"
+            writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            await writer.drain()
+            if not stream:
+                break
+            pre, tick = usage, tick + 1
+            await asyncio.sleep(self.stats_interval)
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        return True
+
+    async def _events(self, writer, query: dict) -> bool:
+        since = int(float(query["since"]) * 1e9) if query.get("since") else time.time_ns()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: application/json\r\n"
+            b"Transfer-Encoding: chunked\r\n\r\n"
+        )
+        waiter = asyncio.Event()
+        self._event_streams.add(waiter)
+        try:
+            sent = 0
+            while True:
+                for event in self.events[sent:]:
+                    if event["timeNano"] >= since:
+                        data = json.dumps(event).encode() + b"\n"
+                        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                sent = len(self.events)
+                await writer.drain()
+                await waiter.wait()
+                waiter.clear()
+        finally:
+            self._event_streams.discard(waiter)
+
+
+def spawn(containers: int, lines_per_sec: float, keyword_density: float = 0.01,
+          backlog_seconds: float = 60.0):
+    """Start the fake daemon in a subprocess. Returns (process, DOCKER_HOST url)."""
+    sock = os.path.join(tempfile.mkdtemp(), "docker.sock")
+    proc = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_docker", "--socket", sock,
+        "--containers", str(containers), "--rate", str(lines_per_sec),
+        "--keyword-density", str(keyword_density), "--backlog", str(backlog_seconds),
+    ])
+    for _ in range(200):
+        if os.path.exists(sock):
+            break
+        time.sleep(0.05)
+    return proc, f"unix://{sock}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--socket", required=True)
+    parser.add_argument("--containers", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=10.0, help="lines/sec per container")
+    parser.add_argument("--keyword-density", type=float, default=0.01)
+    parser.add_argument("--backlog", type=float, default=60.0, help="seconds of history at startup")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before answering JSON requests")
+    args = parser.parse_args()
+
+    daemon = FakeDockerDaemon(args.containers, args.rate, args.keyword_density,
+                              args.backlog, socket_path=args.socket)
+    daemon.response_delay = args.delay
+    try:
+        asyncio.run(daemon.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import shutil
+
+import pytest
+
+from app import settings
+from benchmarks.fake_docker import FakeDockerDaemon
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    """Make a private copy of config.yml the live config; yields settings.update_config."""
+    path = tmp_path / "config.yml"
+    shutil.copyfile(settings.CONFIG_PATH, path)
+    monkeypatch.setattr(settings, "CONFIG_PATH", path)
+    monkeypatch.setattr(settings, "_current", None)
+    settings._derived.clear()
+    yield settings.update_config
+    settings.flush_config()
+    settings._derived.clear()
+
+
+@pytest.fixture
+def fake_docker():
+    """Start fake Docker daemons on unix sockets: fake_docker(containers, **options)."""
+    daemons = []
+
+    def start(containers: int = 2, **options) -> FakeDockerDaemon:
+        daemon = FakeDockerDaemon(containers, **options)
+        daemon.start()
+        daemons.append(daemon)
+        return daemon
+
+    yield start
+    for daemon in daemons:
+        daemon.stop()
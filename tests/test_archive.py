@@ -0,0 +1,106 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import archive, docker_utils
+from app.archive import LogArchive
+from app.main import app
+
+SECOND = 1_000_000_000
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    # Many blocks and segments from a few thousand lines
+    monkeypatch.setattr(archive, "BLOCK_BYTES", 2048)
+    monkeypatch.setattr(archive, "SEGMENT_BYTES", 8192)
+
+
+def write(store: LogArchive, name: str, stamps, batch: int = 50):
+    stamps = list(stamps)
+    for i in range(0, len(stamps), batch):
+        store.append(name, [(ts, b"line at %d" % ts) for ts in stamps[i:i + batch]])
+        store.flush()
+    store.flush(force=True)
+
+
+def read(store: LogArchive, name: str, since=None, until=None) -> list:
+    return [ts for batch in store.read_range(name, since, until) for ts, _ in batch]
+
+
+def test_read_range_across_blocks_and_segments(tmp_path, small_blocks):
+    store = LogArchive(tmp_path, max_bytes=1 << 30, max_age_seconds=1e9)
+    stamps = [1000 * SECOND + i * 10 for i in range(3000)]
+    write(store, "web", stamps)
+    assert len(list((tmp_path / "web").glob("*.seg"))) > 1
+
+    assert read(store, "web") == stamps
+    since, until = stamps[1234], stamps[2345]
+    assert read(store, "web", since, until) == stamps[1234:2345]
+    # `until` is exclusive, `since` inclusive, also between two lines
+    assert read(store, "web", stamps[10] + 1, stamps[13]) == stamps[11:13]
+    assert read(store, "web", until=stamps[0]) == []
+    assert read(store, "web", since=stamps[-1] + 1) == []
+    assert store.oldest("web") == stamps[0]
+
+
+def test_read_range_includes_unflushed_lines(tmp_path):
+    store = LogArchive(tmp_path, max_bytes=1 << 30, max_age_seconds=1e9)
+    write(store, "web", range(100, 200))
+    store.append("web", [(200, b"pending"), (201, b"pending")])
+    lines = [line for batch in store.read_range("web", since=150) for line in batch]
+    assert [ts for ts, _ in lines] == list(range(150, 202))
+    assert lines[-1] == (201, b"pending")
+
+
+def test_read_range_skips_lines_already_archived(tmp_path):
+    store = LogArchive(tmp_path, max_bytes=1 << 30, max_age_seconds=1e9)
+    write(store, "web", range(SECOND, SECOND + 10))
+    # A restart re-ingests lines that were archived before it
+    reopened = LogArchive(tmp_path, max_bytes=1 << 30, max_age_seconds=1e9)
+    write(reopened, "web", range(SECOND + 5, SECOND + 15))
+    assert read(reopened, "web") == list(range(SECOND, SECOND + 15))
+
+
+def test_read_range_unknown_container(tmp_path):
+    store = LogArchive(tmp_path, max_bytes=1 << 30, max_age_seconds=1e9)
+    assert read(store, "nope") == []
+    assert store.oldest("nope") is None
+
+
+def test_writer_touches_no_files_until_flushed(tmp_path):
+    store = LogArchive(tmp_path, max_bytes=1 << 30, max_age_seconds=1e9)
+    store.append("web", [(SECOND, b"one")])
+    assert not (tmp_path / "web").exists()
+    store.flush(force=True)
+    assert read(store, "web") == [SECOND]
+
+
+def test_released_writer_is_flushed_and_forgotten(tmp_path):
+    store = LogArchive(tmp_path, max_bytes=1 << 30, max_age_seconds=1e9)
+    store.append("web", [(SECOND, b"one"), (SECOND + 1, b"two")])
+    store.release("web")
+    assert store._writers == {}
+    store.flush()
+    assert read(store, "web") == [SECOND, SECOND + 1]
+    assert store._released == []
+    # A container re-created under the same name continues the archive
+    store.append("web", [(SECOND + 1, b"two"), (SECOND + 2, b"three")])
+    store.flush(force=True)
+    assert read(store, "web") == [SECOND, SECOND + 1, SECOND + 2]
+
+
+@pytest.mark.parametrize("name", ["", ".", "..", "../etc", "a/b", "a\\b"])
+def test_rejects_names_outside_the_archive(tmp_path, name):
+    store = LogArchive(tmp_path / "archive", max_bytes=1 << 30, max_age_seconds=1e9)
+    with pytest.raises(ValueError):
+        store.oldest(name)
+    with pytest.raises(ValueError):
+        list(store.read_range(name))
+    with pytest.raises(ValueError):
+        store.append(name, [(SECOND, b"x")])
+
+
+def test_export_rejects_path_names(tmp_path, monkeypatch):
+    monkeypatch.setattr(docker_utils, "ARCHIVE", LogArchive(tmp_path, max_bytes=1 << 30, max_age_seconds=1e9))
+    response = TestClient(app).get("/logs/export", params={"since": "0", "containers": "../etc"})
+    assert response.status_code == 400
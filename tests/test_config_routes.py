@@ -0,0 +1,63 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routes.config import check_setting
+from app.settings import get_config
+
+
+def patch(*changes):
+    return TestClient(app).patch("/config", json={"changes": list(changes)})
+
+
+def test_changes_apply_together(config):
+    response = patch(
+        {"op": "add_keywords", "keywords": "OOM, panic"},
+        {"op": "remove_keywords", "keywords": ["Warning"]},
+        {"op": "add_recipient", "email": "ops@example.com", "container": "web"},
+        {"op": "set", "path": "email.alert_interval_hours", "value": 2},
+        {"op": "set", "path": "email.recipients.db", "value": ["dba@example.com"]},
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0]["added"] == ["OOM", "panic"]
+    assert results[1]["removed"] == ["Warning"]
+    current = get_config()
+    assert "OOM" in current["alert"]["keywords"] and "Warning" not in current["alert"]["keywords"]
+    assert current["email"]["recipients"] == {"web": ["ops@example.com"], "db": ["dba@example.com"]}
+    assert current["email"]["alert_interval_hours"] == 2
+
+
+@pytest.mark.parametrize("path, value", [
+    ("alert.keywords", "ERROR"),
+    ("alert", 3),
+    ("alert", {"keywords": "ERROR"}),
+    ("alert.nope", 1),
+    ("nope", {}),
+    ("alert.keywords.extra", ["x"]),
+    ("email.smtp_port", 70000),
+    ("email.enabled", "yes"),
+    ("cache.max_mb", -5),
+    ("alert.field_rules", ["level >= loud"]),
+    ("alert.rate_rules", [{"keyword": "x", "threshold": "-1"}]),
+    ("email.recipients.web", "ops@example.com"),
+])
+def test_invalid_set_is_rejected_and_nothing_applied(config, path, value):
+    before = get_config()
+    response = patch({"op": "add_keywords", "keywords": "OOM"}, {"op": "set", "path": path, "value": value})
+    assert response.status_code == 400
+    assert get_config() == before
+
+
+def test_incomplete_changes_are_rejected(config):
+    assert patch({"op": "set", "value": 1}).status_code == 400
+    assert patch({"op": "add_keywords", "keywords": " , "}).status_code == 400
+    assert patch({"op": "add_recipient", "email": "ops@example.com"}).status_code == 400
+    assert patch({"op": "explode"}).status_code == 422
+
+
+def test_check_setting_accepts_whole_sections():
+    check_setting("alert", {"keywords": ["ERROR"], "field_rules": ["level >= error"],
+                            "rate_rules": [{"keyword": "x", "threshold": 3}]})
+    check_setting("docker.hosts", {"a": "unix:///var/run/docker.sock"})
+    check_setting("email.smtp_port", 587)
@@ -0,0 +1,45 @@
+import pytest
+
+from app import dedup
+from app.dedup import DedupCache, normalize_message
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(dedup.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_recurring_key_is_let_through_once_per_ttl(clock):
+    cache = DedupCache(ttl_seconds=60)
+    let_through = []
+    # A template that recurs every 5s is suppressed for one TTL from when
+    # it was let through, not from its latest sighting
+    for _ in range(30):
+        if not cache.seen("boom"):
+            let_through.append(clock[0])
+        clock[0] += 5
+    assert let_through == [1000, 1060, 1120]
+    assert cache.misses == 3
+    assert cache.hits == 27
+
+
+def test_expired_and_excess_entries_are_dropped(clock):
+    cache = DedupCache(max_entries=3, ttl_seconds=60)
+    for key in "abcd":
+        cache.seen(key)
+        clock[0] += 10
+    assert len(cache) == 3
+    assert cache.evictions == 1
+    assert not cache.seen("a")
+    clock[0] += 61
+    cache.seen("e")
+    assert len(cache) == 1
+    assert cache.stats()["expirations"] == 2
+    assert cache.stats()["evictions"] == 3
+
+
+def test_normalize_message():
+    assert normalize_message("request 4f2a9c1e failed after 31ms") == "request <*> failed after <*>ms"
+    assert normalize_message("2025-05-09T00:16:16Z 10.0.0.5:8080 down") == "<*> <*> down"
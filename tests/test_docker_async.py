@@ -0,0 +1,136 @@
+import time
+import asyncio
+
+import pytest
+
+from app.docker_async import OPENED, AsyncDockerClient, DockerAPIError, PriorityLimiter
+
+
+def opened() -> int:
+    return sum(value for _, _, value in OPENED.samples())
+
+
+def test_requests_reuse_pooled_connections(fake_docker):
+    daemon = fake_docker(3)
+
+    async def main():
+        client = AsyncDockerClient(daemon.url)
+        before = opened()
+        for _ in range(20):
+            assert len(await client.get_json("/containers/json")) == 3
+        assert opened() - before == 1
+        await client.close()
+
+    asyncio.run(main())
+
+
+def test_concurrent_requests_are_bounded_by_the_pool(fake_docker):
+    daemon = fake_docker(1)
+    daemon.response_delay = 0.05
+
+    async def main():
+        client = AsyncDockerClient(daemon.url, max_connections=2)
+        before = opened()
+        start = time.perf_counter()
+        await asyncio.gather(*(client.get_json("/version") for _ in range(8)))
+        assert time.perf_counter() - start >= 4 * 0.05
+        assert opened() - before == 2
+        await client.close()
+
+    asyncio.run(main())
+
+
+def test_timeout_releases_the_slot(fake_docker):
+    daemon = fake_docker(1)
+
+    async def main():
+        client = AsyncDockerClient(daemon.url, max_connections=1, timeout=0.1)
+        daemon.response_delay = 1.0
+        with pytest.raises(asyncio.TimeoutError):
+            await client.get_json("/version")
+        daemon.response_delay = 0.0
+        assert (await client.get_json("/version"))["ApiVersion"]
+        await client.close()
+
+    asyncio.run(main())
+
+
+def test_cancelled_request_releases_the_slot(fake_docker):
+    daemon = fake_docker(1)
+
+    async def main():
+        client = AsyncDockerClient(daemon.url, max_connections=1)
+        daemon.response_delay = 1.0
+        task = asyncio.ensure_future(client.get_json("/version"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        daemon.response_delay = 0.0
+        # The cancelled call's connection is closed, not returned to the pool
+        assert client._idle == []
+        assert (await client.get_json("/version"))["ApiVersion"]
+        await client.close()
+
+    asyncio.run(main())
+
+
+def test_error_status(fake_docker):
+    daemon = fake_docker(1)
+
+    async def main():
+        client = AsyncDockerClient(daemon.url)
+        with pytest.raises(DockerAPIError) as e:
+            await client.get_json("/containers/nope/json")
+        assert e.value.status == 404
+        await client.close()
+
+    asyncio.run(main())
+
+
+def test_priority_limiter_admits_lowest_priority_first():
+    async def main():
+        limiter = PriorityLimiter(1)
+        await limiter.acquire()
+        order = []
+
+        async def waiter(name, priority):
+            await limiter.acquire(priority)
+            order.append(name)
+            limiter.release()
+
+        tasks = [asyncio.ensure_future(waiter(name, p)) for name, p in (("c", 3), ("a", 1), ("skip", 0), ("b", 2))]
+        await asyncio.sleep(0)
+        tasks[2].cancel()
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        assert order == ["a", "b", "c"]
+        # Every slot is free again
+        assert limiter._free == 1
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("tty", [None, False])
+def test_log_stream_framing_before_api_1_42(fake_docker, tty):
+    # Daemons before API 1.42 label multiplexed log streams as raw
+    daemon = fake_docker(1)
+    container = next(iter(daemon.containers.values()))
+
+    async def main():
+        client = AsyncDockerClient(daemon.url)
+        _, headers, _, writer = await client._request("GET", f"/containers/{container.id}/logs", {"stdout": True})
+        writer.close()
+        assert headers["content-type"] == "application/vnd.docker.raw-stream"
+
+        now = time.time_ns()
+        lines = [line async for batch in client.log_batches(
+            container.id, since=now - 2_000_000_000, until=now, follow=False, tty=tty) for line in batch]
+        assert lines
+        for ts, msg in lines:
+            assert now - 3_000_000_000 < ts <= now
+            assert msg.startswith((b"INFO", b"ERROR", b"Exception", b"Traceback", b"FATAL", b"WARNING"))
+        await client.close()
+
+    asyncio.run(main())
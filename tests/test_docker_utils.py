@@ -0,0 +1,80 @@
+import json
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.docker_utils import iter_filtered_logs, parse_cursor, parse_time
+from app.main import app
+from app.structured import FieldRules
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1715213776.5", 1_715_213_776_500_000_000),
+    ("0", 0),
+    ("2025-05-09T00:16:16Z", 1_746_749_776_000_000_000),
+    ("2025-05-09T00:16:16.25", 1_746_749_776_250_000_000),
+    ("2025-05-09T02:16:16+02:00", 1_746_749_776_000_000_000),
+])
+def test_parse_time(value, expected):
+    assert parse_time(value) == expected
+
+
+@pytest.mark.parametrize("value", ["inf", "-inf", "nan", "-1", "1e20", "1900-01-01", "yesterday"])
+def test_parse_time_rejects_bad_values(value):
+    with pytest.raises(ValueError):
+        parse_time(value)
+
+
+@pytest.mark.parametrize("url", [
+    "/logs/filter/web?since=inf",
+    "/logs/filter/web?until=nan",
+    "/logs/export?since=1e300",
+    "/alerts?since=-inf",
+])
+def test_routes_answer_400_for_bad_times(url):
+    assert TestClient(app).get(url).status_code == 400
+
+
+async def as_batches(lines, size: int = 3):
+    for i in range(0, len(lines), size):
+        yield lines[i:i + size]
+
+
+def page(lines, limit, cursor=None, where=None) -> tuple:
+    """One /logs/filter page over `lines`: the timestamps and messages returned, and the next cursor."""
+    since = parse_cursor(cursor)[0] if cursor else 0
+
+    async def main():
+        batches = as_batches([line for line in lines if line[0] >= since])
+        return [json.loads(row) for chunk in [c async for c in iter_filtered_logs(
+            batches, limit, parse_cursor(cursor) if cursor else None, where)] for row in chunk.splitlines()]
+
+    rows = asyncio.run(main())
+    return [(row["ts"], row["line"].split(" ", 1)[1]) for row in rows[:-1]], rows[-1]["next_cursor"]
+
+
+def test_pages_keep_lines_that_share_a_timestamp(config):
+    where = FieldRules.parse(["level == error"])
+    lines = []
+    for i, ts in enumerate([10, 20, 20, 20, 20, 20, 30, 30, 40]):
+        level = "info" if i in (3, 7) else "error"
+        lines.append((ts, json.dumps({"level": level, "n": i}).encode()))
+    expected = [(ts, msg.decode()) for ts, msg in lines if b'"error"' in msg]
+
+    seen, cursor = [], None
+    for _ in range(len(lines)):
+        rows, cursor = page(lines, 2, cursor, where)
+        seen += rows
+        if cursor is None:
+            break
+    assert seen == expected
+
+
+def test_parse_cursor():
+    assert parse_cursor("1715213776000000000:3") == (1715213776000000000, 3)
+    # A bare timestamp from an older page skips everything at it
+    assert parse_cursor("1715213776000000000")[1] > 10 ** 9
+    for bad in ("", "abc", "12:x", "-5:1", "5:-1"):
+        with pytest.raises(ValueError):
+            parse_cursor(bad)
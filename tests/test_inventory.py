@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+
+from app import docker_utils, inventory
+from app.docker_async import AsyncDockerClient
+from app.ingest import IngestEngine
+from app.inventory import ContainerInventory
+from app.settings import get_config
+
+
+async def until(condition, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.02)
+
+
+@pytest.fixture
+def fast_retry(monkeypatch):
+    monkeypatch.setattr(inventory, "RETRY_SECONDS", 0.05)
+    monkeypatch.setattr(inventory, "MAX_RETRY_SECONDS", 0.1)
+
+
+def test_hosts_load_concurrently_and_are_namespaced(fake_docker):
+    a, b = fake_docker(3), fake_docker(2)
+
+    async def main():
+        inv = ContainerInventory({"a": AsyncDockerClient(a.url), "b": AsyncDockerClient(b.url)})
+        loaded = []
+        await inv.load(on_host_loaded=loaded.append)
+        assert sorted(loaded) == ["a", "b"]
+        assert sorted(inv.snapshot) == ["a:app-0000", "a:app-0001", "a:app-0002", "b:app-0000", "b:app-0001"]
+        assert inv.snapshot["b:app-0001"]["host"] == "b"
+        assert inv.client_for("b:app-0000") is inv.hosts["b"]
+        await inv.stop()
+
+    asyncio.run(main())
+
+
+def test_host_that_comes_up_later_is_followed(fake_docker, fast_retry, tmp_path):
+    a = fake_docker(2, lines_per_sec=20.0)
+    dead = f"unix://{tmp_path / 'b.sock'}"
+
+    async def main():
+        inv = ContainerInventory({"a": AsyncDockerClient(a.url), "b": AsyncDockerClient(dead)})
+        engine = IngestEngine()
+        engine.client_for = inv.client_for
+        await inv.load(on_host_loaded=lambda host: engine.sync(inv.snapshot))
+        inv.start()
+        assert inv.hosts_loaded == 1
+        assert sorted(engine.watching) == ["a:app-0000", "a:app-0001"]
+
+        fake_docker(2, lines_per_sec=20.0, socket_path=str(tmp_path / "b.sock"))
+        await until(lambda: inv.loaded)
+        assert "b:app-0001" in inv.snapshot
+        # Loaded by its events task, the host's containers are ingested too
+        assert "b:app-0001" in engine.watching
+        await until(lambda: "b:app-0001" in engine.store)
+        await inv.stop()
+        await engine.stop()
+
+    asyncio.run(main())
+
+
+@pytest.fixture
+def two_hosts(fake_docker, fast_retry, config, tmp_path):
+    """Configure hosts a (up, one container) and b (down until started); yields b's socket path."""
+    a = fake_docker(1)
+    config(lambda c: c.update({
+        "docker": {"hosts": {"a": a.url, "b": f"unix://{tmp_path / 'b.sock'}"}},
+        "archive": {"enabled": False},
+    }))
+    docker_utils.init_services(get_config())
+    yield str(tmp_path / "b.sock")
+
+
+async def stop_services():
+    await docker_utils.INVENTORY.stop()
+    await docker_utils.ENGINE.stop()
+    if docker_utils.STATS:
+        await docker_utils.STATS.stop()
+
+
+def test_not_ready_until_every_host_is_loaded_and_backfilled(fake_docker, two_hosts):
+    async def main():
+        warmup = asyncio.ensure_future(docker_utils.warm_up())
+        try:
+            await until(lambda: docker_utils.WARMUP.loaded_at is not None)
+            status = docker_utils.WARMUP.status()
+            assert not docker_utils.WARMUP.ready
+            assert status["phase"] == "waiting_for_hosts"
+            assert status["hosts"] == {"total": 2, "listed": 1, "loaded": 1}
+
+            fake_docker(1, socket_path=two_hosts)
+            await until(lambda: docker_utils.WARMUP.ready)
+            await warmup
+            status = docker_utils.WARMUP.status()
+            assert sorted(docker_utils.ENGINE.watching) == ["a:app-0000", "b:app-0000"]
+            assert status["containers"]["backfilled"] == status["containers"]["following"] == 2
+            assert status["incomplete"] is None
+            assert "b:app-0000" in docker_utils.LOG_CACHE
+        finally:
+            warmup.cancel()
+            await stop_services()
+
+    asyncio.run(main())
+
+
+def test_ready_after_the_timeout_without_a_dead_host(two_hosts, monkeypatch):
+    monkeypatch.setattr(docker_utils, "READY_TIMEOUT_SECONDS", 0.5)
+
+    async def main():
+        try:
+            await docker_utils.warm_up()
+            status = docker_utils.WARMUP.status()
+            assert status["ready"] and status["phase"] == "ready"
+            assert status["hosts"]["loaded"] == 1
+            assert status["incomplete"] == {"hosts": ["b"], "containers": []}
+        finally:
+            await stop_services()
+
+    asyncio.run(main())
+
+
+def test_retry_keeps_containers_already_inspected(fake_docker, fast_retry):
+    daemon = fake_docker(4)
+    failing = sorted(daemon.containers)[-1]
+
+    async def main():
+        inv = ContainerInventory({"a": AsyncDockerClient(daemon.url)})
+        inspect, calls = inv._inspect, []
+
+        async def flaky(host, container_id):
+            calls.append(container_id)
+            if container_id == failing and calls.count(failing) == 1:
+                await asyncio.sleep(0.1)
+                raise ConnectionResetError("dropped")
+            return await inspect(host, container_id)
+
+        inv._inspect = flaky
+        await inv.load()
+        assert not inv.loaded
+        inv.start()
+        await until(lambda: inv.loaded)
+        # The retry only inspects what the failed attempt did not finish
+        retried = calls[4:]
+        assert failing in retried and len(retried) < 4
+        assert len(inv.snapshot) == 4
+        await inv.stop()
+
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+from app.log_store import LINE_OVERHEAD, LogStore, RingBuffer
+
+
+def filled(n: int, seq0: int = 0) -> RingBuffer:
+    buf = RingBuffer(seq0)
+    for i in range(n):
+        buf.append(i, b"line %d" % i)
+    return buf
+
+
+def test_ring_buffer_reads():
+    buf = filled(10)
+    assert len(buf) == 10
+    assert buf.tail(2) == [(8, b"line 8"), (9, b"line 9")]
+    assert buf.since(7) == [(7, b"line 7"), (8, b"line 8"), (9, b"line 9")]
+    assert buf.since(3, limit=1) == [(3, b"line 3")]
+    assert buf.seq_at(4) == 4
+    assert buf.nbytes == sum(len(b"line %d" % i) + LINE_OVERHEAD for i in range(10))
+
+
+def test_ring_buffer_evict_keeps_sequence_numbers():
+    buf = filled(10)
+    freed = buf.evict(3 * (6 + LINE_OVERHEAD))
+    assert freed >= 3 * (6 + LINE_OVERHEAD)
+    assert buf.first_seq == 3
+    assert buf.next_seq == 10
+    # A cursor into the evicted lines resumes at the oldest one left
+    lines, next_seq = buf.read_from(1)
+    assert [ts for ts, _ in lines] == list(range(3, 10))
+    assert next_seq == 10
+    assert buf.lines_at([2, 5]) == [(5, 5, b"line 5")]
+
+
+def test_ring_buffer_compaction_keeps_sequence_numbers():
+    buf = filled(5000)
+    buf.evict(4000 * (9 + LINE_OVERHEAD))
+    assert buf.seq0 > 0  # compacted
+    first = buf.first_seq
+    lines, next_seq = buf.read_from(first, limit=3)
+    assert [ts for ts, _ in lines] == [first, first + 1, first + 2]
+    assert next_seq == first + 3
+    assert buf.tail(1) == [(4999, b"line 4999")]
+
+
+def test_ring_buffer_fields_are_parsed_once():
+    buf = RingBuffer()
+    buf.append(1, b'{"level": "ERROR", "msg": "boom"}')
+    buf.append(2, b"plain")
+    before = buf.nbytes
+    lines, _ = buf.read_from(0, with_fields=True)
+    assert lines[0][2]["level"] == "error"
+    assert lines[1][2] is None
+    assert buf.nbytes == before + len(lines[0][1])
+    buf.read_from(0, with_fields=True)
+    assert buf.nbytes == before + len(lines[0][1])
+
+
+def test_store_enforces_budgets():
+    store = LogStore(max_bytes=20_000, max_container_bytes=8_000)
+    for name in ("a", "b", "c", "d"):
+        store.append(name, [(i, b"x" * 100) for i in range(100)])
+    sizes = store.sizes()
+    assert all(size <= 8_000 for size in sizes.values())
+    assert store.total_bytes == sum(sizes.values())
+    assert store.total_bytes <= 20_000
+
+
+def test_store_sequence_numbers_survive_a_drop():
+    store = LogStore()
+    store.append("web", [(i, b"old") for i in range(5000)])
+    cursor = store.next_seq("web")
+    # Recreated under the same name: the old cursor must see the new lines
+    store.drop("web")
+    store.append("web", [(i, b"new") for i in range(300)])
+    lines, next_seq = store.read_from("web", cursor)
+    assert len(lines) == 300
+    assert {msg for _, msg in lines} == {b"new"}
+    assert next_seq == store.next_seq("web")
+
+
+def test_store_unknown_container():
+    store = LogStore()
+    assert store.read_from("nope", 7) == ([], 7)
+    assert store.tail("nope", 5) == []
+    assert store.next_seq("nope") == 0
@@ -0,0 +1,40 @@
+import re
+
+from app.matcher import KeywordMatcher, alert_matcher, trie_pattern
+
+
+def test_trie_pattern_prefers_longer_keywords():
+    pattern = re.compile(trie_pattern(["ERR", "ERROR", "Exception", "E.g"]))
+    assert pattern.search("an ERROR here").group() == "ERROR"
+    assert pattern.search("an ERR here").group() == "ERR"
+    # Keywords are literal
+    assert pattern.search("E.g.").group() == "E.g"
+    assert pattern.search("Exg") is None
+
+
+def test_matches_str_and_bytes():
+    matcher = KeywordMatcher(["ERROR", "Exception", "FATAL"])
+    assert matcher.search("disk ERROR") == "ERROR"
+    assert matcher.search(b"disk ERROR") == "ERROR"
+    assert matcher.search(bytearray(b"FATAL: boom")) == "FATAL"
+    assert matcher.search(b"all good") is None
+    assert matcher.findall(b"Exception: ERROR, ERROR again") == ["Exception", "ERROR"]
+    assert matcher.findall("nothing") == []
+
+
+def test_empty_and_duplicate_keywords():
+    matcher = KeywordMatcher(["", "ERROR", "ERROR"])
+    assert matcher.keywords == ("ERROR",)
+    empty = KeywordMatcher([])
+    assert not empty
+    assert empty.search(b"ERROR") is None
+    assert empty.findall("ERROR") == []
+
+
+def test_alert_matcher_follows_config(config):
+    matcher = alert_matcher()
+    assert alert_matcher() is matcher
+    config(lambda c: c["alert"].__setitem__("keywords", ["OOMKilled"]))
+    assert alert_matcher() is not matcher
+    assert alert_matcher().search(b"container OOMKilled") == "OOMKilled"
+    assert alert_matcher().search(b"ERROR") is None
@@ -0,0 +1,95 @@
+import pytest
+
+from app.rate_rules import RateEngine, RateRule, WindowCounter, rate_engine
+
+SECOND = 1_000_000_000
+
+
+def test_window_counter_slides():
+    counter = WindowCounter(60 * SECOND, buckets=60)
+    for s in range(10):
+        assert counter.add(s * SECOND) == s + 1
+    assert counter.count(30 * SECOND) == 10
+    # Events leave the window one bucket at a time: at 65s it holds 6s-9s
+    assert counter.count(65 * SECOND) == 4
+    assert counter.add(65 * SECOND) == 5
+    assert counter.count(65 * SECOND) == 5
+
+
+def test_window_counter_ignores_events_older_than_the_window():
+    counter = WindowCounter(10 * SECOND, buckets=10)
+    counter.add(100 * SECOND)
+    assert counter.add(50 * SECOND) == 1
+    # A late event still inside the window counts
+    assert counter.add(95 * SECOND) == 2
+
+
+def test_window_counter_gap_longer_than_the_window_resets():
+    counter = WindowCounter(10 * SECOND, buckets=10)
+    counter.add(0, amount=50)
+    assert counter.count(9 * SECOND) == 50
+    assert counter.count(25 * SECOND) == 0
+    assert counter.add(25 * SECOND) == 1
+
+
+def test_rule_fires_once_and_rearms():
+    engine = RateEngine([RateRule("errors", keywords=["ERROR"], threshold=3, window_seconds=10)])
+    fired = [engine.observe("web", s * SECOND, b"ERROR boom") for s in range(6)]
+    assert [len(f) for f in fired] == [0, 0, 0, 1, 0, 0]
+    assert fired[3][0][1] == 4
+    assert engine.observe("web", 6 * SECOND, b"all good") == []
+    # Back under the threshold once the window has moved on, then over again
+    assert engine.observe("web", 30 * SECOND, b"ERROR again") == []
+    fired = [engine.observe("web", (31 + s) * SECOND, b"ERROR again") for s in range(3)]
+    assert [len(f) for f in fired] == [0, 0, 1]
+
+
+def test_rule_scopes():
+    per_container = RateRule("c", keywords=["ERROR"], threshold=1)
+    across = RateRule("all", keywords=["ERROR"], threshold=1, scope="all")
+    engine = RateEngine([per_container, across])
+    assert engine.observe("a", 1, b"ERROR") == []
+    fired = engine.observe("b", 2, b"ERROR")
+    assert [rule.name for rule, _ in fired] == ["all"]
+
+
+def test_engine_survives_unrelated_config_edits(config):
+    config(lambda c: c["alert"].__setitem__("rate_rules", [{"name": "x", "keywords": ["ERROR"], "threshold": 3}]))
+    engine = rate_engine()
+    engine.observe("web", SECOND, b"ERROR")
+    config(lambda c: c["alert"]["keywords"].append("zzz"))
+    assert rate_engine() is engine
+    config(lambda c: c["alert"]["rate_rules"][0].__setitem__("threshold", 5))
+    assert rate_engine() is not engine
+    assert rate_engine().rules[0].threshold == 5
+
+
+def test_rule_numbers_from_quoted_yaml():
+    rule = RateRule.from_config(0, {"keyword": "ERROR", "threshold": "3", "window_seconds": "10"})
+    assert rule.threshold == 3.0
+    assert rule.window_seconds == 10.0
+    engine = RateEngine([rule])
+    fired = [engine.observe("web", s * SECOND, b"ERROR") for s in range(4)]
+    assert [len(f) for f in fired] == [0, 0, 0, 1]
+    assert RateRule("r", keywords=["x"], rate_per_second="0.5", window_seconds=4).threshold == 2.0
+
+
+@pytest.mark.parametrize("options", [
+    {"threshold": -1},
+    {"threshold": 0},
+    {"threshold": "lots"},
+    {"threshold": float("nan")},
+    {"rate_per_second": "-2"},
+    {"threshold": 5, "window_seconds": 0},
+    {"threshold": 5, "window_seconds": "soon"},
+    {"threshold": True},
+])
+def test_rule_rejects_bad_numbers(options):
+    with pytest.raises(ValueError):
+        RateRule.from_config(0, {"keyword": "ERROR", **options})
+
+
+def test_engine_skips_invalid_rules():
+    engine = RateEngine.from_config([{"name": "bad", "keyword": "x", "threshold": "-3"},
+                                     {"name": "good", "keyword": "x", "threshold": "3"}])
+    assert [rule.name for rule in engine.rules] == ["good"]
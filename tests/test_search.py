@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from app.log_store import LogStore
+from app.search import SearchIndex, tokenize
+from app.structured import FieldRules
+
+LINES = {
+    "web": [
+        b"INFO GET /health 200",
+        b"ERROR connection refused by db-01",
+        b"WARN Timeout: retrying request 4f2a9c1e",
+        b"ERROR timeouts exceeded, giving up",
+        b'{"level": "error", "message": "Connection reset"}',
+        b"INFO disconnected 127 clients",
+    ],
+    "db": [
+        b"LOG checkpoint starting",
+        b"ERROR connection refused: too many clients",
+    ],
+}
+
+
+@pytest.fixture
+def index():
+    store = LogStore()
+    index = SearchIndex(store)
+    for name, lines in LINES.items():
+        # web logs at 10, 20, ... and db at 15, 25, ...
+        batch = [(i * 10 + (5 if name == "db" else 0), msg) for i, msg in enumerate(lines, 1)]
+        store.append(name, batch)
+        index.add(name, batch)
+    return index
+
+
+def found(index, query, **options) -> list:
+    return [(hit["container"], hit["ts"]) for hit in index.search(query, **options)]
+
+
+def test_tokenize_skips_numbers_and_ids():
+    assert tokenize(b"ERROR request 4f2a9c1e took 31 ms on db_01") == {b"error", b"request", b"took", b"ms", b"on", b"db_01"}
+
+
+def test_words_and_phrases_newest_first(index):
+    assert found(index, "connection") == [("web", 50), ("db", 25), ("web", 20)]
+    assert found(index, "Connection Refused") == [("db", 25), ("web", 20)]
+    assert found(index, "connection", containers=["db"]) == [("db", 25)]
+    assert found(index, "refused", since=20, until=25) == [("web", 20)]
+    assert found(index, "connection", limit=1) == [("web", 50)]
+
+
+def test_queries_match_whole_words_with_and_without_the_index(index):
+    # Partial words find nothing, whether the query has postings or not
+    assert found(index, "conn") == []
+    assert found(index, "timeout") == [("web", 30)]
+    assert found(index, "connected") == []
+    # Only word characters at the query's edges need a boundary
+    assert found(index, "timeout:") == [("web", 30)]
+    assert found(index, "by db") == [("web", 20)]
+    # Numbers and ids are not indexed, so these scan, with the same rule
+    assert found(index, "127") == [("web", 60)]
+    assert found(index, "12") == []
+    assert found(index, "4f2a9c1e") == [("web", 30)]
+
+
+def test_regex_matches_anywhere(index):
+    assert found(index, r"conn\w+", regex=True) == [("web", 60), ("web", 50), ("db", 25), ("web", 20)]
+    assert found(index, "timeouts?", regex=True) == [("web", 40), ("web", 30)]
+
+
+def test_where_filters_json_lines(index):
+    where = FieldRules.parse(["level >= error"])
+    assert found(index, "connection", where=where) == [("web", 50)]
+    assert found(index, "", where=where) == [("web", 50)]
+
+
+def test_dropped_container_is_not_searched(index):
+    index.drop("web")
+    index.store.drop("web")
+    assert found(index, "connection") == [("db", 25)]
+    assert json.dumps(index.stats())
@@ -0,0 +1,133 @@
+import socket
+from email import message_from_bytes
+from email.header import decode_header, make_header
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from app import send_email
+from app.send_email import EmailDispatcher
+
+
+class Sink:
+    """aiosmtpd handler that keeps every message, failing the first `fail` DATA commands."""
+
+    def __init__(self, fail: int = 0):
+        self.fail = fail
+        self.messages = []
+        self.sessions = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.fail:
+            self.fail -= 1
+            return "451 Try again later"
+        self.messages.append((envelope.rcpt_tos, message_from_bytes(envelope.content)))
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp(config, monkeypatch):
+    """An SMTP sink on localhost, configured as the alert mail server."""
+    monkeypatch.setattr(send_email, "RETRY_BASE_SECONDS", 0.01)
+    sink = Sink()
+    controller = Controller(sink, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    config(lambda c: c["email"].update({
+        "enabled": True,
+        "digest": False,
+        "sender": "logforge@example.com",
+        "app_password": "unused",
+        "smtp_host": "127.0.0.1",
+        "smtp_port": controller.port,
+        "smtp_ssl": False,
+        "smtp_starttls": False,
+        "smtp_skip_login": True,
+        "alert_interval_hours": 1,
+        "recipients": {"default": ["ops@example.com"], "db": ["dba@example.com"]},
+    }))
+    yield sink
+    controller.stop()
+
+
+def subject(message) -> str:
+    return str(make_header(decode_header(message["Subject"])))
+
+
+def test_sends_over_one_reused_session(smtp):
+    dispatcher = EmailDispatcher()
+    for i in range(3):
+        assert dispatcher.submit("web", f"alert {i}", "body")
+    dispatcher.submit("db", "db alert", "body")
+    dispatcher.join()
+
+    assert dispatcher.sent == 4
+    assert smtp.sessions == 1
+    assert [subject(m) for _, m in smtp.messages] == ["alert 0", "alert 1", "alert 2", "db alert"]
+    assert smtp.messages[3][0] == ["dba@example.com"]
+
+
+def test_retries_a_failed_send(smtp):
+    smtp.fail = 2
+    dispatcher = EmailDispatcher()
+    dispatcher.submit("web", "flaky", "body")
+    dispatcher.join()
+
+    assert dispatcher.sent == 1
+    assert dispatcher.failed == 0
+    assert [subject(m) for _, m in smtp.messages] == ["flaky"]
+    # Each failure drops the session, so each retry logs in afresh
+    assert smtp.sessions == 3
+
+
+def test_gives_up_after_max_attempts(smtp):
+    smtp.fail = send_email.MAX_ATTEMPTS
+    dispatcher = EmailDispatcher()
+    dispatcher.submit("web", "lost", "body")
+    dispatcher.join()
+
+    assert dispatcher.sent == 0
+    assert dispatcher.failed == 1
+    assert smtp.messages == []
+
+
+def test_digest_collects_alerts_within_the_interval(smtp, config):
+    config(lambda c: c["email"].__setitem__("digest", True))
+    dispatcher = EmailDispatcher()
+    dispatcher._handle("web", "first", "one")
+    dispatcher._handle("api", "second", "two")
+    dispatcher._handle("web", "third", "three")
+    dispatcher._flush_digests()
+    assert [subject(m) for _, m in smtp.messages] == ["first"]
+
+    # Once the interval is up, the rest go out as one email
+    key = ("ops@example.com",)
+    dispatcher._last_sent[key] -= 3600
+    dispatcher._flush_digests()
+    assert len(smtp.messages) == 2
+    recipients, digest = smtp.messages[1]
+    assert recipients == ["ops@example.com"]
+    assert subject(digest) == "🚨 LogForge digest: 2 alerts in api, web"
+    body = "".join(part.get_payload(decode=True).decode()
+                   for part in digest.walk() if part.get_content_type() == "text/plain")
+    assert "second" in body and "third" in body
+    assert dispatcher._digests == {}
+
+
+def test_disabled_email_sends_nothing(smtp, config):
+    config(lambda c: c["email"].__setitem__("enabled", False))
+    dispatcher = EmailDispatcher()
+    dispatcher.submit("web", "quiet", "body")
+    dispatcher.join()
+    assert smtp.messages == []
+    assert smtp.sessions == 0
@@ -0,0 +1,104 @@
+import time
+import threading
+
+import pytest
+import yaml
+
+from app import settings
+from app.settings import config_version, derived, flush_config, get_config, on_change, update_config
+
+
+@pytest.fixture
+def listeners(monkeypatch):
+    calls = []
+    monkeypatch.setattr(settings, "_listeners", [])
+    on_change(calls.append)
+    return calls
+
+
+def on_disk() -> dict:
+    with open(settings.CONFIG_PATH) as f:
+        return yaml.safe_load(f)
+
+
+def test_update_is_live_at_once_and_saved_later(config, listeners, monkeypatch):
+    monkeypatch.setattr(settings, "SAVE_DELAY_SECONDS", 0.05)
+    version = config_version()
+    result = update_config(lambda c: c["alert"]["keywords"].append("OOM") or "done")
+    assert result == "done"
+    assert config_version() == version + 1
+    assert "OOM" in get_config()["alert"]["keywords"]
+    assert listeners and "OOM" in listeners[-1]["alert"]["keywords"]
+    assert "OOM" not in on_disk()["alert"]["keywords"]
+
+    deadline = time.monotonic() + 5
+    while "OOM" not in on_disk()["alert"]["keywords"]:
+        assert time.monotonic() < deadline, "config.yml was not written"
+        time.sleep(0.02)
+
+
+def test_failed_update_changes_nothing(config, listeners):
+    before, version = get_config(), config_version()
+    notified = len(listeners)
+
+    def broken(c):
+        c["alert"]["keywords"] = "oops"
+        raise ValueError("no")
+
+    with pytest.raises(ValueError):
+        update_config(broken)
+    assert get_config() is before
+    assert config_version() == version
+    assert len(listeners) == notified
+
+
+def test_snapshots_are_never_mutated(config):
+    before = get_config()
+    keywords = list(before["alert"]["keywords"])
+    update_config(lambda c: c["alert"]["keywords"].clear())
+    assert before["alert"]["keywords"] == keywords
+    assert get_config()["alert"]["keywords"] == []
+
+
+def test_concurrent_updates_are_not_lost(config):
+    def add(i):
+        update_config(lambda c: c["alert"]["keywords"].append(f"kw{i}"))
+
+    threads = [threading.Thread(target=add, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    flush_config()
+    keywords = on_disk()["alert"]["keywords"]
+    assert {f"kw{i}" for i in range(20)} <= set(keywords)
+
+
+def test_external_edits_are_picked_up(config, monkeypatch):
+    monkeypatch.setattr(settings, "CHECK_INTERVAL_SECONDS", 0)
+    get_config()
+    edited = on_disk()
+    edited["alert"]["keywords"] = ["EDITED", "BY", "HAND"]
+    with open(settings.CONFIG_PATH, "w") as f:
+        yaml.safe_dump(edited, f)
+    assert get_config()["alert"]["keywords"] == ["EDITED", "BY", "HAND"]
+
+
+def test_derived_rebuilds_on_change_or_key_change(config):
+    builds = []
+
+    def build(c):
+        builds.append(1)
+        return len(builds)
+
+    assert derived("test_count", build) == 1
+    assert derived("test_count", build) == 1
+    update_config(lambda c: c["email"].__setitem__("digest", True))
+    assert derived("test_count", build) == 2
+
+    keyed = lambda c: c["alert"]["keywords"]
+    assert derived("test_keyed", build, key=keyed) == 3
+    update_config(lambda c: c["email"].__setitem__("digest", False))
+    assert derived("test_keyed", build, key=keyed) == 3
+    update_config(lambda c: c["alert"]["keywords"].append("NEW"))
+    assert derived("test_keyed", build, key=keyed) == 4
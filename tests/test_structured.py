@@ -0,0 +1,81 @@
+import pytest
+
+from app.matcher import KeywordMatcher
+from app.structured import FieldRules, is_alert_line, parse_fields, parse_rule
+
+MATCHER = KeywordMatcher(["ERROR", "Exception"])
+RULES = FieldRules.parse(["level >= error", "service == payments and http.status >= 500"])
+
+
+def alert(msg: bytes, rules=RULES) -> bool:
+    return is_alert_line(msg, parse_fields(msg), MATCHER, rules)
+
+
+def test_parse_fields_flattens_and_normalises():
+    fields = parse_fields(b' {"severity": "WARNING", "msg": "slow", "http": {"status": 503}, "tags": ["a"]}')
+    assert fields["level"] == "warning"
+    assert fields["message"] == "slow"
+    assert fields["http.status"] == 503
+    assert "tags" not in fields
+    assert parse_fields(b"ERROR plain line") is None
+    assert parse_fields(b"[1, 2]") is None
+    assert parse_fields(b"{broken") is None
+
+
+def test_parse_rule():
+    rule = parse_rule("level >= warn and service == payments")
+    assert [(c.field, c.op, c.value) for c in rule] == [("level", ">=", "warn"), ("service", "==", "payments")]
+    # ' and ' inside a quoted value is part of the value
+    rule = parse_rule('msg == "cats and dogs" and level == error')
+    assert [(c.field, c.value) for c in rule] == [("msg", "cats and dogs"), ("level", "error")]
+    assert parse_rule("msg ~ 'a and b'")[0].value == "a and b"
+
+
+@pytest.mark.parametrize("text", ["level", "level >= ", "level >= loud", "latency > fast", "msg ~ ("])
+def test_parse_rule_rejects_malformed_rules(text):
+    with pytest.raises(ValueError):
+        parse_rule(text)
+
+
+def test_field_rules_match_any_rule_with_all_conditions():
+    assert RULES.matches({"level": "fatal"})
+    assert RULES.matches({"level": 50})
+    assert not RULES.matches({"level": "warn"})
+    assert RULES.matches({"service": "payments", "http.status": 502})
+    assert not RULES.matches({"service": "payments", "http.status": 404})
+    assert not RULES.matches({"service": "search", "http.status": 502})
+    assert not FieldRules()
+    assert FieldRules.parse(["nonsense", "level >= error"], strict=False).matches({"level": "error"})
+    with pytest.raises(ValueError):
+        FieldRules.parse(["nonsense"])
+
+
+def test_conditions_compare_numbers_strings_and_missing_fields():
+    rules = FieldRules.parse(["latency > 1.5", "user != root", "path ~ ^/api/"])
+    assert rules.matches({"latency": "2"})
+    assert not rules.matches({"latency": 1, "user": "root"})
+    # A missing field only satisfies !=
+    assert rules.matches({})
+    assert rules.matches({"user": "root", "path": "/api/v1"})
+
+
+def test_json_lines_are_judged_by_field_rules():
+    assert alert(b'{"level": "error", "message": "card declined"}')
+    # Mentioning a keyword at info level does not alert
+    assert not alert(b'{"level": "info", "message": "retrying after ERROR"}')
+    assert alert(b'{"level": "info", "service": "payments", "http": {"status": 500}}')
+
+
+def test_json_lines_without_a_level_fall_back_to_keywords():
+    assert alert(b'{"message": "ERROR: disk full"}')
+    assert not alert(b'{"message": "all good", "note": "ERROR"}')
+    # Without a string message the whole line is searched
+    assert alert(b'{"event": "Exception in worker"}')
+    assert alert(b'{"message": {"text": "ERROR"}}')
+    assert not alert(b'{"event": "done"}')
+
+
+def test_plain_lines_and_no_rules_use_keywords():
+    assert alert(b"ERROR something broke")
+    assert not alert(b"INFO fine")
+    assert alert(b'{"level": "info", "message": "ERROR"}', rules=FieldRules())